@@ -41,5 +41,8 @@ setup(
         "class_lister": [
             "idc.plantcv=idc.plantcv.class_lister",
         ],
+        "console_scripts": [
+            "idc-plantcv-benchmark=idc.plantcv.tool.benchmark:sys_main",
+        ],
     },
 )
@@ -0,0 +1,22 @@
+from ._lazy import LazyModule, pcv, load_plantcv
+from ._pool import WorkerPool, add_num_workers_param
+from ._morphology import ENGINE_PCV, ENGINE_DISTANCE, ENGINE_RLE, MORPHOLOGY_ENGINES, SHAPE_SQUARE, SHAPE_DISC, SHAPE_CROSS, SHAPES
+from ._morphology import is_binary, kernel_extents, structuring_element, distance_morphology
+from ._points import KEY_TYPE, KEY_CENTROID_X, KEY_CENTROID_Y, KEY_NUM_PIXELS, PointSet, group_to_locatedobjects, points_to_pointset, points_to_locatedobjects
+from ._skeleton import ENGINE_GRAPH, PRUNE_ENGINES, ENGINE_LUT, POINT_ENGINES, KEY_NUM_TIPS, KEY_NUM_BRANCH_POINTS, KEY_NUM_SEGMENTS, KEY_SKELETON_LENGTH
+from ._skeleton import TIP_TEMPLATES, BRANCH_TEMPLATES, TIP_LUT, BRANCH_LUT, neighbourhood_codes, classify_skeleton, count_segments, prune_skeleton
+from ._images import share_image
+from ._fill import ENGINE_LABEL, FILL_ENGINES, CONNECTIVITIES, size_inclusive, label_fill, label_fill_holes
+from ._tiles import add_tile_size_param, create_memmap, image_to_memmap, tiles, tiled_apply, tiled_label_fill, tiled_label_fill_holes
+from ._cache import CACHE_VERSION, COUNTER_HITS, COUNTER_MISSES, COUNTER_EVICTIONS, COUNTERS, ResultCache, add_cache_params, cache_parameters, cache_key
+from ._timing import STAGE_FORMAT, STAGE_PCV, STAGE_OUTPUT, STAGE_RECORD, STAGES, StageTimer, add_profile_params, stage_timer, timed
+from ._threads import PCV_PARAMS_LOCK, add_num_threads_param, create_thread_pool, debug_disabled
+from ._rle import RLE_SHAPES, RLEMask, rle_morphology, rle_fill, rle_fill_holes
+from ._arrays import LOSSLESS_FORMATS, ArrayView, is_lossless, attach_array_view, get_array_view, cached_array
+from ._prefetch import Prefetcher, add_prefetch_param
+from ._short_circuit import COUNTER_CHECKED, COUNTER_SHORT_CIRCUITED, SHORT_CIRCUIT_COUNTERS, ShortCircuits, constant_value
+from ._roi import ROI_FULL, ROI_ANNOTATIONS, ROI_MODES, add_roi_param, annotation_regions
+from ._approx import KEY_APPROX_IOU, KEY_APPROX_ERROR, AGREEMENT_COUNTERS, add_downscale_params, scaled_shape, downscale, upscale, binarize, scaled_size, scaled_kernel_size, agreement_counters, agreement_metadata
+from ._budget import add_memory_budget_param, record_pixels, record_bytes, split_by_pixels, BatchMemory
+from ._sweep import KEY_SWEEP_PREFIX, single_value, sweep_combinations, sweep_parameters, variant_name, variant_metadata
+from ._synthetic import synthetic_mask, synthetic_grayscale
@@ -0,0 +1,170 @@
+import argparse
+from typing import Dict, Tuple
+
+import cv2
+import numpy as np
+
+KEY_APPROX_IOU = "approx_iou"
+KEY_APPROX_ERROR = "approx_error"
+
+COUNTER_INTERSECTION = "intersection"
+COUNTER_UNION = "union"
+COUNTER_DIFFERENCE = "difference"
+COUNTER_PIXELS = "pixels"
+AGREEMENT_COUNTERS = [
+    COUNTER_INTERSECTION,
+    COUNTER_UNION,
+    COUNTER_DIFFERENCE,
+    COUNTER_PIXELS,
+]
+
+
+def add_downscale_params(parser: argparse.ArgumentParser):
+    """
+    Adds the -D/--downscale and -V/--validate options to the parser.
+
+    :param parser: the parser to append
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument("-D", "--downscale", type=int, help="The factor to downscale the images by for an approximate result, scaling the parameters of the operation to match; the result gets upscaled again and its edges refined using the original image. Computes the exact result if less than 2.", default=1, required=False)
+    parser.add_argument("-V", "--validate", action="store_true", help="Whether to compute the exact result as well when downscaling and store the agreement of the approximate result with it in the meta-data ('" + KEY_APPROX_IOU + "': intersection over union of the non-zero pixels, '" + KEY_APPROX_ERROR + "': mean absolute difference relative to the value range, i.e., the fraction of differing pixels for masks).")
+
+
+def scaled_shape(shape: Tuple[int, int], factor: int) -> Tuple[int, int]:
+    """
+    Determines the shape of the downscaled image.
+
+    :param shape: the shape of the image (height, width)
+    :type shape: tuple
+    :param factor: the factor to downscale by
+    :type factor: int
+    :return: the downscaled shape (height, width)
+    :rtype: tuple
+    """
+    return max(1, int(round(shape[0] / factor))), max(1, int(round(shape[1] / factor)))
+
+
+def downscale(array: np.ndarray, factor: int, binary: bool) -> np.ndarray:
+    """
+    Downscales the image by averaging the pixels (area interpolation).
+
+    :param array: the image to downscale
+    :type array: np.ndarray
+    :param factor: the factor to downscale by
+    :type factor: int
+    :param binary: whether the image is binary, thresholds the result at half the maximum value
+    :type binary: bool
+    :return: the downscaled image
+    :rtype: np.ndarray
+    """
+    height, width = scaled_shape(array.shape, factor)
+    result = cv2.resize(np.asarray(array), (width, height), interpolation=cv2.INTER_AREA)
+    if binary:
+        result = binarize(result, array.max(initial=0))
+    return result
+
+
+def upscale(array: np.ndarray, shape: Tuple[int, int], binary: bool) -> np.ndarray:
+    """
+    Upscales the image to the specified shape (bilinear interpolation).
+
+    :param array: the image to upscale
+    :type array: np.ndarray
+    :param shape: the shape to upscale to (height, width)
+    :type shape: tuple
+    :param binary: whether the image is binary, thresholds the result at half the maximum value
+    :type binary: bool
+    :return: the upscaled image
+    :rtype: np.ndarray
+    """
+    result = cv2.resize(array, (shape[1], shape[0]), interpolation=cv2.INTER_LINEAR)
+    if binary:
+        result = binarize(result, array.max(initial=0))
+    return result
+
+
+def binarize(array: np.ndarray, max_value: int) -> np.ndarray:
+    """
+    Thresholds the image at half the maximum value.
+
+    :param array: the image to threshold
+    :type array: np.ndarray
+    :param max_value: the value of foreground pixels
+    :type max_value: int
+    :return: the binary image (0/max value)
+    :rtype: np.ndarray
+    """
+    # pixels above the threshold get set to the maximum value
+    _, result = cv2.threshold(array, max(1, (int(max_value) + 1) // 2) - 1, int(max_value), cv2.THRESH_BINARY)
+    return result
+
+
+def scaled_size(size: int, factor: int) -> int:
+    """
+    Scales an area in pixels to the downscaled image.
+
+    :param size: the area to scale
+    :type size: int
+    :param factor: the factor the image got downscaled by
+    :type factor: int
+    :return: the scaled area, at least 1
+    :rtype: int
+    """
+    return max(1, int(round(size / (factor * factor))))
+
+
+def scaled_kernel_size(kernel_size: int, num_iterations: int, factor: int) -> int:
+    """
+    Scales a square kernel to the downscaled image. As applying a square kernel several times is the same
+    as applying a larger one once, the iterations get folded into the kernel size.
+
+    :param kernel_size: the size of the kernel
+    :type kernel_size: int
+    :param num_iterations: the number of times the kernel gets applied
+    :type num_iterations: int
+    :param factor: the factor the image got downscaled by
+    :type factor: int
+    :return: the kernel size to apply once, 1 if the kernel has no effect
+    :rtype: int
+    """
+    return int(round((kernel_size - 1) * num_iterations / factor)) + 1
+
+
+def agreement_counters(approximate: np.ndarray, exact: np.ndarray) -> Dict[str, int]:
+    """
+    Counts the agreement of the approximate result with the exact one.
+
+    :param approximate: the approximate result
+    :type approximate: np.ndarray
+    :param exact: the exact result
+    :type exact: np.ndarray
+    :return: the counters (intersection and union of the non-zero pixels, sum of absolute differences, total pixels)
+    :rtype: dict
+    """
+    approximate = np.asarray(approximate).astype(np.uint8, copy=False)
+    exact = np.asarray(exact).astype(np.uint8, copy=False)
+    fg_approximate = approximate > 0
+    fg_exact = exact > 0
+    return {
+        COUNTER_INTERSECTION: int(np.count_nonzero(fg_approximate & fg_exact)),
+        COUNTER_UNION: int(np.count_nonzero(fg_approximate | fg_exact)),
+        COUNTER_DIFFERENCE: int(cv2.absdiff(approximate, exact).sum(dtype=np.int64)),
+        COUNTER_PIXELS: int(exact.size),
+    }
+
+
+def agreement_metadata(counters: Dict[str, int]) -> Dict[str, float]:
+    """
+    Turns the agreement counters into the meta-data to store.
+
+    :param counters: the counters to convert
+    :type counters: dict
+    :return: the meta-data (IoU, error relative to the uint8 value range)
+    :rtype: dict
+    """
+    union = counters[COUNTER_UNION]
+    pixels = counters[COUNTER_PIXELS]
+    return {
+        KEY_APPROX_IOU: counters[COUNTER_INTERSECTION] / union if union > 0 else 1.0,
+        KEY_APPROX_ERROR: counters[COUNTER_DIFFERENCE] / (pixels * 255) if pixels > 0 else 0.0,
+    }
@@ -0,0 +1,138 @@
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from idc.api import REQUIRED_FORMAT_ANY, FORMAT_PNG, FORMAT_BMP, mode_to_format
+
+LOSSLESS_FORMATS = [
+    FORMAT_PNG,
+    FORMAT_BMP,
+]
+""" the image formats that decode to exactly the image that got encoded. """
+
+ATTR_ARRAY_VIEW = "_pcv_array_view"
+""" the attribute of the record that holds the array view. """
+
+
+class ArrayView:
+    """
+    The decoded image of a record generated by a pcv filter, with the numpy array that pcv filters
+    apply to it. Only valid as long as the record still has the same image data and image.
+    """
+
+    def __init__(self, data: bytes, image: Image.Image):
+        """
+        Initializes the view.
+
+        :param data: the image data of the record
+        :type data: bytes
+        :param image: the image of the record, i.e., the decoded data
+        :type image: Image.Image
+        """
+        self.data = data
+        self.image = image
+        self._array = None
+
+    def is_valid(self, item) -> bool:
+        """
+        Checks whether the view still represents the image of the record.
+
+        :param item: the record to check against
+        :return: True if still valid
+        :rtype: bool
+        """
+        return (item.data is self.data) and (item.image is self.image)
+
+    def image_format(self) -> str:
+        """
+        Returns the required format that the image is in.
+
+        :return: the format (binary/grayscale/rgb)
+        :rtype: str
+        """
+        return mode_to_format(self.image.mode)
+
+    def array(self) -> np.ndarray:
+        """
+        Returns the uint8 array of the image, generates it if necessary.
+        The array is flagged as read-only to keep it consistent with the image.
+
+        :return: the array
+        :rtype: np.ndarray
+        """
+        if self._array is None:
+            self._array = np.asarray(self.image).astype(np.uint8)
+            self._array.setflags(write=False)
+        return self._array
+
+    def __getstate__(self):
+        """
+        Returns the state to pickle, omits the array as it can be re-generated from the image.
+
+        :return: the state
+        :rtype: dict
+        """
+        result = self.__dict__.copy()
+        result["_array"] = None
+        return result
+
+
+def is_lossless(image_format: Optional[str]) -> bool:
+    """
+    Checks whether the image format decodes to exactly the image that got encoded.
+
+    :param image_format: the format to check, e.g., PNG
+    :type image_format: str
+    :return: True if lossless
+    :rtype: bool
+    """
+    return image_format in LOSSLESS_FORMATS
+
+
+def attach_array_view(item) -> Optional[ArrayView]:
+    """
+    Attaches an array view to the record, using its current data and image.
+    Does not attach one if the image format is lossy, as the image would differ from decoding the data.
+
+    :param item: the record to attach the view to
+    :return: the view, None if not attached
+    :rtype: ArrayView
+    """
+    if (item.data is None) or (item.image is None) or not is_lossless(item.image_format):
+        return None
+    result = ArrayView(item.data, item.image)
+    setattr(item, ATTR_ARRAY_VIEW, result)
+    return result
+
+
+def get_array_view(item) -> Optional[ArrayView]:
+    """
+    Returns the array view attached to the record, if still valid.
+
+    :param item: the record to get the view for
+    :return: the view, None if none attached or no longer valid
+    :rtype: ArrayView
+    """
+    result = getattr(item, ATTR_ARRAY_VIEW, None)
+    if (result is None) or not result.is_valid(item):
+        return None
+    return result
+
+
+def cached_array(item, req_format: str) -> Optional[np.ndarray]:
+    """
+    Returns the (read-only) array of the record's image from a valid array view, if the image is in the required format.
+
+    :param item: the record to get the array for
+    :param req_format: the required format (binary/grayscale/rgb/any)
+    :type req_format: str
+    :return: the array, None if not available
+    :rtype: np.ndarray
+    """
+    view = get_array_view(item)
+    if view is None:
+        return None
+    if (req_format != REQUIRED_FORMAT_ANY) and (view.image_format() != req_format):
+        return None
+    return view.array()
@@ -0,0 +1,147 @@
+import argparse
+import io
+import logging
+from typing import Iterator, List, Optional
+
+from PIL import Image
+
+
+def add_memory_budget_param(parser: argparse.ArgumentParser):
+    """
+    Adds the -B/--memory_budget option to the parser.
+
+    :param parser: the parser to append
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument("-B", "--memory_budget", type=float, help="The maximum number of megapixels to process at a time; incoming batches get split into sub-batches whose total pixel count stays within the budget (a single larger image forms its own sub-batch) and the records of a sub-batch get forwarded as soon as it is done. Processes the whole batch at once if not specified.", default=None, required=False)
+
+
+def record_pixels(item) -> int:
+    """
+    Returns the number of pixels of the record's image, determined from the image header if possible.
+
+    :param item: the record to get the pixels for
+    :return: the number of pixels, 0 if the size cannot be determined
+    :rtype: int
+    """
+    size = item.image_size
+    if (size is not None) and (size[0] > 0) and (size[1] > 0):
+        return size[0] * size[1]
+    # only reads the header, the image does not get decoded
+    try:
+        if item.data is not None:
+            with Image.open(io.BytesIO(item.data)) as img:
+                return img.width * img.height
+        if item.source is not None:
+            with Image.open(item.source) as img:
+                return img.width * img.height
+    except Exception:
+        pass
+    return 0
+
+
+def record_bytes(item) -> int:
+    """
+    Estimates the memory held by the record, i.e., its image bytes and decoded image.
+
+    :param item: the record to estimate the memory for
+    :return: the estimated number of bytes
+    :rtype: int
+    """
+    result = 0
+    if item.data is not None:
+        result += len(item.data)
+    image = item.image
+    if image is not None:
+        result += image.width * image.height * len(image.getbands())
+    return result
+
+
+def split_by_pixels(items: List, budget: int) -> Iterator[List]:
+    """
+    Splits the records into consecutive sub-batches whose total number of pixels does not exceed the budget.
+    A record that exceeds the budget on its own forms a sub-batch by itself.
+
+    :param items: the records to split
+    :type items: list
+    :param budget: the maximum number of pixels per sub-batch
+    :type budget: int
+    :return: the sub-batches
+    :rtype: iterator
+    """
+    batch = []
+    pixels = 0
+    for item in items:
+        item_pixels = record_pixels(item)
+        if (len(batch) > 0) and (pixels + item_pixels > budget):
+            yield batch
+            batch = []
+            pixels = 0
+        batch.append(item)
+        pixels += item_pixels
+    if len(batch) > 0:
+        yield batch
+
+
+class BatchMemory:
+    """
+    Keeps track of the sub-batches of the incoming batches and the peak memory they require,
+    i.e., the pixels and the estimated memory of the generated records.
+    """
+
+    def __init__(self, logger: logging.Logger):
+        """
+        Initializes the statistics.
+
+        :param logger: the logger to output the statistics with
+        :type logger: logging.Logger
+        """
+        self.logger = logger
+        self.num_records = 0
+        self.num_batches = 0
+        self.peak_pixels = 0
+        self.peak_bytes = 0
+        self.overall_peak_pixels = 0
+        self.overall_peak_bytes = 0
+
+    def start(self, num_records: int):
+        """
+        Starts a new incoming batch.
+
+        :param num_records: the number of records in the batch
+        :type num_records: int
+        """
+        self.num_records = num_records
+        self.num_batches = 0
+        self.peak_pixels = 0
+        self.peak_bytes = 0
+
+    def add(self, items: List, items_new: Optional[List]):
+        """
+        Records a processed sub-batch.
+
+        :param items: the records of the sub-batch
+        :type items: list
+        :param items_new: the generated records
+        :type items_new: list
+        """
+        self.num_batches += 1
+        self.peak_pixels = max(self.peak_pixels, sum([record_pixels(x) for x in items]))
+        if items_new is not None:
+            self.peak_bytes = max(self.peak_bytes, sum([record_bytes(x) for x in items_new]))
+
+    def finish(self):
+        """
+        Finishes the incoming batch and outputs its statistics.
+        """
+        self.overall_peak_pixels = max(self.overall_peak_pixels, self.peak_pixels)
+        self.overall_peak_bytes = max(self.overall_peak_bytes, self.peak_bytes)
+        self.logger.info("batch of %d record(s) processed in %d sub-batch(es), peak: %.1f MP, ~%.1f MB of generated records"
+                         % (self.num_records, self.num_batches, self.peak_pixels / 1e6, self.peak_bytes / 1024 / 1024))
+
+    def log_peak(self):
+        """
+        Outputs the overall peak of the sub-batches.
+        """
+        self.logger.info("memory budget: overall peak of sub-batches: %.1f MP, ~%.1f MB of generated records"
+                         % (self.overall_peak_pixels / 1e6, self.overall_peak_bytes / 1024 / 1024))
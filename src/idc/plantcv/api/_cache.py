@@ -0,0 +1,217 @@
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from typing import Any, Dict, Optional
+
+import numpy as np
+from ._lazy import pcv
+
+CACHE_VERSION = 1
+""" gets incorporated in the keys, to be increased whenever the cached values change. """
+
+CACHE_EXTENSION = ".pkl"
+
+COUNTER_HITS = "cache_hits"
+COUNTER_MISSES = "cache_misses"
+COUNTER_EVICTIONS = "cache_evictions"
+COUNTERS = [
+    COUNTER_HITS,
+    COUNTER_MISSES,
+    COUNTER_EVICTIONS,
+]
+
+PARAMETERS_EXCLUDED = {"logger_name", "logging_level", "skip", "num_workers", "num_threads", "prefetch", "memory_budget", "tile_size", "roi", "validate", "no_copy", "cache_dir", "cache_size", "profile", "profile_file"}
+""" the filter attributes that have no influence on the results. """
+
+
+def add_cache_params(parser: argparse.ArgumentParser):
+    """
+    Adds the -C/--cache_dir and -M/--cache_size options to the parser.
+
+    :param parser: the parser to append
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument("-C", "--cache_dir", type=str, help="The directory for caching the results on disk, using the input data, filter name, parameters and plantcv version as key. Repeated runs then skip the plantcv processing for inputs that were already processed. No caching if not specified.", default=None, required=False)
+    parser.add_argument("-M", "--cache_size", type=int, help="The maximum size of the cache in MB, the least recently used results get removed once exceeded.", default=1024, required=False)
+
+
+def cache_parameters(handler) -> Dict[str, Any]:
+    """
+    Collects the parameters of the filter that influence its results, i.e., all public attributes
+    apart from the excluded ones (logging, workers, threads, tiling, caching, profiling).
+
+    :param handler: the filter to get the parameters from
+    :return: the parameters
+    :rtype: dict
+    """
+    return {k: v for k, v in vars(handler).items() if (not k.startswith("_")) and (k not in PARAMETERS_EXCLUDED)}
+
+
+def cache_key(array: np.ndarray, name: str, parameters: Dict[str, Any], source: str) -> str:
+    """
+    Generates the key for the array being processed by the specified filter.
+
+    :param array: the array to process
+    :type array: np.ndarray
+    :param name: the name of the filter
+    :type name: str
+    :param parameters: the parameters of the filter that influence the result
+    :type parameters: dict
+    :param source: whether image or layer, as filters may treat them differently
+    :type source: str
+    :return: the key (SHA-256 hex digest)
+    :rtype: str
+    """
+    h = hashlib.sha256()
+    h.update(repr((CACHE_VERSION, pcv.__version__, name, sorted(parameters.items()), source, array.dtype.str, array.shape)).encode("utf-8"))
+    h.update(np.ascontiguousarray(array).data)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache with a size limit, evicting the least recently used entries.
+    The modification times of the files record the last use, i.e., multiple processes can share the cache.
+    """
+
+    def __init__(self, directory: str, max_size: int, logger: logging.Logger):
+        """
+        Initializes the cache.
+
+        :param directory: the directory to store the cached values in
+        :type directory: str
+        :param max_size: the maximum size in MB
+        :type max_size: int
+        :param logger: the logger to use
+        :type logger: logging.Logger
+        """
+        self.directory = directory
+        self.max_size = max_size * 1024 * 1024
+        self.logger = logger
+        self.counters = dict([(x, 0) for x in COUNTERS])
+        os.makedirs(self.directory, exist_ok=True)
+        self._size = sum([os.path.getsize(f) for f, _ in self._entries()])
+
+    def _entries(self):
+        """
+        Lists all the files in the cache.
+
+        :return: the list of tuples of file name and modification time
+        :rtype: list
+        """
+        result = []
+        for root, _, files in os.walk(self.directory):
+            for f in files:
+                if f.endswith(CACHE_EXTENSION):
+                    path = os.path.join(root, f)
+                    try:
+                        result.append((path, os.path.getmtime(path)))
+                    except OSError:
+                        # removed by another process
+                        pass
+        return result
+
+    def _path(self, key: str) -> str:
+        """
+        Returns the file name for the key.
+
+        :param key: the key to get the file name for
+        :type key: str
+        :return: the file name
+        :rtype: str
+        """
+        return os.path.join(self.directory, key[:2], key + CACHE_EXTENSION)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value for the key.
+
+        :param key: the key to look up
+        :type key: str
+        :return: the value, None if not cached
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fp:
+                result = pickle.load(fp)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.counters[COUNTER_MISSES] += 1
+            return None
+        self.counters[COUNTER_HITS] += 1
+        return result
+
+    def put(self, key: str, value: Any):
+        """
+        Stores the value under the key, evicts the least recently used entries if the size limit gets exceeded.
+
+        :param key: the key to store the value under
+        :type key: str
+        :param value: the value to store
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to temp file first, so that other processes never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as fp:
+            pickle.dump(value, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        self._size += os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        if self._size > self.max_size:
+            self._evict()
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until the cache is within its size limit again.
+        """
+        entries = sorted(self._entries(), key=lambda x: x[1])
+        sizes = dict()
+        for path, _ in entries:
+            try:
+                sizes[path] = os.path.getsize(path)
+            except OSError:
+                sizes[path] = 0
+        self._size = sum(sizes.values())
+        for path, _ in entries:
+            if self._size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                self.counters[COUNTER_EVICTIONS] += 1
+            except OSError:
+                pass
+            self._size -= sizes[path]
+
+    def pop_counters(self) -> Dict[str, int]:
+        """
+        Returns the counters and resets them.
+
+        :return: the counters
+        :rtype: dict
+        """
+        result = self.counters
+        self.counters = dict([(x, 0) for x in COUNTERS])
+        return result
+
+    def add_counters(self, counters: Dict[str, int]):
+        """
+        Adds the counters, e.g., from a worker process.
+
+        :param counters: the counters to add
+        :type counters: dict
+        """
+        for k in counters:
+            self.counters[k] = self.counters.get(k, 0) + counters[k]
+
+    def log_counters(self):
+        """
+        Outputs the counters.
+        """
+        hits = self.counters[COUNTER_HITS]
+        misses = self.counters[COUNTER_MISSES]
+        ratio = hits / (hits + misses) if (hits + misses) > 0 else 0.0
+        self.logger.info("cache: %d hits, %d misses (%.1f%% hit rate), %d evictions, %.1f MB in use"
+                         % (hits, misses, ratio * 100.0, self.counters[COUNTER_EVICTIONS], self._size / 1024 / 1024))
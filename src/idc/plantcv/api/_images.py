@@ -0,0 +1,19 @@
+from PIL import Image
+
+
+def share_image(image: Image.Image) -> Image.Image:
+    """
+    Creates a new pillow image that shares the pixel data with the specified one, without copying it.
+    Both images get flagged as read-only, which makes pillow copy the pixel data of an image only
+    when it gets modified (copy-on-write).
+
+    :param image: the image to share
+    :type image: Image.Image
+    :return: the new image sharing the pixel data
+    :rtype: Image.Image
+    """
+    image.load()
+    image.readonly = 1
+    result = image._new(image.im)
+    result.readonly = 1
+    return result
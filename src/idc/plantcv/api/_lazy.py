@@ -0,0 +1,65 @@
+import importlib
+import sys
+from types import ModuleType
+
+
+class LazyModule:
+    """
+    Proxy for a module that only gets imported once one of its attributes gets accessed,
+    e.g., for avoiding the import of plantcv (and its dependencies) when merely listing plugins.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initializes the proxy.
+
+        :param name: the name of the module to import
+        :type name: str
+        """
+        self._name = name
+        self._module = None
+
+    def load(self) -> ModuleType:
+        """
+        Imports the module, if necessary.
+
+        :return: the module
+        :rtype: ModuleType
+        """
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def is_loaded(self) -> bool:
+        """
+        Returns whether the module has been imported already (by the proxy or elsewhere).
+
+        :return: True if imported
+        :rtype: bool
+        """
+        return self._name in sys.modules
+
+    def __getattr__(self, item):
+        """
+        Returns the attribute of the module, imports the module if necessary.
+
+        :param item: the name of the attribute
+        :type item: str
+        :return: the attribute
+        """
+        return getattr(self.load(), item)
+
+
+pcv = LazyModule("plantcv.plantcv")
+""" the plantcv module, imported on first use. """
+
+
+def load_plantcv() -> ModuleType:
+    """
+    Imports plantcv, if not already imported. To be called when initializing filters, so that
+    the import does not happen while processing the first record.
+
+    :return: the plantcv module
+    :rtype: ModuleType
+    """
+    return pcv.load()
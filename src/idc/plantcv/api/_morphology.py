@@ -0,0 +1,179 @@
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+ENGINE_PCV = "pcv"
+ENGINE_DISTANCE = "distance"
+ENGINE_RLE = "rle"
+MORPHOLOGY_ENGINES = [
+    ENGINE_PCV,
+    ENGINE_DISTANCE,
+    ENGINE_RLE,
+]
+
+SHAPE_SQUARE = "square"
+SHAPE_DISC = "disc"
+SHAPE_CROSS = "cross"
+SHAPES = [
+    SHAPE_SQUARE,
+    SHAPE_DISC,
+    SHAPE_CROSS,
+]
+
+MAX_PRECISE_RADIUS = 500
+""" up to which radius the float32 distances of OpenCV are precise enough for a disc. """
+
+
+def is_binary(array: np.ndarray) -> bool:
+    """
+    Checks whether the array contains at most two values, one of them 0.
+
+    :param array: the array to check
+    :type array: np.ndarray
+    :return: True if binary
+    :rtype: bool
+    """
+    if array.ndim != 2:
+        return False
+    max_value = array.max(initial=0)
+    return not np.any((array != 0) & (array != max_value))
+
+
+def kernel_extents(kernel_size: int, num_iterations: int) -> Tuple[int, int]:
+    """
+    Returns how far a square kernel applied the specified number of times reaches before and after a pixel.
+    Uses the same (center) anchor as OpenCV, which makes the extents asymmetric for even kernel sizes.
+
+    :param kernel_size: the size of the square kernel
+    :type kernel_size: int
+    :param num_iterations: the number of iterations
+    :type num_iterations: int
+    :return: the tuple of reach before and after
+    :rtype: tuple
+    """
+    return num_iterations * (kernel_size // 2), num_iterations * (kernel_size - 1 - kernel_size // 2)
+
+
+def structuring_element(kernel_size: int, num_iterations: int, shape: str) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """
+    Generates the structuring element that has the same reach as the square kernel being applied the specified
+    number of times, for use with OpenCV on grayscale images.
+
+    :param kernel_size: the size of the kernel
+    :type kernel_size: int
+    :param num_iterations: the number of iterations
+    :type num_iterations: int
+    :param shape: the shape of the structuring element (square/disc/cross)
+    :type shape: str
+    :return: the tuple of structuring element and anchor (x, y)
+    :rtype: tuple
+    """
+    if shape == SHAPE_DISC:
+        radius = (kernel_size - 1) * num_iterations / 2.0
+        r = int(radius)
+        y, x = np.mgrid[-r:r + 1, -r:r + 1]
+        return ((x * x + y * y) <= radius * radius).astype(np.uint8), (r, r)
+    before, after = kernel_extents(kernel_size, num_iterations)
+    size = before + after + 1
+    if shape == SHAPE_SQUARE:
+        return np.ones((size, size), dtype=np.uint8), (before, before)
+    elif shape == SHAPE_CROSS:
+        kernel = np.zeros((size, size), dtype=np.uint8)
+        kernel[before, :] = 1
+        kernel[:, before] = 1
+        return kernel, (before, before)
+    else:
+        raise Exception("Unsupported shape: %s" % shape)
+
+
+def _line_morphology(mask: np.ndarray, axis: int, before: int, after: int, erode: bool) -> np.ndarray:
+    """
+    Erodes or dilates the mask along the axis with a line-shaped element, using cumulative sums.
+    Pixels outside the mask are ignored.
+
+    :param mask: the boolean mask to process
+    :type mask: np.ndarray
+    :param axis: the axis to process along
+    :type axis: int
+    :param before: how far the element reaches before the pixel
+    :type before: int
+    :param after: how far the element reaches after the pixel
+    :type after: int
+    :param erode: whether to erode or dilate
+    :type erode: bool
+    :return: the processed mask
+    :rtype: np.ndarray
+    """
+    n = mask.shape[axis]
+    before = min(before, n)
+    after = min(after, n)
+    lines = np.moveaxis(mask, axis, 0)
+    # padded cumulative sums, so that the window counts can be computed with slices
+    sums = np.zeros((before + n + after + 1,) + lines.shape[1:], dtype=np.int32)
+    np.cumsum(lines, axis=0, dtype=np.int32, out=sums[before + 1:before + n + 1])
+    sums[before + n + 1:] = sums[before + n]
+    counts = sums[before + after + 1:] - sums[:n]
+    if erode:
+        x = np.arange(n)
+        sizes = np.minimum(x + after, n - 1) + 1 - np.maximum(x - before, 0)
+        result = counts == sizes.reshape((n,) + (1,) * (lines.ndim - 1))
+    else:
+        result = counts > 0
+    return np.moveaxis(result, 0, axis)
+
+
+def distance_morphology(array: np.ndarray, kernel_size: int, num_iterations: int, shape: str, erode: bool) -> np.ndarray:
+    """
+    Erodes or dilates a binary image using distance transforms (or running sums for line-shaped elements),
+    i.e., the cost does not depend on the kernel size or the number of iterations. The structuring element has the same reach as the square kernel being applied
+    the specified number of times. For the square element, the result is identical to OpenCV/plantcv.
+
+    :param array: the binary image to process (0 and one other value)
+    :type array: np.ndarray
+    :param kernel_size: the size of the kernel
+    :type kernel_size: int
+    :param num_iterations: the number of iterations
+    :type num_iterations: int
+    :param shape: the shape of the structuring element (square/disc/cross)
+    :type shape: str
+    :param erode: whether to erode or dilate
+    :type erode: bool
+    :return: the processed image, using the same values as the input
+    :rtype: np.ndarray
+    """
+    max_value = array.max(initial=0)
+    mask = array > 0
+    # nothing to erode or dilate?
+    if (max_value == 0) or mask.all():
+        return array.copy()
+    # the distance transforms compute the distance to the nearest 0 pixel
+    src = mask.astype(np.uint8) if erode else (~mask).astype(np.uint8)
+    before, after = kernel_extents(kernel_size, num_iterations)
+    if (shape == SHAPE_SQUARE) and (before == after):
+        dist = cv2.distanceTransform(src, cv2.DIST_C, 3)
+        mask = (dist > before) if erode else (dist <= before)
+    elif shape == SHAPE_SQUARE:
+        mask = _line_morphology(_line_morphology(mask, 1, before, after, erode), 0, before, after, erode)
+    elif shape == SHAPE_CROSS:
+        if erode:
+            mask = _line_morphology(mask, 1, before, after, True) & _line_morphology(mask, 0, before, after, True)
+        else:
+            mask = _line_morphology(mask, 1, before, after, False) | _line_morphology(mask, 0, before, after, False)
+    elif shape == SHAPE_DISC:
+        radius = (kernel_size - 1) * num_iterations / 2.0
+        if radius <= MAX_PRECISE_RADIUS:
+            # squared distances are integers and the squared radius a multiple of 0.25, i.e., the margin
+            # of 0.125 accounts for the float32 precision of the OpenCV transform
+            dist = cv2.distanceTransform(src, cv2.DIST_L2, cv2.DIST_MASK_PRECISE).astype(np.float64)
+            dist *= dist
+            threshold = radius * radius + 0.125
+        else:
+            # deferred import, scipy is only required for large discs
+            from scipy.ndimage import distance_transform_edt
+            dist = distance_transform_edt(src)
+            threshold = radius
+        mask = (dist > threshold) if erode else (dist <= threshold)
+    else:
+        raise Exception("Unsupported shape: %s" % shape)
+    return np.where(mask, max_value, 0).astype(array.dtype)
@@ -0,0 +1,242 @@
+from typing import Dict, Iterable, List, Optional
+
+import cv2
+import numpy as np
+from wai.common.adams.imaging.locateobjects import LocatedObject, LocatedObjects
+
+KEY_TYPE = "type"
+""" the meta-data key for the type of point. """
+
+KEY_CENTROID_X = "centroid_x"
+""" the meta-data key for the x of the centroid of a cluster of points. """
+
+KEY_CENTROID_Y = "centroid_y"
+""" the meta-data key for the y of the centroid of a cluster of points. """
+
+KEY_NUM_PIXELS = "num_pixels"
+""" the meta-data key for the number of pixels in a cluster of points. """
+
+
+class PointSet(LocatedObjects):
+    """
+    Compact, columnar container for point annotations: the coordinates (and any further numeric meta-data)
+    of a group of points are stored in numpy arrays, the type of point only once per group.
+    The LocatedObject instances only get generated once the objects get accessed (e.g., by a writer),
+    whereas the length is available without generating them. Pickling/copying an unaccessed set only
+    involves the arrays.
+    """
+
+    def __init__(self, objects: Optional[Iterable[LocatedObject]] = None):
+        """
+        Initializes the set.
+
+        :param objects: the objects to initialize the set with
+        :type objects: list
+        """
+        self._groups = []
+        self._objects = None
+        super().__init__(objects)
+        if objects is None:
+            # no objects generated yet
+            self._objects = None
+
+    @property
+    def data(self) -> List[LocatedObject]:
+        """
+        Returns the objects, generates them from the point groups if necessary.
+
+        :return: the objects
+        :rtype: list
+        """
+        if self._groups:
+            objects = [] if self._objects is None else self._objects
+            for group in self._groups:
+                objects.extend(group_to_locatedobjects(group))
+            self._objects = objects
+            self._groups = []
+        elif self._objects is None:
+            self._objects = []
+        return self._objects
+
+    @data.setter
+    def data(self, objects: List[LocatedObject]):
+        """
+        Sets the objects, replacing any point groups.
+
+        :param objects: the objects to use
+        :type objects: list
+        """
+        self._objects = objects
+        self._groups = []
+
+    def add_points(self, point_type: str, x: np.ndarray, y: np.ndarray, width: np.ndarray = None, height: np.ndarray = None,
+                   metadata: Dict[str, np.ndarray] = None):
+        """
+        Appends a group of points.
+
+        :param point_type: the type of the points, stored in the meta-data under 'type'
+        :type point_type: str
+        :param x: the x coordinates
+        :type x: np.ndarray
+        :param y: the y coordinates
+        :type y: np.ndarray
+        :param width: the widths, None for 1
+        :type width: np.ndarray
+        :param height: the heights, None for 1
+        :type height: np.ndarray
+        :param metadata: further meta-data, with one value per point
+        :type metadata: dict
+        """
+        group = {
+            KEY_TYPE: point_type,
+            "x": np.asarray(x, dtype=np.int32),
+            "y": np.asarray(y, dtype=np.int32),
+            "width": None if width is None else np.asarray(width, dtype=np.int32),
+            "height": None if height is None else np.asarray(height, dtype=np.int32),
+            "metadata": dict() if metadata is None else dict(metadata),
+        }
+        if self._objects:
+            # keep the order of the objects
+            self._objects.extend(group_to_locatedobjects(group))
+        else:
+            self._groups.append(group)
+
+    def is_compact(self) -> bool:
+        """
+        Returns whether the objects have not been generated yet.
+
+        :return: True if only the point groups are present
+        :rtype: bool
+        """
+        return self._objects is None
+
+    def num_points(self, point_type: str = None) -> int:
+        """
+        Returns the number of points.
+
+        :param point_type: the type of points to count, None for all
+        :type point_type: str
+        :return: the number of points
+        :rtype: int
+        """
+        if not self.is_compact():
+            if point_type is None:
+                return len(self._objects) + sum([len(group["x"]) for group in self._groups])
+            return len([x for x in self.data if x.metadata.get(KEY_TYPE) == point_type])
+        return sum([len(group["x"]) for group in self._groups if (point_type is None) or (group[KEY_TYPE] == point_type)])
+
+    def to_locatedobjects(self) -> LocatedObjects:
+        """
+        Returns the points as regular located objects.
+
+        :return: the objects
+        :rtype: LocatedObjects
+        """
+        return LocatedObjects(self.data)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of objects, without generating them.
+
+        :return: the number of objects
+        :rtype: int
+        """
+        return self.num_points()
+
+    def extend(self, other):
+        """
+        Appends the objects, keeps the point groups of another compact set as they are.
+
+        :param other: the objects to append
+        """
+        if isinstance(other, PointSet) and other.is_compact():
+            for group in other._groups:
+                self.add_points(group[KEY_TYPE], group["x"], group["y"], width=group["width"], height=group["height"], metadata=group["metadata"])
+        else:
+            super().extend(other)
+
+    def __copy__(self):
+        """
+        Returns a shallow copy, the arrays of the point groups get shared.
+
+        :return: the copy
+        :rtype: PointSet
+        """
+        result = self.__class__.__new__(self.__class__)
+        result.__dict__.update(self.__dict__)
+        result._groups = list(self._groups)
+        if self._objects is not None:
+            result._objects = list(self._objects)
+        return result
+
+
+def group_to_locatedobjects(group: Dict) -> List[LocatedObject]:
+    """
+    Turns a group of points of a PointSet into located objects.
+
+    :param group: the group to convert
+    :type group: dict
+    :return: the objects
+    :rtype: list
+    """
+    point_type = group[KEY_TYPE]
+    xs = group["x"].tolist()
+    ys = group["y"].tolist()
+    widths = [1] * len(xs) if group["width"] is None else group["width"].tolist()
+    heights = [1] * len(xs) if group["height"] is None else group["height"].tolist()
+    if len(group["metadata"]) == 0:
+        return [LocatedObject(x, y, w, h, **{KEY_TYPE: point_type}) for x, y, w, h in zip(xs, ys, widths, heights)]
+    keys = list(group["metadata"].keys())
+    values = list(zip(*[group["metadata"][k].tolist() for k in keys]))
+    return [LocatedObject(x, y, w, h, **{KEY_TYPE: point_type}, **dict(zip(keys, v))) for x, y, w, h, v in zip(xs, ys, widths, heights, values)]
+
+
+def points_to_pointset(points: np.ndarray, point_type: str, cluster: bool = False) -> PointSet:
+    """
+    Turns the points image into a compact set of point annotations, either one 1x1 object per point pixel
+    or one object per cluster of 8-connected point pixels (bounding box, with centroid and pixel count
+    stored in the meta-data).
+
+    :param points: the image with the points, rest 0
+    :type points: np.ndarray
+    :param point_type: the type of point to store in the meta-data
+    :type point_type: str
+    :param cluster: whether to merge connected point pixels into a single object
+    :type cluster: bool
+    :return: the annotations
+    :rtype: PointSet
+    """
+    result = PointSet()
+    if not cluster:
+        ys, xs = np.nonzero(points)
+        result.add_points(point_type, xs, ys)
+        return result
+
+    num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats((points > 0).astype(np.uint8), connectivity=8)
+    # OpenCV does not number the clusters in raster order, sort them by their first pixel
+    _, first = np.unique(labels[labels > 0], return_index=True)
+    order = np.argsort(first) + 1
+    stats = stats[order]
+    centroids = centroids[order]
+    result.add_points(point_type, stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP],
+                      width=stats[:, cv2.CC_STAT_WIDTH], height=stats[:, cv2.CC_STAT_HEIGHT],
+                      metadata={KEY_CENTROID_X: centroids[:, 0], KEY_CENTROID_Y: centroids[:, 1], KEY_NUM_PIXELS: stats[:, cv2.CC_STAT_AREA]})
+    return result
+
+
+def points_to_locatedobjects(points: np.ndarray, point_type: str, cluster: bool = False) -> LocatedObjects:
+    """
+    Turns the points image into object detection annotations, either one 1x1 object per point pixel
+    or one object per cluster of 8-connected point pixels (bounding box, with centroid and pixel count
+    stored in the meta-data).
+
+    :param points: the image with the points, rest 0
+    :type points: np.ndarray
+    :param point_type: the type of point to store in the meta-data
+    :type point_type: str
+    :param cluster: whether to merge connected point pixels into a single object
+    :type cluster: bool
+    :return: the annotations
+    :rtype: LocatedObjects
+    """
+    return points_to_pointset(points, point_type, cluster=cluster).to_locatedobjects()
@@ -0,0 +1,114 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from typing import Any, Dict, List
+
+from ._lazy import pcv
+
+_worker_handler = None
+""" the handler that processes the records within a worker process. """
+
+
+def add_num_workers_param(parser: argparse.ArgumentParser):
+    """
+    Adds the -w/--num_workers option to the parser.
+
+    :param parser: the parser to append
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument("-w", "--num_workers", type=int, help="The number of worker processes to distribute the records of a batch across, processes sequentially if less than 2. Only has an effect if the filter receives batches of records, e.g., in batch mode.", default=1, required=False)
+
+
+def _init_worker(handler, params: Dict[str, Any]):
+    """
+    Initializes a worker process, i.e., stores the handler and configures plantcv once.
+    The counters that the handler accumulated in the parent process before the pool got created
+    get discarded, as the parent still has them.
+
+    :param handler: the handler that processes the records, must have _process_record and _pop_worker_counters methods
+    :param params: the plantcv parameters to apply
+    :type params: dict
+    """
+    global _worker_handler
+    _worker_handler = handler
+    _worker_handler._pop_worker_counters()
+    for k in params:
+        setattr(pcv.params, k, params[k])
+    pcv.params.debug = None
+
+
+def _process_in_worker(item):
+    """
+    Processes a single record within a worker process.
+
+    :param item: the record to process
+    :return: the tuple of processed record, process ID, processing time in seconds and the counters of the handler
+    :rtype: tuple
+    """
+    start = time.perf_counter()
+    result = _worker_handler._process_record(item)
+    # observations recorded by plantcv never get collected from the workers
+    pcv.outputs.clear()
+    return result, os.getpid(), time.perf_counter() - start, _worker_handler._pop_worker_counters()
+
+
+class WorkerPool:
+    """
+    Distributes records across a pool of worker processes, keeping the order of the records.
+    """
+
+    def __init__(self, handler, num_workers: int, logger: logging.Logger):
+        """
+        Initializes the pool.
+
+        :param handler: the handler that processes the records, must have _process_record, _pop_worker_counters
+                        and _add_worker_counters methods
+        :param num_workers: the number of worker processes to use
+        :type num_workers: int
+        :param logger: the logger to use for outputting the statistics
+        :type logger: logging.Logger
+        """
+        self.handler = handler
+        self.num_workers = num_workers
+        self.logger = logger
+        self._pool = None
+        self._stats = dict()
+
+    def map(self, items: List) -> List:
+        """
+        Processes the records in the worker processes.
+
+        :param items: the records to process
+        :type items: list
+        :return: the processed records, same order as the input
+        :rtype: list
+        """
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(processes=self.num_workers, initializer=_init_worker,
+                                              initargs=(self.handler, dict(vars(pcv.params))))
+        result = []
+        for item_new, pid, duration, counters in self._pool.imap(_process_in_worker, items):
+            self.handler._add_worker_counters(counters)
+            if pid not in self._stats:
+                self._stats[pid] = [0, 0.0]
+            self._stats[pid][0] += 1
+            self._stats[pid][1] += duration
+            result.append(item_new)
+        return result
+
+    def close(self):
+        """
+        Shuts down the worker processes and outputs the throughput per worker.
+        """
+        if self._pool is None:
+            return
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+        for i, pid in enumerate(sorted(self._stats.keys())):
+            count, duration = self._stats[pid]
+            rate = count / duration if duration > 0 else 0.0
+            self.logger.info("worker #%d (pid %d): %d records in %.3f sec (%.2f records/sec)" % (i + 1, pid, count, duration, rate))
+        self._stats = dict()
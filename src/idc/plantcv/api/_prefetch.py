@@ -0,0 +1,110 @@
+import argparse
+import queue
+import threading
+from typing import Any, Callable, Iterator, List, Tuple
+
+_END = object()
+""" marks the end of the prefetched items. """
+
+
+def add_prefetch_param(parser: argparse.ArgumentParser):
+    """
+    Adds the -R/--prefetch option to the parser.
+
+    :param parser: the parser to append
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument("-R", "--prefetch", type=int, help="The number of records of a batch to decode and convert in a background thread ahead of the record being processed (i.e., the queue depth, which caps the memory), 0 to disable. Only has an effect if the filter receives batches of records and does not use multiple worker processes.", default=0, required=False)
+
+
+class Prefetcher:
+    """
+    Applies a function to the items in a background thread, staying at most the specified number of items
+    ahead of the consumer. Iterating yields tuples of item and result, in the order of the items.
+    Exceptions raised by the function get re-raised when reaching the item.
+    """
+
+    def __init__(self, items: List, func: Callable[[Any], Any], depth: int, name: str = None):
+        """
+        Initializes the prefetcher.
+
+        :param items: the items to prefetch
+        :type items: list
+        :param func: the function to apply to each item
+        :param depth: the maximum number of items to prepare ahead, at least 1
+        :type depth: int
+        :param name: the name of the background thread
+        :type name: str
+        """
+        if depth < 1:
+            raise Exception("Prefetch depth must be at least 1, current: %s" % str(depth))
+        self.items = items
+        self.func = func
+        self.depth = depth
+        self.name = name
+        self._queue = None
+        self._stop = None
+        self._thread = None
+
+    def _run(self):
+        """
+        Prepares the items, executed in the background thread.
+        """
+        for item in self.items:
+            if self._stop.is_set():
+                return
+            try:
+                entry = (item, self.func(item), None)
+            except Exception as e:
+                entry = (item, None, e)
+            if not self._put(entry) or (entry[2] is not None):
+                return
+        self._put(_END)
+
+    def _put(self, entry) -> bool:
+        """
+        Adds the entry to the queue, waiting for space unless the consumer stopped.
+
+        :param entry: the entry to add
+        :return: True if added, False if the consumer stopped
+        :rtype: bool
+        """
+        while not self._stop.is_set():
+            try:
+                self._queue.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __iter__(self) -> Iterator[Tuple[Any, Any]]:
+        """
+        Yields the items with their results.
+
+        :return: the iterator over the item/result tuples
+        """
+        self._queue = queue.Queue(maxsize=self.depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                entry = self._queue.get()
+                if entry is _END:
+                    break
+                item, result, error = entry
+                if error is not None:
+                    raise error
+                yield item, result
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Stops the background thread.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
@@ -0,0 +1,381 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from ._fill import CONNECTIVITIES, size_inclusive
+from ._morphology import SHAPE_SQUARE, SHAPE_CROSS, kernel_extents
+
+RLE_SHAPES = [
+    SHAPE_SQUARE,
+    SHAPE_CROSS,
+]
+
+ENCODE_STRIP = 1024
+""" the number of rows to encode at a time, limits the size of the temporary arrays. """
+
+
+class RLEMask:
+    """
+    Run-length encoded binary mask, i.e., the foreground stored as runs [start, end) per row,
+    sorted by row and start. Memory and processing time are proportional to the number of runs
+    rather than the image area.
+    """
+
+    def __init__(self, shape: Tuple[int, int], rows: np.ndarray, starts: np.ndarray, ends: np.ndarray, value: int = 255):
+        """
+        Initializes the mask.
+
+        :param shape: the shape of the mask (height, width)
+        :type shape: tuple
+        :param rows: the rows of the runs
+        :type rows: np.ndarray
+        :param starts: the first column of the runs
+        :type starts: np.ndarray
+        :param ends: the column after the last one of the runs
+        :type ends: np.ndarray
+        :param value: the value of the foreground pixels
+        :type value: int
+        """
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.rows = rows
+        self.starts = starts
+        self.ends = ends
+        self.value = value
+
+    @classmethod
+    def from_array(cls, array: np.ndarray, binary_only: bool = False) -> Optional['RLEMask']:
+        """
+        Encodes the non-zero pixels of the binary image.
+
+        :param array: the image to encode
+        :type array: np.ndarray
+        :param binary_only: whether to return None if the non-zero pixels have different values
+        :type binary_only: bool
+        :return: the mask, using the maximum value of the image as foreground value
+        :rtype: RLEMask
+        """
+        height, width = array.shape
+        rows = []
+        starts = []
+        ends = []
+        value = 0
+        value_min = None
+        for y in range(0, height, ENCODE_STRIP):
+            block = array[y:y + ENCODE_STRIP]
+            if block.dtype != np.uint8:
+                block = (block != 0).astype(np.uint8)
+            flat = np.ascontiguousarray(block).reshape(-1)
+            # scan 8 pixels at a time, only the non-zero words get inspected pixel by pixel
+            num_words = len(flat) // 8
+            words = np.flatnonzero(flat[:num_words * 8].view(np.uint64))
+            candidates = np.concatenate([(words[:, None] * 8 + np.arange(8)).ravel(), np.arange(num_words * 8, len(flat))])
+            pixels = candidates[flat[candidates] != 0]
+            if len(pixels) == 0:
+                continue
+            values = flat[pixels]
+            value = max(value, int(values.max()))
+            value_min = int(values.min()) if value_min is None else min(value_min, int(values.min()))
+            if binary_only and (value_min != value):
+                return None
+            # a new run begins wherever pixels are not consecutive or a new row begins
+            first = np.ones(len(pixels), dtype=bool)
+            first[1:] = (np.diff(pixels) != 1) | (pixels[1:] % width == 0)
+            last = np.ones(len(pixels), dtype=bool)
+            last[:-1] = first[1:]
+            rows.append(pixels[first] // width + y)
+            starts.append(pixels[first] % width)
+            ends.append(pixels[last] % width + 1)
+        if len(rows) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return RLEMask(array.shape, empty, empty.copy(), empty.copy())
+        return RLEMask(array.shape, np.concatenate(rows).astype(np.int64), np.concatenate(starts).astype(np.int64),
+                       np.concatenate(ends).astype(np.int64), value=value if array.dtype == np.uint8 else 255)
+
+    def to_array(self, dtype=np.uint8) -> np.ndarray:
+        """
+        Decodes the mask into a dense image.
+
+        :param dtype: the data type of the image
+        :return: the image, foreground pixels use the value of the mask
+        :rtype: np.ndarray
+        """
+        result = np.zeros(self.shape, dtype=dtype)
+        lengths = self.ends - self.starts
+        total = int(lengths.sum())
+        if total > 0:
+            offsets = self.rows * self.shape[1] + self.starts - (np.cumsum(lengths) - lengths)
+            result.ravel()[np.repeat(offsets, lengths) + np.arange(total)] = self.value
+        return result
+
+    @property
+    def num_runs(self) -> int:
+        """
+        Returns the number of runs.
+
+        :return: the number of runs
+        :rtype: int
+        """
+        return len(self.rows)
+
+    @property
+    def area(self) -> int:
+        """
+        Returns the number of foreground pixels.
+
+        :return: the number of pixels
+        :rtype: int
+        """
+        return int((self.ends - self.starts).sum())
+
+    def _with_runs(self, rows: np.ndarray, starts: np.ndarray, ends: np.ndarray, value: int = None) -> 'RLEMask':
+        """
+        Returns a new mask of the same shape with the specified runs.
+
+        :param rows: the rows of the runs
+        :type rows: np.ndarray
+        :param starts: the first column of the runs
+        :type starts: np.ndarray
+        :param ends: the column after the last one of the runs
+        :type ends: np.ndarray
+        :param value: the foreground value, uses the one of this mask if None
+        :type value: int
+        :return: the new mask
+        :rtype: RLEMask
+        """
+        return RLEMask(self.shape, rows, starts, ends, value=self.value if value is None else value)
+
+
+def _merge_runs(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray, width: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sorts the runs and merges overlapping or adjacent runs within the same row.
+
+    :param rows: the rows of the runs
+    :type rows: np.ndarray
+    :param starts: the first column of the runs
+    :type starts: np.ndarray
+    :param ends: the column after the last one of the runs
+    :type ends: np.ndarray
+    :param width: the width of the mask
+    :type width: int
+    :return: the tuple of rows, starts and ends
+    :rtype: tuple
+    """
+    if len(rows) == 0:
+        return rows, starts, ends
+    keep = starts < ends
+    rows, starts, ends = rows[keep], starts[keep], ends[keep]
+    # keys are ordered across rows, as columns never exceed the width
+    start_keys = rows * (width + 1) + starts
+    order = np.argsort(start_keys, kind="stable")
+    rows, starts, ends, start_keys = rows[order], starts[order], ends[order], start_keys[order]
+    max_end_keys = np.maximum.accumulate(rows * (width + 1) + ends)
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = start_keys[1:] > max_end_keys[:-1]
+    group_ends = np.maximum.reduceat(ends, np.flatnonzero(first))
+    return rows[first], starts[first], group_ends
+
+
+def _complement_runs(mask: RLEMask) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Determines the runs of the background, including rows without any foreground.
+
+    :param mask: the mask to get the background for
+    :type mask: RLEMask
+    :return: the tuple of rows, starts and ends
+    :rtype: tuple
+    """
+    height, width = mask.shape
+    all_rows = np.arange(height, dtype=np.int64)
+    # every row has one more background candidate than foreground runs: [0, s0), [e0, s1), ..., [en, width)
+    start_rows = np.concatenate([all_rows, mask.rows])
+    start_cols = np.concatenate([np.zeros(height, dtype=np.int64), mask.ends])
+    end_rows = np.concatenate([mask.rows, all_rows])
+    end_cols = np.concatenate([mask.starts, np.full(height, width, dtype=np.int64)])
+    start_order = np.lexsort((start_cols, start_rows))
+    end_order = np.lexsort((end_cols, end_rows))
+    rows = start_rows[start_order]
+    starts = start_cols[start_order]
+    ends = end_cols[end_order]
+    keep = starts < ends
+    return rows[keep], starts[keep], ends[keep]
+
+
+def _dilate_horizontal(mask: RLEMask, before: int, after: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Dilates the runs along the rows.
+
+    :param mask: the mask to dilate
+    :type mask: RLEMask
+    :param before: how far the element reaches before the pixel
+    :type before: int
+    :param after: how far the element reaches after the pixel
+    :type after: int
+    :return: the tuple of rows, starts and ends
+    :rtype: tuple
+    """
+    width = mask.shape[1]
+    return _merge_runs(mask.rows, np.maximum(mask.starts - after, 0), np.minimum(mask.ends + before, width), width)
+
+
+def _dilate_vertical(mask: RLEMask, before: int, after: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Dilates the runs along the columns, i.e., copies each run into the rows within reach.
+
+    :param mask: the mask to dilate
+    :type mask: RLEMask
+    :param before: how far the element reaches before the pixel
+    :type before: int
+    :param after: how far the element reaches after the pixel
+    :type after: int
+    :return: the tuple of rows, starts and ends
+    :rtype: tuple
+    """
+    height, width = mask.shape
+    offsets = np.arange(-after, before + 1, dtype=np.int64)
+    rows = (mask.rows[:, None] + offsets[None, :]).ravel()
+    starts = np.repeat(mask.starts, len(offsets))
+    ends = np.repeat(mask.ends, len(offsets))
+    keep = (rows >= 0) & (rows < height)
+    return _merge_runs(rows[keep], starts[keep], ends[keep], width)
+
+
+def _dilate(mask: RLEMask, before: int, after: int, shape: str) -> RLEMask:
+    """
+    Dilates the mask with a square or cross-shaped element.
+
+    :param mask: the mask to dilate
+    :type mask: RLEMask
+    :param before: how far the element reaches before the pixel
+    :type before: int
+    :param after: how far the element reaches after the pixel
+    :type after: int
+    :param shape: the shape of the element (square/cross)
+    :type shape: str
+    :return: the dilated mask
+    :rtype: RLEMask
+    """
+    if shape == SHAPE_SQUARE:
+        horizontal = mask._with_runs(*_dilate_horizontal(mask, before, after))
+        return mask._with_runs(*_dilate_vertical(horizontal, before, after))
+    elif shape == SHAPE_CROSS:
+        h_rows, h_starts, h_ends = _dilate_horizontal(mask, before, after)
+        v_rows, v_starts, v_ends = _dilate_vertical(mask, before, after)
+        return mask._with_runs(*_merge_runs(np.concatenate([h_rows, v_rows]), np.concatenate([h_starts, v_starts]),
+                                            np.concatenate([h_ends, v_ends]), mask.shape[1]))
+    else:
+        raise Exception("Unsupported shape: %s" % shape)
+
+
+def rle_morphology(mask: RLEMask, kernel_size: int, num_iterations: int, shape: str, erode: bool) -> RLEMask:
+    """
+    Erodes or dilates the run-length encoded mask, with the structuring element reaching as far as the square kernel
+    being applied the specified number of times. For the square element, the result is identical to OpenCV/plantcv
+    (pixels outside the image do not influence the result). Erosion gets performed as dilation of the background.
+
+    :param mask: the mask to process
+    :type mask: RLEMask
+    :param kernel_size: the size of the kernel
+    :type kernel_size: int
+    :param num_iterations: the number of iterations
+    :type num_iterations: int
+    :param shape: the shape of the structuring element (square/cross)
+    :type shape: str
+    :param erode: whether to erode or dilate
+    :type erode: bool
+    :return: the processed mask
+    :rtype: RLEMask
+    """
+    if shape not in RLE_SHAPES:
+        raise Exception("Unsupported shape: %s" % shape)
+    before, after = kernel_extents(kernel_size, num_iterations)
+    if not erode:
+        return _dilate(mask, before, after, shape)
+    background = mask._with_runs(*_complement_runs(mask))
+    return mask._with_runs(*_complement_runs(_dilate(background, before, after, shape)))
+
+
+def _label_runs(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray, width: int, connectivity: int) -> np.ndarray:
+    """
+    Determines the connected components of the (sorted) runs, runs in neighbouring rows are connected if they overlap.
+
+    :param rows: the rows of the runs
+    :type rows: np.ndarray
+    :param starts: the first column of the runs
+    :type starts: np.ndarray
+    :param ends: the column after the last one of the runs
+    :type ends: np.ndarray
+    :param width: the width of the mask
+    :type width: int
+    :param connectivity: the connectivity (4/8)
+    :type connectivity: int
+    :return: the component label per run
+    :rtype: np.ndarray
+    """
+    if connectivity not in CONNECTIVITIES:
+        raise Exception("Unsupported connectivity: %s" % str(connectivity))
+    num = len(rows)
+    if num == 0:
+        return np.zeros(0, dtype=np.int64)
+    # deferred import, scipy is only required for the rle engine
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    diagonal = 1 if connectivity == 8 else 0
+    stride = width + 1
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+    # runs in the row above that end after the start and start before the end of the run
+    above = (rows - 1) * stride
+    lo = np.searchsorted(end_keys, above + starts - diagonal, side="right")
+    hi = np.searchsorted(start_keys, above + ends + diagonal, side="left")
+    counts = np.maximum(hi - lo, 0)
+    total = int(counts.sum())
+    current = np.repeat(np.arange(num), counts)
+    other = np.repeat(lo - (np.cumsum(counts) - counts), counts) + np.arange(total)
+    graph = coo_matrix((np.ones(total, dtype=np.int8), (current, other)), shape=(num, num))
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+
+def rle_fill(mask: RLEMask, size: int, connectivity: int = 4) -> RLEMask:
+    """
+    Removes all objects smaller than the specified size from the run-length encoded mask.
+    With 4-connectivity, the result is identical to plantcv.fill.
+
+    :param mask: the mask to process
+    :type mask: RLEMask
+    :param size: the minimum object area size in pixels
+    :type size: int
+    :param connectivity: the connectivity to use for determining the objects (4/8)
+    :type connectivity: int
+    :return: the filtered mask (value 255)
+    :rtype: RLEMask
+    """
+    labels = _label_runs(mask.rows, mask.starts, mask.ends, mask.shape[1], connectivity)
+    areas = np.bincount(labels, weights=mask.ends - mask.starts)
+    keep = (areas > size) if size_inclusive() else (areas >= size)
+    keep = keep[labels]
+    return mask._with_runs(mask.rows[keep], mask.starts[keep], mask.ends[keep], value=255)
+
+
+def rle_fill_holes(mask: RLEMask, max_hole_size: int = None) -> RLEMask:
+    """
+    Fills the holes in the run-length encoded mask, i.e., the 4-connected background components not touching
+    the image border. Without a maximum hole size, the result is identical to plantcv.fill_holes.
+
+    :param mask: the mask to process
+    :type mask: RLEMask
+    :param max_hole_size: the maximum area in pixels of holes to fill, None for filling all holes
+    :type max_hole_size: int
+    :return: the filled mask (value 255)
+    :rtype: RLEMask
+    """
+    height, width = mask.shape
+    rows, starts, ends = _complement_runs(mask)
+    labels = _label_runs(rows, starts, ends, width, 4)
+    on_border = (rows == 0) | (rows == height - 1) | (starts == 0) | (ends == width)
+    fill = np.bincount(labels, weights=on_border) == 0
+    if max_hole_size is not None:
+        fill &= np.bincount(labels, weights=ends - starts) <= max_hole_size
+    fill = fill[labels]
+    return mask._with_runs(*_merge_runs(np.concatenate([mask.rows, rows[fill]]), np.concatenate([mask.starts, starts[fill]]),
+                                        np.concatenate([mask.ends, ends[fill]]), width), value=255)
@@ -0,0 +1,94 @@
+import argparse
+from typing import List, Tuple
+
+ROI_FULL = "full"
+ROI_ANNOTATIONS = "annotations"
+ROI_MODES = [
+    ROI_FULL,
+    ROI_ANNOTATIONS,
+]
+
+
+def add_roi_param(parser: argparse.ArgumentParser):
+    """
+    Adds the -r/--roi option to the parser.
+
+    :param parser: the parser to append
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument("-r", "--roi", choices=ROI_MODES, help="The region of the image to process; '" + ROI_ANNOTATIONS + "' only updates the bounding boxes of object detection annotations and leaves the rest of the image unchanged; erode/dilate only process the boxes plus a margin of the kernel's reach and skeletonize plus its halo (overlapping regions get merged), whereas fill/fill-holes have to process the whole image as objects and holes can extend beyond the boxes; other data is always processed in full.", default=ROI_FULL, required=False)
+
+
+def _overlaps(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> bool:
+    """
+    Checks whether the two regions overlap.
+
+    :param a: the first region (y, y_end, x, x_end)
+    :type a: tuple
+    :param b: the second region (y, y_end, x, x_end)
+    :type b: tuple
+    :return: True if overlapping
+    :rtype: bool
+    """
+    return (a[0] < b[1]) and (b[0] < a[1]) and (a[2] < b[3]) and (b[2] < a[3])
+
+
+def _expand(region: Tuple[int, int, int, int], margin: int, shape: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    """
+    Expands the region by the margin, clipped to the image.
+
+    :param region: the region to expand (y, y_end, x, x_end)
+    :type region: tuple
+    :param margin: the number of pixels to add on each side
+    :type margin: int
+    :param shape: the shape of the image (height, width)
+    :type shape: tuple
+    :return: the expanded region (y, y_end, x, x_end)
+    :rtype: tuple
+    """
+    height, width = shape[:2]
+    return max(0, region[0] - margin), min(height, region[1] + margin), max(0, region[2] - margin), min(width, region[3] + margin)
+
+
+def annotation_regions(annotation, shape: Tuple[int, int], margin: int) -> List[Tuple[Tuple[int, int, int, int], List[Tuple[int, int, int, int]]]]:
+    """
+    Determines the regions to process for the bounding boxes of the located objects. Each box gets expanded
+    by the margin and boxes whose expanded regions overlap get merged, i.e., no pixel is part of more than one region.
+
+    :param annotation: the located objects, can be None
+    :param shape: the shape of the image (height, width)
+    :type shape: tuple
+    :param margin: the reach of the operation in pixels
+    :type margin: int
+    :return: the list of tuples of region to process and the boxes within it (to paste back), as (y, y_end, x, x_end)
+    :rtype: list
+    """
+    height, width = shape[:2]
+    boxes = []
+    if annotation is not None:
+        for obj in annotation:
+            y = max(0, int(obj.y))
+            x = max(0, int(obj.x))
+            y_end = min(height, int(obj.y) + int(obj.height))
+            x_end = min(width, int(obj.x) + int(obj.width))
+            if (y < y_end) and (x < x_end):
+                boxes.append((y, y_end, x, x_end))
+
+    # tuples of: bounding box of the merged boxes, expanded region, boxes
+    groups = [(x, _expand(x, margin, shape), [x]) for x in boxes]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(groups)):
+            for n in range(i + 1, len(groups)):
+                if _overlaps(groups[i][1], groups[n][1]):
+                    a = groups[i][0]
+                    b = groups[n][0]
+                    bbox = (min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3]))
+                    groups[i] = (bbox, _expand(bbox, margin, shape), groups[i][2] + groups[n][2])
+                    del groups[n]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [(x[1], x[2]) for x in groups]
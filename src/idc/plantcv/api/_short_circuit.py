@@ -0,0 +1,101 @@
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+
+CONSTANT_STRIP = 256
+""" the number of rows to check at a time when determining whether an image is constant. """
+
+COUNTER_CHECKED = "checked"
+COUNTER_SHORT_CIRCUITED = "short_circuited"
+SHORT_CIRCUIT_COUNTERS = [
+    COUNTER_CHECKED,
+    COUNTER_SHORT_CIRCUITED,
+]
+
+
+def constant_value(array: np.ndarray) -> Optional[int]:
+    """
+    Determines whether all pixels have the same value, e.g., for empty or full masks.
+    Checks the image strip by strip, stopping at the first strip with a different value.
+
+    :param array: the image to check
+    :type array: np.ndarray
+    :return: the value of all pixels, None if not constant
+    :rtype: int
+    """
+    if array.size == 0:
+        return None
+    value = array.flat[0]
+    for start in range(0, array.shape[0], CONSTANT_STRIP):
+        if np.any(array[start:start + CONSTANT_STRIP] != value):
+            return None
+    return int(value)
+
+
+class ShortCircuits:
+    """
+    Counts the images/layers that got checked and the ones that could be short-circuited,
+    i.e., whose result was determined without processing them.
+    """
+
+    def __init__(self, logger: logging.Logger):
+        """
+        Initializes the counters.
+
+        :param logger: the logger to output the counters with
+        :type logger: logging.Logger
+        """
+        self.logger = logger
+        self.counters = self._empty()
+
+    def _empty(self) -> Dict[str, int]:
+        """
+        Returns the initial counters.
+
+        :return: the counters
+        :rtype: dict
+        """
+        return dict([(x, 0) for x in SHORT_CIRCUIT_COUNTERS])
+
+    def add(self, short_circuited: bool):
+        """
+        Records a check.
+
+        :param short_circuited: whether the image/layer got short-circuited
+        :type short_circuited: bool
+        """
+        self.counters[COUNTER_CHECKED] += 1
+        if short_circuited:
+            self.counters[COUNTER_SHORT_CIRCUITED] += 1
+
+    def pop_counters(self) -> Dict[str, int]:
+        """
+        Returns the counters and resets them.
+
+        :return: the counters
+        :rtype: dict
+        """
+        result = self.counters
+        self.counters = self._empty()
+        return result
+
+    def add_counters(self, counters: Dict[str, int]):
+        """
+        Adds the counters, e.g., from a worker process.
+
+        :param counters: the counters to add
+        :type counters: dict
+        """
+        for k in counters:
+            self.counters[k] = self.counters.get(k, 0) + counters[k]
+
+    def log_counters(self):
+        """
+        Outputs the counters.
+        """
+        checked = self.counters[COUNTER_CHECKED]
+        short_circuited = self.counters[COUNTER_SHORT_CIRCUITED]
+        rate = short_circuited / checked * 100.0 if checked > 0 else 0.0
+        self.logger.info("short-circuits: %d of %d images/layers (%.1f%%) did not require processing (e.g., empty or full masks)"
+                         % (short_circuited, checked, rate))
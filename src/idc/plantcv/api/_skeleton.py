@@ -0,0 +1,225 @@
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+from ._morphology import ENGINE_PCV
+
+ENGINE_GRAPH = "graph"
+PRUNE_ENGINES = [
+    ENGINE_PCV,
+    ENGINE_GRAPH,
+]
+
+ENGINE_LUT = "lut"
+POINT_ENGINES = [
+    ENGINE_PCV,
+    ENGINE_LUT,
+]
+
+KEY_NUM_TIPS = "num_tips"
+KEY_NUM_BRANCH_POINTS = "num_branch_points"
+KEY_NUM_SEGMENTS = "num_segments"
+KEY_SKELETON_LENGTH = "skeleton_length"
+
+# In a template: 1 values line up with foreground, -1 with background and 0 is don't care.
+# Identical to the templates used by plantcv.morphology.find_tips/find_branch_pts.
+_TIP1 = np.array([[-1, -1, -1],
+                  [-1, 1, -1],
+                  [0, 1, 0]])
+_TIP2 = np.array([[-1, -1, -1],
+                  [-1, 1, 0],
+                  [-1, 0, 1]])
+_BRANCH_T1 = np.array([[-1, 1, -1],
+                       [1, 1, 1],
+                       [-1, -1, -1]])
+_BRANCH_T2 = np.array([[1, -1, 1],
+                       [-1, 1, -1],
+                       [1, -1, -1]])
+_BRANCH_Y1 = np.array([[1, -1, 1],
+                       [0, 1, 0],
+                       [0, 1, 0]])
+_BRANCH_Y2 = np.array([[-1, 1, -1],
+                       [1, 1, 0],
+                       [-1, 0, 1]])
+
+
+def _rotations(first: np.ndarray, second: np.ndarray) -> List[np.ndarray]:
+    """
+    Generates the eight templates from the two base templates, using the same rotations as plantcv.
+
+    :param first: the first base template
+    :type first: np.ndarray
+    :param second: the second base template
+    :type second: np.ndarray
+    :return: the templates
+    :rtype: list
+    """
+    result = [first, second]
+    for _ in range(3):
+        result.append(np.rot90(result[-2]))
+        result.append(np.rot90(result[-2]))
+    return result
+
+
+TIP_TEMPLATES = _rotations(_TIP1, _TIP2)
+""" the hit-or-miss templates for tips. """
+
+BRANCH_TEMPLATES = _rotations(_BRANCH_T1, _BRANCH_T2) + _rotations(_BRANCH_Y1, _BRANCH_Y2)
+""" the hit-or-miss templates for branch points. """
+
+NEIGHBOURHOOD_WEIGHTS = np.array([[1, 2, 4],
+                                  [128, 0, 8],
+                                  [64, 32, 16]], dtype=np.float32)
+""" the weights for encoding the 8-neighbourhood of a pixel as a single byte. """
+
+
+def _build_lut(templates: List[np.ndarray]) -> np.ndarray:
+    """
+    Generates the lookup table that determines for each of the 256 neighbourhood codes whether
+    any of the templates matches (assuming the center pixel is foreground).
+
+    :param templates: the hit-or-miss templates
+    :type templates: list
+    :return: the boolean lookup table
+    :rtype: np.ndarray
+    """
+    weights = NEIGHBOURHOOD_WEIGHTS.astype(np.int32)
+    result = np.zeros(256, dtype=bool)
+    for template in templates:
+        if template[1, 1] != 1:
+            raise Exception("Center of templates must be foreground!")
+        hit = int(weights[template == 1].sum())
+        miss = int(weights[template == -1].sum())
+        for code in range(256):
+            if ((code & hit) == hit) and ((code & miss) == 0):
+                result[code] = True
+    return result
+
+
+def _constrains_border(templates: List[np.ndarray]) -> bool:
+    """
+    Checks whether every template constrains all outer rows and columns. Since plantcv treats pixels
+    outside the image neither as foreground nor background, such templates never match on the image border.
+
+    :param templates: the templates to check
+    :type templates: list
+    :return: True if all outer rows/columns are constrained
+    :rtype: bool
+    """
+    for template in templates:
+        for line in [template[0, :], template[-1, :], template[:, 0], template[:, -1]]:
+            if not np.any(line != 0):
+                return False
+    return True
+
+
+TIP_LUT = _build_lut(TIP_TEMPLATES)
+""" the lookup table for tips. """
+
+BRANCH_LUT = _build_lut(BRANCH_TEMPLATES)
+""" the lookup table for branch points. """
+
+if not (_constrains_border(TIP_TEMPLATES) and _constrains_border(BRANCH_TEMPLATES)):
+    raise Exception("Templates must constrain the outer rows and columns!")
+
+
+def neighbourhood_codes(skeleton: np.ndarray) -> np.ndarray:
+    """
+    Encodes the 8-neighbourhood of every pixel as a single byte, using a single weighted convolution.
+
+    :param skeleton: the skeleton image, with foreground being non-zero
+    :type skeleton: np.ndarray
+    :return: the codes
+    :rtype: np.ndarray
+    """
+    binary = (skeleton > 0).astype(np.uint8)
+    return cv2.filter2D(binary, cv2.CV_8U, NEIGHBOURHOOD_WEIGHTS, borderType=cv2.BORDER_CONSTANT)
+
+
+def classify_skeleton(skeleton: np.ndarray, tips: bool = True, branch_points: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Determines tips and branch points of the skeleton in a single pass, identical to the template matching
+    of plantcv.morphology.find_tips/find_branch_pts.
+
+    :param skeleton: the skeleton image, with foreground being non-zero
+    :type skeleton: np.ndarray
+    :param tips: whether to determine the tips
+    :type tips: bool
+    :param branch_points: whether to determine the branch points
+    :type branch_points: bool
+    :return: the tuple of tips and branch points images (0/255), None if not requested
+    :rtype: tuple
+    """
+    codes = neighbourhood_codes(skeleton)
+    foreground = skeleton > 0
+    # templates never match on the image border
+    foreground[0, :] = False
+    foreground[-1, :] = False
+    foreground[:, 0] = False
+    foreground[:, -1] = False
+    tips_img = None
+    if tips:
+        tips_img = (TIP_LUT[codes] & foreground).astype(np.uint8) * 255
+    branch_img = None
+    if branch_points:
+        branch_img = (BRANCH_LUT[codes] & foreground).astype(np.uint8) * 255
+    return tips_img, branch_img
+
+
+def count_segments(skeleton: np.ndarray, branch_points: np.ndarray) -> int:
+    """
+    Counts the segments of the skeleton, i.e., the 8-connected pieces that remain after removing
+    the branch points and their direct neighbours (like plantcv.morphology.segment_skeleton).
+
+    :param skeleton: the skeleton image, with foreground being non-zero
+    :type skeleton: np.ndarray
+    :param branch_points: the branch points image, with foreground being non-zero
+    :type branch_points: np.ndarray
+    :return: the number of segments
+    :rtype: int
+    """
+    junctions = cv2.dilate((branch_points > 0).astype(np.uint8), np.ones((3, 3), np.uint8))
+    segments = ((skeleton > 0) & (junctions == 0)).astype(np.uint8)
+    num_labels, _ = cv2.connectedComponents(segments, connectivity=8)
+    return num_labels - 1
+
+
+def prune_skeleton(skeleton: np.ndarray, size: int) -> np.ndarray:
+    """
+    Prunes short terminal branches off the skeleton, identical to plantcv.morphology.prune.
+    The skeleton graph gets built once: the junctions are the (dilated) branch points and the edges the pixel runs
+    between them, with their length being the length of their contour (the same measure as plantcv uses).
+    Edges touching a tip that are no longer than the size get removed, except for the first edge (the
+    primary segment, like plantcv.morphology.segment_sort), followed by removing the remaining tips once.
+    Unlike plantcv, no images get drawn per edge and no segment objects are generated.
+
+    :param skeleton: the skeleton image (0/255)
+    :type skeleton: np.ndarray
+    :param size: the size to get pruned off each branch
+    :type size: int
+    :return: the pruned skeleton
+    :rtype: np.ndarray
+    """
+    result = skeleton.copy()
+    if size <= 0:
+        return result
+    kernel = np.ones((3, 3), np.uint8)
+    tips, branch_points = classify_skeleton(skeleton)
+    junctions = cv2.dilate(branch_points, kernel)
+    edges = np.where(junctions > 0, 0, skeleton).astype(np.uint8)
+    contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)[-2:]
+    terminal = cv2.dilate(tips, kernel) > 0
+    removed = []
+    for i, contour in enumerate(contours):
+        if (i == 0) or (len(contour) > size):
+            continue
+        points = contour[:, 0, :]
+        if terminal[points[:, 1], points[:, 0]].any():
+            removed.append(points)
+    if len(removed) > 0:
+        points = np.concatenate(removed)
+        result[points[:, 1], points[:, 0]] = 0
+    tips, _ = classify_skeleton(result, branch_points=False)
+    result[tips > 0] = 0
+    return result
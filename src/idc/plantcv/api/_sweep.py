@@ -0,0 +1,96 @@
+import itertools
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple, Union
+
+KEY_SWEEP_PREFIX = "sweep_"
+""" the prefix for the meta-data keys that store the parameters of a variant. """
+
+
+def single_value(values: Union[Any, List]) -> Union[Any, List]:
+    """
+    Returns the single value of a list parameter as is, e.g., as parsed via nargs.
+
+    :param values: the value(s) to check
+    :return: the single value or the list of values
+    """
+    if isinstance(values, list) and (len(values) == 1):
+        return values[0]
+    return values
+
+
+def sweep_combinations(handler, names: List[str]) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Determines the parameter combinations for the parameters of the handler that were specified as lists.
+
+    :param handler: the handler to get the parameter values from
+    :param names: the names of the parameters that can be specified as lists
+    :type names: list
+    :return: the tuple of names of the swept parameters and the combinations (name -> value, for all parameters),
+             empty lists if no parameter was specified as list
+    :rtype: tuple
+    """
+    values = []
+    swept = []
+    for name in names:
+        value = getattr(handler, name)
+        if isinstance(value, list):
+            if len(value) > 1:
+                swept.append(name)
+            values.append(value)
+        else:
+            values.append([value])
+    if len(swept) == 0:
+        return [], []
+    return swept, [dict(zip(names, x)) for x in itertools.product(*values)]
+
+
+@contextmanager
+def sweep_parameters(handler, combination: Dict[str, Any]):
+    """
+    Sets the parameters of the handler to the values of the combination for the duration of the context,
+    restoring the original values afterwards.
+
+    :param handler: the handler to update
+    :param combination: the parameter values to use (name -> value)
+    :type combination: dict
+    """
+    original = dict([(x, getattr(handler, x)) for x in combination])
+    for name in combination:
+        setattr(handler, name, combination[name])
+    try:
+        yield handler
+    finally:
+        for name in original:
+            setattr(handler, name, original[name])
+
+
+def variant_name(image_name: str, swept: List[str], combination: Dict[str, Any]) -> str:
+    """
+    Generates the image name for the variant, suffixing the name with the values of the swept parameters.
+
+    :param image_name: the name of the image
+    :type image_name: str
+    :param swept: the names of the swept parameters
+    :type swept: list
+    :param combination: the parameter values of the variant
+    :type combination: dict
+    :return: the name of the variant, e.g., 'img-kernel_size-5-num_iterations-2.png'
+    :rtype: str
+    """
+    name, ext = os.path.splitext(image_name)
+    return name + "".join(["-%s-%s" % (x, str(combination[x])) for x in swept]) + ext
+
+
+def variant_metadata(swept: List[str], combination: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generates the meta-data that tags the variant with the values of the swept parameters.
+
+    :param swept: the names of the swept parameters
+    :type swept: list
+    :param combination: the parameter values of the variant
+    :type combination: dict
+    :return: the meta-data
+    :rtype: dict
+    """
+    return dict([(KEY_SWEEP_PREFIX + x, combination[x]) for x in swept])
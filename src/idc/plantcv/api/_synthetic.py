@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+
+
+def synthetic_mask(megapixels: float, density: float, seed: int) -> np.ndarray:
+    """
+    Generates a synthetic binary mask (4:3 aspect ratio) with blobs (some with holes), branching lines and speckles.
+
+    :param megapixels: the size of the mask in megapixels
+    :type megapixels: float
+    :param density: the number of objects per megapixel
+    :type density: float
+    :param seed: the seed for the random number generator
+    :type seed: int
+    :return: the mask (0/255)
+    :rtype: np.ndarray
+    """
+    rng = np.random.default_rng(seed)
+    width = int(round((megapixels * 1e6 * 4 / 3) ** 0.5))
+    height = int(round(megapixels * 1e6 / width))
+    result = np.zeros((height, width), dtype=np.uint8)
+    num = max(1, int(round(density * megapixels)))
+    for _ in range(num):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        kind = rng.integers(0, 3)
+        if kind == 0:
+            axes = (int(rng.integers(3, 40)), int(rng.integers(3, 40)))
+            cv2.ellipse(result, (x, y), axes, float(rng.integers(0, 180)), 0, 360, 255, -1)
+            if min(axes) > 10:
+                cv2.circle(result, (x, y), int(rng.integers(1, min(axes) // 2)), 0, -1)
+        else:
+            # branching structure
+            for _ in range(int(rng.integers(2, 6))):
+                x2 = x + int(rng.integers(-80, 80))
+                y2 = y + int(rng.integers(-80, 80))
+                cv2.line(result, (x, y), (x2, y2), 255, int(rng.integers(2, 8)))
+    # speckles
+    num_speckles = num * 5
+    result[rng.integers(0, height, num_speckles), rng.integers(0, width, num_speckles)] = 255
+    return result
+
+
+def synthetic_grayscale(mask: np.ndarray, seed: int) -> np.ndarray:
+    """
+    Turns the mask into a grayscale image by blurring it and adding noise.
+
+    :param mask: the mask to use
+    :type mask: np.ndarray
+    :param seed: the seed for the random number generator
+    :type seed: int
+    :return: the grayscale image
+    :rtype: np.ndarray
+    """
+    rng = np.random.default_rng(seed)
+    result = cv2.GaussianBlur(mask, (0, 0), 3).astype(np.int16)
+    result += rng.integers(-20, 21, size=mask.shape, dtype=np.int16)
+    return np.clip(result, 0, 255).astype(np.uint8)
@@ -0,0 +1,53 @@
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+
+from ._lazy import pcv
+
+PCV_PARAMS_LOCK = threading.RLock()
+""" for serializing plantcv calls that temporarily modify the global plantcv.params (e.g., morphology.prune). """
+
+
+def add_num_threads_param(parser: argparse.ArgumentParser):
+    """
+    Adds the -T/--num_threads option to the parser.
+
+    :param parser: the parser to append
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument("-T", "--num_threads", type=int, help="The number of threads to use for processing the segmentation layers of a record concurrently, processes them sequentially if less than 2. Only has an effect when applying the filter to the annotations or when processing the annotated regions of object detection images (see -r/--roi). The plot/print debugging of plantcv is disabled while processing concurrently.", default=1, required=False)
+
+
+def create_thread_pool(num_threads: int, name: str) -> Optional[ThreadPoolExecutor]:
+    """
+    Creates the thread pool for the specified number of threads.
+
+    :param num_threads: the number of threads
+    :type num_threads: int
+    :param name: the prefix for the thread names
+    :type name: str
+    :return: the pool, None if less than 2 threads
+    :rtype: ThreadPoolExecutor
+    """
+    if num_threads < 2:
+        return None
+    return ThreadPoolExecutor(max_workers=num_threads, thread_name_prefix=name)
+
+
+@contextmanager
+def debug_disabled():
+    """
+    Disables the plot/print debugging of plantcv (not thread-safe) for the duration of the context, e.g., while
+    processing in a thread pool, and restores the original setting afterwards. The lock is only held while
+    changing the global plantcv parameters, as the threads of the pool may need it themselves.
+    """
+    with PCV_PARAMS_LOCK:
+        debug = pcv.params.debug
+        pcv.params.debug = None
+    try:
+        yield
+    finally:
+        with PCV_PARAMS_LOCK:
+            pcv.params.debug = debug
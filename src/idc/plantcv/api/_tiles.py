@@ -0,0 +1,302 @@
+import argparse
+import tempfile
+from typing import Callable, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from ._fill import size_inclusive
+
+
+def add_tile_size_param(parser: argparse.ArgumentParser, exact: bool = True):
+    """
+    Adds the -t/--tile_size option to the parser.
+
+    :param parser: the parser to append
+    :type parser: argparse.ArgumentParser
+    :param exact: whether the halo covers the reach of the operation, i.e., tiling does not change the results
+    :type exact: bool
+    """
+    if exact:
+        halo = "Tiles are processed with a halo sized to the reach of the operation, the results are identical to processing the whole image."
+    else:
+        halo = "Tiles are processed with a halo around them (see -H/--halo), the results are only identical to processing the whole image if the halo exceeds the width of the widest object."
+    parser.add_argument("-t", "--tile_size", type=int, help="The size in pixels of the square tiles to process large images in, using memory-mapped buffers for input and output. " + halo + " Processes the whole image at once if not specified.", default=None, required=False)
+
+
+def create_memmap(shape: Tuple[int, int], directory: str = None) -> np.memmap:
+    """
+    Creates a uint8 array that is backed by an anonymous temporary file, which gets removed automatically.
+
+    :param shape: the shape of the array (height, width)
+    :type shape: tuple
+    :param directory: the directory for the temporary file, uses the system's default if None
+    :type directory: str
+    :return: the array
+    :rtype: np.memmap
+    """
+    with tempfile.TemporaryFile(dir=directory) as fp:
+        return np.memmap(fp, dtype=np.uint8, mode="w+", shape=shape)
+
+
+def image_to_memmap(image: Image.Image, tile_size: int, directory: str = None) -> np.memmap:
+    """
+    Turns the pillow image into a memory-mapped uint8 array, converting strips of tile size rows at a time.
+
+    :param image: the image to convert
+    :type image: Image.Image
+    :param tile_size: the number of rows to convert at a time
+    :type tile_size: int
+    :param directory: the directory for the temporary file, uses the system's default if None
+    :type directory: str
+    :return: the array
+    :rtype: np.memmap
+    """
+    width, height = image.size
+    result = create_memmap((height, width), directory=directory)
+    for y in range(0, height, tile_size):
+        y_end = min(height, y + tile_size)
+        result[y:y_end, :] = np.asarray(image.crop((0, y, width, y_end))).astype(np.uint8)
+    return result
+
+
+def tiles(shape: Tuple[int, int], tile_size: int) -> Iterator[Tuple[int, int, int, int]]:
+    """
+    Generates the tiles covering an array of the specified shape, row by row.
+
+    :param shape: the shape of the array (height, width)
+    :type shape: tuple
+    :param tile_size: the size of the tiles
+    :type tile_size: int
+    :return: the tiles as tuples of (y, y_end, x, x_end)
+    :rtype: iterator
+    """
+    height, width = shape[:2]
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            yield y, min(height, y + tile_size), x, min(width, x + tile_size)
+
+
+def tiled_apply(array: np.ndarray, tile_size: int, halo: int, function: Callable[[np.ndarray], np.ndarray]) -> np.memmap:
+    """
+    Applies the function to the array tile by tile. Each tile gets processed with the specified halo around it,
+    so that the results are seamless as long as the halo is at least the reach of the function.
+
+    :param array: the array to process
+    :type array: np.ndarray
+    :param tile_size: the size of the tiles
+    :type tile_size: int
+    :param halo: the number of pixels around each tile to include
+    :type halo: int
+    :param function: the function to apply to each tile (incl halo)
+    :type function: callable
+    :return: the memory-mapped result
+    :rtype: np.memmap
+    """
+    height, width = array.shape[:2]
+    result = create_memmap((height, width))
+    for y, y_end, x, x_end in tiles(array.shape, tile_size):
+        wy = max(0, y - halo)
+        wx = max(0, x - halo)
+        window = np.array(array[wy:min(height, y_end + halo), wx:min(width, x_end + halo)])
+        processed = function(window)
+        result[y:y_end, x:x_end] = processed[y - wy:y_end - wy, x - wx:x_end - wx]
+    return result
+
+
+def _seam_pairs(first: np.ndarray, second: np.ndarray, connectivity: int) -> np.ndarray:
+    """
+    Determines the pairs of components that are connected across a seam.
+
+    :param first: the global component IDs on the one side of the seam (-1 for not part of a component)
+    :type first: np.ndarray
+    :param second: the global component IDs on the other side of the seam (-1 for not part of a component)
+    :type second: np.ndarray
+    :param connectivity: the connectivity (4/8)
+    :type connectivity: int
+    :return: the pairs (n x 2)
+    :rtype: np.ndarray
+    """
+    shifts = [0] if connectivity == 4 else [-1, 0, 1]
+    result = []
+    n = len(first)
+    for shift in shifts:
+        a = first[max(0, -shift):n - max(0, shift)]
+        b = second[max(0, shift):n - max(0, -shift)]
+        valid = (a >= 0) & (b >= 0)
+        result.append(np.stack([a[valid], b[valid]], axis=1))
+    return np.concatenate(result)
+
+
+def _tiled_components(mask_function: Callable[[np.ndarray], np.ndarray], array: np.ndarray, tile_size: int,
+                      connectivity: int) -> Tuple[list, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Labels the connected components of the mask tile by tile and merges the ones connected across tile seams.
+
+    :param mask_function: turns a tile into the uint8 mask to label (1 = component pixel)
+    :type mask_function: callable
+    :param array: the array to process
+    :type array: np.ndarray
+    :param tile_size: the size of the tiles
+    :type tile_size: int
+    :param connectivity: the connectivity (4/8)
+    :type connectivity: int
+    :return: the tuple of label offsets per tile, the merged component per global ID, the area and
+             whether the merged component touches the image border
+    :rtype: tuple
+    """
+    height, width = array.shape[:2]
+    offsets = []
+    areas = []
+    on_border = []
+    pairs = []
+    num = 0
+    row_below = None
+    for y, y_end, x, x_end in tiles(array.shape, tile_size):
+        if x == 0:
+            row_above = row_below
+            row_top = np.full(width, -1, dtype=np.int64)
+            row_below = np.full(width, -1, dtype=np.int64)
+            col_left = None
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(mask_function(np.array(array[y:y_end, x:x_end])),
+                                                                    connectivity=connectivity, ltype=cv2.CV_32S)
+        offsets.append(num)
+        # global IDs, -1 for pixels not part of a component
+        ids = np.arange(-1, count - 1, dtype=np.int64) + num
+        ids[0] = -1
+        areas.append(stats[1:, cv2.CC_STAT_AREA])
+        border = np.zeros(count, dtype=bool)
+        if y == 0:
+            border[labels[0, :]] = True
+        if y_end == height:
+            border[labels[-1, :]] = True
+        if x == 0:
+            border[labels[:, 0]] = True
+        if x_end == width:
+            border[labels[:, -1]] = True
+        on_border.append(border[1:])
+        row_top[x:x_end] = ids[labels[0, :]]
+        row_below[x:x_end] = ids[labels[-1, :]]
+        if col_left is not None:
+            pairs.append(_seam_pairs(col_left, ids[labels[:, 0]], connectivity))
+        col_left = ids[labels[:, -1]]
+        num += count - 1
+        # end of row of tiles: connect with the row of tiles above
+        if (x_end == width) and (row_above is not None):
+            pairs.append(_seam_pairs(row_above, row_top, connectivity))
+    areas = np.concatenate(areas) if num > 0 else np.zeros(0, dtype=np.int64)
+    on_border = np.concatenate(on_border) if num > 0 else np.zeros(0, dtype=bool)
+    pairs = np.concatenate(pairs) if len(pairs) > 0 else np.zeros((0, 2), dtype=np.int64)
+    if num > 0:
+        # deferred import, scipy is only required when processing images in tiles
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+        graph = coo_matrix((np.ones(len(pairs), dtype=np.int8), (pairs[:, 0], pairs[:, 1])), shape=(num, num))
+        _, merged = connected_components(graph, directed=False)
+    else:
+        merged = np.zeros(0, dtype=np.int64)
+    merged_areas = np.bincount(merged, weights=areas, minlength=merged.max(initial=-1) + 1)
+    merged_border = np.bincount(merged, weights=on_border, minlength=merged.max(initial=-1) + 1) > 0
+    return offsets, merged, merged_areas, merged_border
+
+
+def _tiled_relabel(mask_function: Callable[[np.ndarray], np.ndarray], array: np.ndarray, tile_size: int,
+                   connectivity: int, offsets: list, lut: np.ndarray, background: Optional[int]) -> np.memmap:
+    """
+    Labels the tiles again and generates the output via the lookup table for the global component IDs.
+
+    :param mask_function: turns a tile into the uint8 mask to label (1 = component pixel)
+    :type mask_function: callable
+    :param array: the array to process
+    :type array: np.ndarray
+    :param tile_size: the size of the tiles
+    :type tile_size: int
+    :param connectivity: the connectivity (4/8)
+    :type connectivity: int
+    :param offsets: the label offsets per tile
+    :type offsets: list
+    :param lut: the output value per global component ID
+    :type lut: np.ndarray
+    :param background: the output value for pixels that are not part of a component
+    :type background: int
+    :return: the memory-mapped result
+    :rtype: np.memmap
+    """
+    result = create_memmap(array.shape[:2])
+    for i, (y, y_end, x, x_end) in enumerate(tiles(array.shape, tile_size)):
+        count, labels = cv2.connectedComponents(mask_function(np.array(array[y:y_end, x:x_end])),
+                                                connectivity=connectivity, ltype=cv2.CV_32S)
+        tile_lut = np.empty(count, dtype=np.uint8)
+        tile_lut[0] = background
+        tile_lut[1:] = lut[offsets[i]:offsets[i] + count - 1]
+        result[y:y_end, x:x_end] = tile_lut[labels]
+    return result
+
+
+def _foreground(tile: np.ndarray) -> np.ndarray:
+    """
+    Returns the foreground mask of the tile.
+
+    :param tile: the tile to get the mask for
+    :type tile: np.ndarray
+    :return: the mask (0/1)
+    :rtype: np.ndarray
+    """
+    return (tile > 0).astype(np.uint8)
+
+
+def _background(tile: np.ndarray) -> np.ndarray:
+    """
+    Returns the background mask of the tile.
+
+    :param tile: the tile to get the mask for
+    :type tile: np.ndarray
+    :return: the mask (0/1)
+    :rtype: np.ndarray
+    """
+    return (tile == 0).astype(np.uint8)
+
+
+def tiled_label_fill(array: np.ndarray, tile_size: int, size: int, connectivity: int = 4) -> np.memmap:
+    """
+    Removes all objects smaller than the specified size, tile by tile. Objects spanning multiple tiles get merged,
+    i.e., the result is identical to label_fill.
+
+    :param array: the binary image to process
+    :type array: np.ndarray
+    :param tile_size: the size of the tiles
+    :type tile_size: int
+    :param size: the minimum object area size in pixels
+    :type size: int
+    :param connectivity: the connectivity to use for determining the objects (4/8)
+    :type connectivity: int
+    :return: the memory-mapped filtered image (0/255)
+    :rtype: np.memmap
+    """
+    offsets, merged, areas, _ = _tiled_components(_foreground, array, tile_size, connectivity)
+    keep = (areas > size) if size_inclusive() else (areas >= size)
+    lut = np.where(keep, 255, 0).astype(np.uint8)[merged]
+    return _tiled_relabel(_foreground, array, tile_size, connectivity, offsets, lut, 0)
+
+
+def tiled_label_fill_holes(array: np.ndarray, tile_size: int, max_hole_size: int = None) -> np.memmap:
+    """
+    Fills the holes in the binary image, tile by tile. Background regions spanning multiple tiles get merged,
+    i.e., the result is identical to label_fill_holes.
+
+    :param array: the binary image to process
+    :type array: np.ndarray
+    :param tile_size: the size of the tiles
+    :type tile_size: int
+    :param max_hole_size: the maximum area in pixels of holes to fill, None for filling all holes
+    :type max_hole_size: int
+    :return: the memory-mapped filled image (0/255)
+    :rtype: np.memmap
+    """
+    offsets, merged, areas, on_border = _tiled_components(_background, array, tile_size, 4)
+    fill = ~on_border
+    if max_hole_size is not None:
+        fill &= areas <= max_hole_size
+    lut = np.where(fill, 255, 0).astype(np.uint8)[merged]
+    return _tiled_relabel(_background, array, tile_size, 4, offsets, lut, 255)
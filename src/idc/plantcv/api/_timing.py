@@ -0,0 +1,227 @@
+import argparse
+import contextlib
+import json
+import logging
+import time
+from typing import Dict, Optional
+
+STAGE_FORMAT = "format"
+""" conversion of the input image into the format/array required by the filter. """
+
+STAGE_PCV = "pcv"
+""" the actual processing, e.g., plantcv calls. """
+
+STAGE_OUTPUT = "output"
+""" conversion of the processed array into the output format and image bytes. """
+
+STAGE_RECORD = "record"
+""" copying of annotations/meta-data and assembling of the output record. """
+
+STAGES = [
+    STAGE_FORMAT,
+    STAGE_PCV,
+    STAGE_OUTPUT,
+    STAGE_RECORD,
+]
+
+TIMING_RECORDS = "records"
+TIMING_PIXELS = "pixels"
+
+PROMETHEUS_PREFIX = "idc_plantcv"
+
+
+def add_profile_params(parser: argparse.ArgumentParser):
+    """
+    Adds the -P/--profile and -F/--profile_file options to the parser.
+
+    :param parser: the parser to append
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument("-P", "--profile", action="store_true", help="Whether to record the wall time of the processing stages (" + "/".join(STAGES) + "), the number of pixels processed and the records per second, logging the totals at the end.")
+    parser.add_argument("-F", "--profile_file", type=str, help="The file to write the profiling totals to at the end, JSON if the file has a .json extension, otherwise Prometheus text format. Enables profiling.", default=None, required=False)
+
+
+class StageTimer:
+    """
+    Records the wall time spent in the processing stages of a filter, as well as records and pixels processed.
+    """
+
+    def __init__(self, name: str, logger: logging.Logger):
+        """
+        Initializes the timer.
+
+        :param name: the name of the filter
+        :type name: str
+        :param logger: the logger to output the totals with
+        :type logger: logging.Logger
+        """
+        self.name = name
+        self.logger = logger
+        self.counters = self._empty()
+        self._start = None
+
+    def _empty(self) -> Dict[str, float]:
+        """
+        Returns the initial counters.
+
+        :return: the counters
+        :rtype: dict
+        """
+        result = dict([(x, 0.0) for x in STAGES])
+        result[TIMING_RECORDS] = 0
+        result[TIMING_PIXELS] = 0
+        return result
+
+    def start(self):
+        """
+        Marks the start of the processing, if not already started.
+        """
+        if self._start is None:
+            self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, stage: str):
+        """
+        Context manager that adds the wall time of the enclosed block to the stage.
+
+        :param stage: the stage to record the time for
+        :type stage: str
+        """
+        self.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.counters[stage] = self.counters.get(stage, 0.0) + time.perf_counter() - start
+
+    def add_record(self):
+        """
+        Increments the number of records processed.
+        """
+        self.counters[TIMING_RECORDS] += 1
+
+    def add_pixels(self, num: int):
+        """
+        Adds the number of pixels processed.
+
+        :param num: the number of pixels
+        :type num: int
+        """
+        self.counters[TIMING_PIXELS] += int(num)
+
+    def pop_counters(self) -> Dict[str, float]:
+        """
+        Returns the counters and resets them.
+
+        :return: the counters
+        :rtype: dict
+        """
+        result = self.counters
+        self.counters = self._empty()
+        return result
+
+    def add_counters(self, counters: Dict[str, float]):
+        """
+        Adds the counters, e.g., from a worker process.
+
+        :param counters: the counters to add
+        :type counters: dict
+        """
+        self.start()
+        for k in counters:
+            self.counters[k] = self.counters.get(k, 0) + counters[k]
+
+    def totals(self) -> Dict:
+        """
+        Returns the totals, including the elapsed wall time and throughput.
+        With multiple workers, the stage times are summed across the worker processes.
+
+        :return: the totals
+        :rtype: dict
+        """
+        elapsed = time.perf_counter() - self._start if self._start is not None else 0.0
+        records = self.counters[TIMING_RECORDS]
+        pixels = self.counters[TIMING_PIXELS]
+        return {
+            "filter": self.name,
+            "stages": dict([(k, v) for k, v in self.counters.items() if k not in [TIMING_RECORDS, TIMING_PIXELS]]),
+            "records": records,
+            "pixels": pixels,
+            "elapsed": elapsed,
+            "records_per_second": records / elapsed if elapsed > 0 else 0.0,
+            "pixels_per_second": pixels / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def log_totals(self):
+        """
+        Outputs the totals.
+        """
+        totals = self.totals()
+        stages = ", ".join(["%s=%.3fs" % (k, v) for k, v in totals["stages"].items()])
+        self.logger.info("timing: %d records, %.1f MP in %.3fs (%.2f records/sec, %.2f MP/sec), stages: %s"
+                         % (totals["records"], totals["pixels"] / 1e6, totals["elapsed"], totals["records_per_second"],
+                            totals["pixels_per_second"] / 1e6, stages))
+
+    def write(self, path: str):
+        """
+        Writes the totals to the file, as JSON if the file has a .json extension, otherwise in Prometheus text format.
+
+        :param path: the file to write to
+        :type path: str
+        """
+        totals = self.totals()
+        if path.lower().endswith(".json"):
+            with open(path, "w") as fp:
+                json.dump(totals, fp, indent=2)
+            return
+
+        labels = 'filter="%s"' % self.name
+        lines = [
+            "# HELP %s_stage_seconds_total Wall time spent in the processing stages." % PROMETHEUS_PREFIX,
+            "# TYPE %s_stage_seconds_total counter" % PROMETHEUS_PREFIX,
+        ]
+        for stage, seconds in totals["stages"].items():
+            lines.append('%s_stage_seconds_total{%s,stage="%s"} %s' % (PROMETHEUS_PREFIX, labels, stage, repr(seconds)))
+        for key, help_text, metric_type in [("records", "Records processed.", "counter"),
+                                            ("pixels", "Pixels processed.", "counter"),
+                                            ("elapsed", "Wall time from the first record to the end of the run.", "gauge"),
+                                            ("records_per_second", "Records processed per second.", "gauge"),
+                                            ("pixels_per_second", "Pixels processed per second.", "gauge")]:
+            metric = "%s_%s" % (PROMETHEUS_PREFIX, key)
+            if metric_type == "counter":
+                metric += "_total"
+            elif key == "elapsed":
+                metric += "_seconds"
+            lines.append("# HELP %s %s" % (metric, help_text))
+            lines.append("# TYPE %s %s" % (metric, metric_type))
+            lines.append("%s{%s} %s" % (metric, labels, repr(totals[key])))
+        with open(path, "w") as fp:
+            fp.write("\n".join(lines) + "\n")
+
+
+def stage_timer(handler) -> Optional[StageTimer]:
+    """
+    Creates the timer for the filter if profiling is enabled (-P/--profile or -F/--profile_file).
+
+    :param handler: the filter to create the timer for
+    :return: the timer, None if profiling is disabled
+    :rtype: StageTimer
+    """
+    if handler.profile or (handler.profile_file is not None):
+        return StageTimer(handler.name(), handler.logger())
+    return None
+
+
+def timed(timer: Optional[StageTimer], stage: str):
+    """
+    Returns a context manager for timing the stage, a no-op one if there is no timer.
+
+    :param timer: the timer to use, can be None
+    :type timer: StageTimer
+    :param stage: the stage to time
+    :type stage: str
+    :return: the context manager
+    """
+    if timer is None:
+        return contextlib.nullcontext()
+    return timer.stage(stage)
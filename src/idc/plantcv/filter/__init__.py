@@ -1,7 +1,14 @@
+from ._plantcv_filter import PlantCVFilter
+from ._tiled_plantcv_filter import TiledPlantCVFilter
+from ._approximate_plantcv_filter import ApproximatePlantCVFilter
+from ._skeleton_analyzer import SkeletonAnalyzer
+from ._point_finder import PointFinder
 from ._dilate import Dilate
 from ._erode import Erode
 from ._find_branch_points import FindBranchPoints
 from ._find_tips import FindTips
 from ._fill import Fill
 from ._fill_holes import FillHoles
+from ._morphology_chain import MorphologyChain, CHAIN_OPERATIONS, OPERATION_PARAMETERS_UNSUPPORTED
+from ._skeleton_features import SkeletonFeatures
 from ._skeletonize import Skeletonize
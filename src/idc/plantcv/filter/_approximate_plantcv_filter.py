@@ -0,0 +1,215 @@
+import abc
+import argparse
+from typing import List
+
+import numpy as np
+from wai.logging import LOGGING_WARNING
+
+from idc.plantcv.api import is_binary, add_downscale_params, downscale, upscale, agreement_counters, agreement_metadata, AGREEMENT_COUNTERS
+from ._tiled_plantcv_filter import TiledPlantCVFilter
+
+
+class ApproximatePlantCVFilter(TiledPlantCVFilter, abc.ABC):
+    """
+    Ancestor for plantcv filters that can compute an approximate result on a downscaled image, scaling
+    their parameters to match. The result gets upscaled again and its edges refined using the original image.
+    Can compare the approximate results with the exact ones and store the agreement in the meta-data.
+    """
+
+    def __init__(self, apply_to: str = None, output_format: str = None, incorrect_format_action: str = None,
+                 downscale: int = None, validate: bool = None, tile_size: int = None, roi: str = None,
+                 num_workers: int = None, num_threads: int = None, prefetch: int = None,
+                 cache_dir: str = None, cache_size: int = None, profile: bool = None, profile_file: str = None,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the filter.
+
+        :param apply_to: where to apply the filter to
+        :type apply_to: str
+        :param output_format: the output format to use
+        :type output_format: str
+        :param incorrect_format_action: how to react to incorrect input format
+        :type incorrect_format_action: str
+        :param downscale: the factor to downscale the images by for an approximate result, exact result if less than 2
+        :type downscale: int
+        :param validate: whether to compare the approximate results with the exact ones and store the agreement in the meta-data
+        :type validate: bool
+        :param tile_size: the size of the tiles to process the images in, None for processing them as a whole
+        :type tile_size: int
+        :param roi: the region of the image to process (full/annotations)
+        :type roi: str
+        :param num_workers: the number of worker processes to use
+        :type num_workers: int
+        :param num_threads: the number of threads to use for processing the segmentation layers
+        :type num_threads: int
+        :param prefetch: the number of records of a batch to decode and convert ahead in a background thread, 0 to disable
+        :type prefetch: int
+        :param cache_dir: the directory for caching the results, None for no caching
+        :type cache_dir: str
+        :param cache_size: the maximum size of the cache in MB
+        :type cache_size: int
+        :param profile: whether to record the time spent in the processing stages
+        :type profile: bool
+        :param profile_file: the file to write the profiling totals to (JSON or Prometheus text), None for not writing them
+        :type profile_file: str
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(apply_to=apply_to, output_format=output_format, incorrect_format_action=incorrect_format_action,
+                         tile_size=tile_size, roi=roi,
+                         num_workers=num_workers, num_threads=num_threads, prefetch=prefetch,
+                         cache_dir=cache_dir, cache_size=cache_size, profile=profile, profile_file=profile_file,
+                         logger_name=logger_name, logging_level=logging_level)
+        self.downscale = downscale
+        self.validate = validate
+        self._agreement = None
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        add_downscale_params(parser)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.downscale = ns.downscale
+        self.validate = ns.validate
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if self.downscale is None:
+            self.downscale = 1
+        if self.downscale < 1:
+            raise Exception("Downscale factor must be at least 1, current: %s" % str(self.downscale))
+        if self.validate is None:
+            self.validate = False
+        self._agreement = None
+
+    def _approximate(self) -> bool:
+        """
+        Returns whether approximate results get computed.
+
+        :return: True if approximating
+        :rtype: bool
+        """
+        return self.downscale > 1
+
+    @abc.abstractmethod
+    def _apply_filter_downscaled(self, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter with the parameters scaled to the downscaled image.
+
+        :param array: the downscaled image to apply the filter to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def _refine(self, array: np.ndarray, array_new: np.ndarray) -> np.ndarray:
+        """
+        Refines the upscaled approximate result using the original image.
+
+        :param array: the original image
+        :type array: np.ndarray
+        :param array_new: the upscaled approximate result
+        :type array_new: np.ndarray
+        :return: the refined result
+        :rtype: np.ndarray
+        """
+        raise NotImplementedError()
+
+    def _apply_filter_approximate(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter to the downscaled image and returns the upscaled and refined result.
+
+        :param source: whether image or layer
+        :type source: str
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        binary = is_binary(array)
+        array_new = self._apply_filter_downscaled(downscale(array, self.downscale, binary))
+        array_new = upscale(np.asarray(array_new).astype(array.dtype), array.shape, binary)
+        return self._refine(np.asarray(array), array_new)
+
+    def _apply_filter(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter to the image and returns the numpy array.
+
+        :param source: whether image or layer
+        :type source: str
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        if self._approximate():
+            return self._apply_filter_approximate(source, array)
+        return super()._apply_filter(source, array)
+
+    def _apply_filter_all(self, sources: List[str], arrays: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Applies the filter to the images and returns the numpy arrays (same order).
+        Compares the approximate results with the exact ones if requested.
+
+        :param sources: whether image or layer, per image
+        :type sources: list
+        :param arrays: the images the filter to apply to
+        :type arrays: list
+        :return: the filtered images
+        :rtype: list
+        """
+        result = super()._apply_filter_all(sources, arrays)
+        if self._approximate() and self.validate:
+            for source, array, array_new in zip(sources, arrays, result):
+                exact = self._short_circuit(array)
+                if exact is None:
+                    exact = super()._apply_filter(source, array)
+                counters = agreement_counters(array_new, exact)
+                for k in AGREEMENT_COUNTERS:
+                    self._agreement[k] += counters[k]
+        return result
+
+    def _pre_apply_filter(self, item):
+        """
+        Hook method that gets executed before the filter is being applied the first time.
+
+        :param item: the current image data being processed
+        """
+        super()._pre_apply_filter(item)
+        self._agreement = dict([(x, 0) for x in AGREEMENT_COUNTERS])
+
+    def _post_apply_filter(self, item):
+        """
+        Hook method that gets executed after the filter has been applied the last time.
+        Stores the agreement of the approximate with the exact results in the meta-data if requested.
+
+        :param item: the updated image data
+        """
+        super()._post_apply_filter(item)
+        if self._approximate() and self.validate:
+            metadata = item.get_metadata()
+            if metadata is None:
+                metadata = dict()
+            metadata.update(agreement_metadata(self._agreement))
+            item.set_metadata(metadata)
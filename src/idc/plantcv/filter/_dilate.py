@@ -1,21 +1,27 @@
 import argparse
-from typing import List
+from typing import Any, Dict, List, Optional, Union
 
+import cv2
 import numpy as np
-from plantcv import plantcv as pcv
 from wai.logging import LOGGING_WARNING
 
 from idc.api import ImageClassificationData, ObjectDetectionData, ImageSegmentationData, grayscale_required_info, REQUIRED_FORMAT_GRAYSCALE
-from idc.filter import ImageAndAnnotationFilter
+from idc.plantcv.api import pcv, ENGINE_PCV, ENGINE_DISTANCE, ENGINE_RLE, MORPHOLOGY_ENGINES, SHAPE_SQUARE, SHAPES, is_binary, kernel_extents, structuring_element, distance_morphology
+from idc.plantcv.api import RLE_SHAPES, RLEMask, rle_morphology, constant_value, scaled_kernel_size, ROI_FULL, single_value
+from kasperl.api import make_list
+from ._approximate_plantcv_filter import ApproximatePlantCVFilter
 
 
-class Dilate(ImageAndAnnotationFilter):
+class Dilate(ApproximatePlantCVFilter):
     """
     Performs morphological 'dilation' filtering. Adds pixel to center of kernel if conditions set in kernel are true.
     """
 
     def __init__(self, apply_to: str = None, output_format: str = None, incorrect_format_action: str = None,
-                 kernel_size: int = None, num_iterations: int = None,
+                 kernel_size: Union[int, List[int]] = None, num_iterations: Union[int, List[int]] = None, engine: str = None, shape: str = None,
+                 downscale: int = None, validate: bool = None, tile_size: int = None, roi: str = None,
+                 num_workers: int = None, num_threads: int = None, prefetch: int = None,
+                 cache_dir: str = None, cache_size: int = None, profile: bool = None, profile_file: str = None,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the filter.
@@ -26,19 +32,50 @@ class Dilate(ImageAndAnnotationFilter):
         :type output_format: str
         :param incorrect_format_action: how to react to incorrect input format
         :type incorrect_format_action: str
-        :param kernel_size: the kernel size to use
-        :type kernel_size: int
-        :param num_iterations: the number of iterations to perform
-        :type num_iterations: int
+        :param kernel_size: the kernel size to use, a list generates a variant per kernel size
+        :type kernel_size: int or list
+        :param num_iterations: the number of iterations to perform, a list generates a variant per number of iterations
+        :type num_iterations: int or list
+        :param engine: the engine to use for binary images (pcv/distance)
+        :type engine: str
+        :param shape: the shape of the structuring element (square/disc/cross)
+        :type shape: str
+        :param downscale: the factor to downscale the images by for an approximate result, exact result if less than 2
+        :type downscale: int
+        :param validate: whether to compare the approximate results with the exact ones and store the agreement in the meta-data
+        :type validate: bool
+        :param tile_size: the size of the tiles to process the images in, None for processing them as a whole
+        :type tile_size: int
+        :param roi: the region of the image to process (full/annotations)
+        :type roi: str
+        :param num_workers: the number of worker processes to use
+        :type num_workers: int
+        :param num_threads: the number of threads to use for processing the segmentation layers
+        :type num_threads: int
+        :param prefetch: the number of records of a batch to decode and convert ahead in a background thread, 0 to disable
+        :type prefetch: int
+        :param cache_dir: the directory for caching the results, None for no caching
+        :type cache_dir: str
+        :param cache_size: the maximum size of the cache in MB
+        :type cache_size: int
+        :param profile: whether to record the time spent in the processing stages
+        :type profile: bool
+        :param profile_file: the file to write the profiling totals to (JSON or Prometheus text), None for not writing them
+        :type profile_file: str
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
         :type logging_level: str
         """
         super().__init__(apply_to=apply_to, output_format=output_format, incorrect_format_action=incorrect_format_action,
+                         downscale=downscale, validate=validate, tile_size=tile_size, roi=roi,
+                         num_workers=num_workers, num_threads=num_threads, prefetch=prefetch,
+                         cache_dir=cache_dir, cache_size=cache_size, profile=profile, profile_file=profile_file,
                          logger_name=logger_name, logging_level=logging_level)
         self.kernel_size = kernel_size
         self.num_iterations = num_iterations
+        self.engine = engine
+        self.shape = shape
 
     def name(self) -> str:
         """
@@ -84,8 +121,10 @@ class Dilate(ImageAndAnnotationFilter):
         :rtype: argparse.ArgumentParser
         """
         parser = super()._create_argparser()
-        parser.add_argument("-k", "--kernel_size", type=int, help="The kernel size, must greater than 1 to have an effect.", default=3, required=False)
-        parser.add_argument("-i", "--num_iterations", type=int, help="The number of iterations to perform.", default=1, required=False)
+        parser.add_argument("-k", "--kernel_size", type=int, nargs="+", help="The kernel size, must greater than 1 to have an effect. Multiple values generate a variant record per parameter combination.", default=[3], required=False)
+        parser.add_argument("-i", "--num_iterations", type=int, nargs="+", help="The number of iterations to perform. Multiple values generate a variant record per parameter combination; variants with the same kernel size continue from the previous variant if the iterations are ascending (square structuring element only).", default=[1], required=False)
+        parser.add_argument("-e", "--engine", choices=MORPHOLOGY_ENGINES, help="The engine to use for binary images; '" + ENGINE_DISTANCE + "' thresholds a single distance transform, i.e., the cost does not depend on kernel size or iterations; '" + ENGINE_RLE + "' works on run-length encoded masks, i.e., the cost is proportional to the foreground rather than the image area (suited for sparse segmentation layers). Grayscale images are always processed with OpenCV.", default=ENGINE_PCV, required=False)
+        parser.add_argument("-S", "--shape", choices=SHAPES, help="The shape of the structuring element, reaching as far as the square kernel applied the number of iterations. Shapes other than '" + SHAPE_SQUARE + "' require the '" + ENGINE_DISTANCE + "' engine, the '" + ENGINE_RLE + "' engine supports: " + ", ".join(RLE_SHAPES) + ".", default=SHAPE_SQUARE, required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -96,8 +135,10 @@ class Dilate(ImageAndAnnotationFilter):
         :type ns: argparse.Namespace
         """
         super()._apply_args(ns)
-        self.kernel_size = ns.kernel_size
-        self.num_iterations = ns.num_iterations
+        self.kernel_size = single_value(ns.kernel_size)
+        self.num_iterations = single_value(ns.num_iterations)
+        self.engine = ns.engine
+        self.shape = ns.shape
 
     def initialize(self):
         """
@@ -106,12 +147,26 @@ class Dilate(ImageAndAnnotationFilter):
         super().initialize()
         if self.kernel_size is None:
             self.kernel_size = 3
-        if self.kernel_size < 1:
-            raise Exception("Kernel size must be at least 1, current: %s" % str(self.kernel_size))
+        for kernel_size in make_list(self.kernel_size):
+            if kernel_size < 1:
+                raise Exception("Kernel size must be at least 1, current: %s" % str(kernel_size))
         if self.num_iterations is None:
             self.num_iterations = 1
-        if self.num_iterations < 1:
-            raise Exception("# iterations must be at least 1, current: %s" % str(self.num_iterations))
+        for num_iterations in make_list(self.num_iterations):
+            if num_iterations < 1:
+                raise Exception("# iterations must be at least 1, current: %s" % str(num_iterations))
+        if self.engine is None:
+            self.engine = ENGINE_PCV
+        if self.engine not in MORPHOLOGY_ENGINES:
+            raise Exception("Unsupported engine: %s" % self.engine)
+        if self.shape is None:
+            self.shape = SHAPE_SQUARE
+        if self.shape not in SHAPES:
+            raise Exception("Unsupported shape: %s" % self.shape)
+        if (self.shape != SHAPE_SQUARE) and (self.engine == ENGINE_PCV):
+            raise Exception("Shape '%s' requires engine '%s'!" % (self.shape, ENGINE_DISTANCE))
+        if (self.engine == ENGINE_RLE) and (self.shape not in RLE_SHAPES):
+            raise Exception("Engine '%s' does not support shape '%s'!" % (ENGINE_RLE, self.shape))
 
     def _nothing_to_do(self, data) -> bool:
         """
@@ -121,7 +176,7 @@ class Dilate(ImageAndAnnotationFilter):
         :return: whether nothing needs to be done
         :rtype: bool
         """
-        return self.kernel_size == 1
+        return make_list(self.kernel_size) == [1]
 
     def _required_format(self) -> str:
         """
@@ -132,9 +187,98 @@ class Dilate(ImageAndAnnotationFilter):
         """
         return REQUIRED_FORMAT_GRAYSCALE
 
-    def _apply_filter(self, source: str, array: np.ndarray) -> np.ndarray:
+    def _sweep_names(self) -> List[str]:
         """
-        Applies the filter to the image and returns the numpy array.
+        Returns the names of the parameters that can be specified as lists, generating a variant record
+        per parameter combination.
+
+        :return: the names of the parameters
+        :rtype: list
+        """
+        return ["kernel_size", "num_iterations"]
+
+    def _sweep_increment(self, previous: Dict[str, Any], combination: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the parameters for obtaining the result of the combination by applying the filter to the result
+        of the previous combination, if that is identical to applying the filter to the original image.
+        Dilation with the same square kernel can continue with the additional iterations.
+
+        :param previous: the parameter values of the previous combination
+        :type previous: dict
+        :param combination: the parameter values of the current combination
+        :type combination: dict
+        :return: the parameters to apply to the previous result, None if to apply the filter to the original image
+        :rtype: dict
+        """
+        if (self.shape != SHAPE_SQUARE) or self._approximate() or (self.roi != ROI_FULL):
+            return None
+        if previous["kernel_size"] != combination["kernel_size"]:
+            return None
+        if combination["num_iterations"] <= previous["num_iterations"]:
+            return None
+        return {"kernel_size": combination["kernel_size"], "num_iterations": combination["num_iterations"] - previous["num_iterations"]}
+
+    def _halo(self) -> int:
+        """
+        Returns the number of pixels around a tile that are required for processing it, i.e., the reach of the filter.
+
+        :return: the halo
+        :rtype: int
+        """
+        return max(kernel_extents(self.kernel_size, self.num_iterations))
+
+    def _short_circuit(self, array: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Determines the result without applying the filter if possible, e.g., for empty or full masks.
+        Images with a constant value do not change, neither does any image with a kernel size of 1
+        (e.g., when sweeping the kernel size).
+
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image, None if the filter needs to be applied
+        :rtype: np.ndarray
+        """
+        if self.kernel_size == 1:
+            return array
+        if constant_value(array) is not None:
+            return array
+        return None
+
+    def _apply_filter_downscaled(self, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter with the parameters scaled to the downscaled image.
+        The iterations get folded into a single kernel of the same reach.
+
+        :param array: the downscaled image to apply the filter to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        kernel_size = scaled_kernel_size(self.kernel_size, self.num_iterations, self.downscale)
+        if kernel_size == 1:
+            return array
+        if self.shape != SHAPE_SQUARE:
+            kernel, anchor = structuring_element(kernel_size, 1, self.shape)
+            return cv2.dilate(array, kernel, anchor=anchor)
+        return pcv.dilate(array, kernel_size, 1)
+
+    def _refine(self, array: np.ndarray, array_new: np.ndarray) -> np.ndarray:
+        """
+        Refines the upscaled approximate result using the original image.
+        Dilation never removes from the image, i.e., the result includes the original image.
+
+        :param array: the original image
+        :type array: np.ndarray
+        :param array_new: the upscaled approximate result
+        :type array_new: np.ndarray
+        :return: the refined result
+        :rtype: np.ndarray
+        """
+        return np.maximum(array, array_new)
+
+    def _apply_filter_untiled(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter to the whole image (or tile) and returns the numpy array.
 
         :param source: whether image or layer
         :type source: str
@@ -143,4 +287,26 @@ class Dilate(ImageAndAnnotationFilter):
         :return: the filtered image
         :rtype: np.ndarray
         """
+        if self.engine == ENGINE_RLE:
+            # encoding checks whether the image is binary, avoids a separate pass over the image
+            mask = RLEMask.from_array(array, binary_only=True)
+            if mask is not None:
+                return self._apply_rle(mask).to_array(array.dtype)
+        if self.engine in [ENGINE_DISTANCE, ENGINE_RLE]:
+            if (self.engine == ENGINE_DISTANCE) and is_binary(array):
+                return distance_morphology(array, self.kernel_size, self.num_iterations, self.shape, False)
+            if self.shape != SHAPE_SQUARE:
+                kernel, anchor = structuring_element(self.kernel_size, self.num_iterations, self.shape)
+                return cv2.dilate(array, kernel, anchor=anchor)
         return pcv.dilate(array, self.kernel_size, self.num_iterations)
+
+    def _apply_rle(self, mask: RLEMask) -> RLEMask:
+        """
+        Applies the filter to the run-length encoded binary image.
+
+        :param mask: the mask to process
+        :type mask: RLEMask
+        :return: the processed mask
+        :rtype: RLEMask
+        """
+        return rle_morphology(mask, self.kernel_size, self.num_iterations, self.shape, False)
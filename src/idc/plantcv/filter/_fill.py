@@ -1,20 +1,26 @@
 import argparse
-from typing import List
+from typing import Any, Dict, List, Optional, Union
 
 import numpy as np
-from plantcv import plantcv as pcv
 from wai.logging import LOGGING_WARNING
 
 from idc.api import ImageClassificationData, ObjectDetectionData, ImageSegmentationData, binary_required_info, REQUIRED_FORMAT_BINARY
-from idc.filter import ImageAndAnnotationFilter
+from idc.plantcv.api import pcv, ENGINE_PCV, ENGINE_LABEL, ENGINE_RLE, FILL_ENGINES, CONNECTIVITIES, label_fill, tiled_label_fill
+from idc.plantcv.api import RLEMask, rle_fill, size_inclusive, constant_value, scaled_size, ROI_FULL, single_value
+from kasperl.api import make_list
+from ._approximate_plantcv_filter import ApproximatePlantCVFilter
 
 
-class Fill(ImageAndAnnotationFilter):
+class Fill(ApproximatePlantCVFilter):
     """
     Identifies objects and fills objects that are less than the specified 'size' in pixels.
     """
 
-    def __init__(self, apply_to: str = None, output_format: str = None, incorrect_format_action: str = None, size: int = None,
+    def __init__(self, apply_to: str = None, output_format: str = None, incorrect_format_action: str = None,
+                 size: Union[int, List[int]] = None, engine: str = None, connectivity: int = None,
+                 downscale: int = None, validate: bool = None, tile_size: int = None, roi: str = None,
+                 num_workers: int = None, num_threads: int = None, prefetch: int = None,
+                 cache_dir: str = None, cache_size: int = None, profile: bool = None, profile_file: str = None,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the filter.
@@ -25,16 +31,47 @@ class Fill(ImageAndAnnotationFilter):
         :type output_format: str
         :param incorrect_format_action: how to react to incorrect input format
         :type incorrect_format_action: str
-        :param size: the minimum object area size
-        :type size: int
+        :param size: the minimum object area size, a list generates a variant per size
+        :type size: int or list
+        :param engine: the engine to use (pcv/label)
+        :type engine: str
+        :param connectivity: the connectivity to use for determining the objects (4/8)
+        :type connectivity: int
+        :param downscale: the factor to downscale the images by for an approximate result, exact result if less than 2
+        :type downscale: int
+        :param validate: whether to compare the approximate results with the exact ones and store the agreement in the meta-data
+        :type validate: bool
+        :param tile_size: the size of the tiles to process the images in, None for processing them as a whole
+        :type tile_size: int
+        :param roi: the region of the image to process (full/annotations)
+        :type roi: str
+        :param num_workers: the number of worker processes to use
+        :type num_workers: int
+        :param num_threads: the number of threads to use for processing the segmentation layers
+        :type num_threads: int
+        :param prefetch: the number of records of a batch to decode and convert ahead in a background thread, 0 to disable
+        :type prefetch: int
+        :param cache_dir: the directory for caching the results, None for no caching
+        :type cache_dir: str
+        :param cache_size: the maximum size of the cache in MB
+        :type cache_size: int
+        :param profile: whether to record the time spent in the processing stages
+        :type profile: bool
+        :param profile_file: the file to write the profiling totals to (JSON or Prometheus text), None for not writing them
+        :type profile_file: str
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
         :type logging_level: str
         """
         super().__init__(apply_to=apply_to, output_format=output_format, incorrect_format_action=incorrect_format_action,
+                         downscale=downscale, validate=validate, tile_size=tile_size, roi=roi,
+                         num_workers=num_workers, num_threads=num_threads, prefetch=prefetch,
+                         cache_dir=cache_dir, cache_size=cache_size, profile=profile, profile_file=profile_file,
                          logger_name=logger_name, logging_level=logging_level)
         self.size = size
+        self.engine = engine
+        self.connectivity = connectivity
 
     def name(self) -> str:
         """
@@ -80,7 +117,9 @@ class Fill(ImageAndAnnotationFilter):
         :rtype: argparse.ArgumentParser
         """
         parser = super()._create_argparser()
-        parser.add_argument("-s", "--size", type=int, help="The minimum object area size in pixels.", default=1, required=False)
+        parser.add_argument("-s", "--size", type=int, nargs="+", help="The minimum object area size in pixels. Multiple values generate a variant record per size; variants continue from the previous variant if the sizes are ascending.", default=[1], required=False)
+        parser.add_argument("-e", "--engine", choices=FILL_ENGINES, help="The engine to use; '" + ENGINE_LABEL + "' determines all object sizes in a single connected component labelling pass and is identical to '" + ENGINE_PCV + "' with 4-connectivity; '" + ENGINE_RLE + "' does the same on run-length encoded masks, i.e., the cost is proportional to the foreground rather than the image area (suited for sparse segmentation layers).", default=ENGINE_PCV, required=False)
+        parser.add_argument("-c", "--connectivity", choices=CONNECTIVITIES, type=int, help="The pixel connectivity to use for determining the objects; 8-connectivity requires the '" + ENGINE_LABEL + "' or '" + ENGINE_RLE + "' engine.", default=4, required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -91,7 +130,9 @@ class Fill(ImageAndAnnotationFilter):
         :type ns: argparse.Namespace
         """
         super()._apply_args(ns)
-        self.size = ns.size
+        self.size = single_value(ns.size)
+        self.engine = ns.engine
+        self.connectivity = ns.connectivity
 
     def initialize(self):
         """
@@ -100,8 +141,19 @@ class Fill(ImageAndAnnotationFilter):
         super().initialize()
         if self.size is None:
             self.size = 1
-        if self.size < 1:
-            raise Exception("Minimum object area size must be at least 1, current: %s" % str(self.size))
+        for size in make_list(self.size):
+            if size < 1:
+                raise Exception("Minimum object area size must be at least 1, current: %s" % str(size))
+        if self.engine is None:
+            self.engine = ENGINE_PCV
+        if self.engine not in FILL_ENGINES:
+            raise Exception("Unsupported engine: %s" % self.engine)
+        if self.connectivity is None:
+            self.connectivity = 4
+        if self.connectivity not in CONNECTIVITIES:
+            raise Exception("Unsupported connectivity: %s" % str(self.connectivity))
+        if (self.connectivity != 4) and (self.engine == ENGINE_PCV):
+            raise Exception("Connectivity %d requires engine '%s' or '%s'!" % (self.connectivity, ENGINE_LABEL, ENGINE_RLE))
 
     def _required_format(self) -> str:
         """
@@ -112,9 +164,99 @@ class Fill(ImageAndAnnotationFilter):
         """
         return REQUIRED_FORMAT_BINARY
 
-    def _apply_filter(self, source: str, array: np.ndarray) -> np.ndarray:
+    def _sweep_names(self) -> List[str]:
         """
-        Applies the filter to the image and returns the numpy array.
+        Returns the names of the parameters that can be specified as lists, generating a variant record
+        per parameter combination.
+
+        :return: the names of the parameters
+        :rtype: list
+        """
+        return ["size"]
+
+    def _sweep_increment(self, previous: Dict[str, Any], combination: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the parameters for obtaining the result of the combination by applying the filter to the result
+        of the previous combination, if that is identical to applying the filter to the original image.
+        The objects that survive a larger size are a subset of the ones that survived the smaller one.
+
+        :param previous: the parameter values of the previous combination
+        :type previous: dict
+        :param combination: the parameter values of the current combination
+        :type combination: dict
+        :return: the parameters to apply to the previous result, None if to apply the filter to the original image
+        :rtype: dict
+        """
+        if self._approximate() or (self.roi != ROI_FULL):
+            return None
+        if combination["size"] < previous["size"]:
+            return None
+        return {"size": combination["size"]}
+
+    def _short_circuit(self, array: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Determines the result without applying the filter if possible, e.g., for empty or full masks.
+        Empty masks stay empty, full masks either stay full or get removed, and masks with fewer foreground
+        pixels than the size get removed completely, as none of their objects can be large enough.
+
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image, None if the filter needs to be applied
+        :rtype: np.ndarray
+        """
+        value = constant_value(array)
+        if value == 0:
+            return array
+        area = array.size if (value is not None) else np.count_nonzero(array)
+        keep = (area > self.size) if size_inclusive() else (area >= self.size)
+        if not keep:
+            return np.zeros_like(array)
+        if value is not None:
+            return np.full_like(array, 255)
+        return None
+
+    def _roi_full_frame(self) -> bool:
+        """
+        Returns whether the filter has to be applied to the whole image when restricting the processing
+        to the annotations. The objects can extend beyond any bounding box and margin, i.e., their areas
+        can only be determined on the whole image.
+
+        :return: True if to apply the filter to the whole image
+        :rtype: bool
+        """
+        return True
+
+    def _apply_filter_downscaled(self, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter with the size scaled to the downscaled image.
+
+        :param array: the downscaled image to apply the filter to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        size = scaled_size(self.size, self.downscale)
+        if self.engine == ENGINE_PCV:
+            return pcv.fill(array, size)
+        return label_fill(array, size, connectivity=self.connectivity)
+
+    def _refine(self, array: np.ndarray, array_new: np.ndarray) -> np.ndarray:
+        """
+        Refines the upscaled approximate result using the original image.
+        Filling only removes objects, i.e., the kept objects get their edges from the original image.
+
+        :param array: the original image
+        :type array: np.ndarray
+        :param array_new: the upscaled approximate result
+        :type array_new: np.ndarray
+        :return: the refined result
+        :rtype: np.ndarray
+        """
+        return np.where((array_new > 0) & (array > 0), 255, 0).astype(np.uint8)
+
+    def _apply_filter_untiled(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter to the whole image (or tile) and returns the numpy array.
 
         :param source: whether image or layer
         :type source: str
@@ -123,4 +265,33 @@ class Fill(ImageAndAnnotationFilter):
         :return: the filtered image
         :rtype: np.ndarray
         """
+        if self.engine == ENGINE_LABEL:
+            return label_fill(array, self.size, connectivity=self.connectivity)
+        if self.engine == ENGINE_RLE:
+            return self._apply_rle(RLEMask.from_array(array)).to_array()
         return pcv.fill(array, self.size)
+
+    def _apply_filter_tiled(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter tile by tile and returns the numpy array.
+        Objects spanning multiple tiles get merged, i.e., the result is identical to processing the whole image.
+
+        :param source: whether image or layer
+        :type source: str
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        return tiled_label_fill(array, self.tile_size, self.size, connectivity=self.connectivity)
+
+    def _apply_rle(self, mask: RLEMask) -> RLEMask:
+        """
+        Applies the filter to the run-length encoded binary image.
+
+        :param mask: the mask to process
+        :type mask: RLEMask
+        :return: the processed mask
+        :rtype: RLEMask
+        """
+        return rle_fill(mask, self.size, connectivity=self.connectivity)
@@ -1,17 +1,70 @@
-from typing import List
+import argparse
+from typing import List, Optional
 
 import numpy as np
-from plantcv import plantcv as pcv
+from wai.logging import LOGGING_WARNING
 
 from idc.api import ImageClassificationData, ObjectDetectionData, ImageSegmentationData, binary_required_info, REQUIRED_FORMAT_BINARY
-from idc.filter import ImageAndAnnotationFilter
+from idc.plantcv.api import pcv, ENGINE_PCV, ENGINE_LABEL, ENGINE_RLE, FILL_ENGINES, label_fill_holes, tiled_label_fill_holes
+from idc.plantcv.api import RLEMask, rle_fill_holes, constant_value
+from ._tiled_plantcv_filter import TiledPlantCVFilter
 
 
-class FillHoles(ImageAndAnnotationFilter):
+class FillHoles(TiledPlantCVFilter):
     """
     Flood fills holes in a binary image.
     """
 
+    def __init__(self, apply_to: str = None, output_format: str = None, incorrect_format_action: str = None,
+                 engine: str = None, max_hole_size: int = None,
+                 tile_size: int = None, roi: str = None,
+                 num_workers: int = None, num_threads: int = None, prefetch: int = None,
+                 cache_dir: str = None, cache_size: int = None, profile: bool = None, profile_file: str = None,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the filter.
+
+        :param apply_to: where to apply the filter to
+        :type apply_to: str
+        :param output_format: the output format to use
+        :type output_format: str
+        :param incorrect_format_action: how to react to incorrect input format
+        :type incorrect_format_action: str
+        :param engine: the engine to use (pcv/label)
+        :type engine: str
+        :param max_hole_size: the maximum area in pixels of holes to fill, None for all holes
+        :type max_hole_size: int
+        :param tile_size: the size of the tiles to process the images in, None for processing them as a whole
+        :type tile_size: int
+        :param roi: the region of the image to process (full/annotations)
+        :type roi: str
+        :param num_workers: the number of worker processes to use
+        :type num_workers: int
+        :param num_threads: the number of threads to use for processing the segmentation layers
+        :type num_threads: int
+        :param prefetch: the number of records of a batch to decode and convert ahead in a background thread, 0 to disable
+        :type prefetch: int
+        :param cache_dir: the directory for caching the results, None for no caching
+        :type cache_dir: str
+        :param cache_size: the maximum size of the cache in MB
+        :type cache_size: int
+        :param profile: whether to record the time spent in the processing stages
+        :type profile: bool
+        :param profile_file: the file to write the profiling totals to (JSON or Prometheus text), None for not writing them
+        :type profile_file: str
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(apply_to=apply_to, output_format=output_format, incorrect_format_action=incorrect_format_action,
+                         tile_size=tile_size, roi=roi,
+                         num_workers=num_workers, num_threads=num_threads, prefetch=prefetch,
+                         cache_dir=cache_dir, cache_size=cache_size, profile=profile, profile_file=profile_file,
+                         logger_name=logger_name, logging_level=logging_level)
+        self.engine = engine
+        self.max_hole_size = max_hole_size
+
     def name(self) -> str:
         """
         Returns the name of the handler, used as sub-command.
@@ -48,6 +101,44 @@ class FillHoles(ImageAndAnnotationFilter):
         """
         return [ImageClassificationData, ObjectDetectionData, ImageSegmentationData]
 
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        parser.add_argument("-e", "--engine", choices=FILL_ENGINES, help="The engine to use; '" + ENGINE_LABEL + "' labels the background once and treats all background regions not touching the image border as holes, identical to '" + ENGINE_PCV + "' when filling all holes; '" + ENGINE_RLE + "' does the same on run-length encoded masks, i.e., the cost is proportional to the number of runs rather than the image area (suited for sparse segmentation layers).", default=ENGINE_PCV, required=False)
+        parser.add_argument("-m", "--max_hole_size", type=int, help="The maximum area in pixels of holes to fill, larger holes are kept; fills all holes if not specified. Requires the '" + ENGINE_LABEL + "' or '" + ENGINE_RLE + "' engine.", default=None, required=False)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.engine = ns.engine
+        self.max_hole_size = ns.max_hole_size
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if self.engine is None:
+            self.engine = ENGINE_PCV
+        if self.engine not in FILL_ENGINES:
+            raise Exception("Unsupported engine: %s" % self.engine)
+        if self.max_hole_size is not None:
+            if self.max_hole_size < 1:
+                raise Exception("Maximum hole size must be at least 1, current: %s" % str(self.max_hole_size))
+            if self.engine == ENGINE_PCV:
+                raise Exception("Maximum hole size requires engine '%s' or '%s'!" % (ENGINE_LABEL, ENGINE_RLE))
+
     def _required_format(self) -> str:
         """
         Returns what input format is required for applying the filter.
@@ -57,9 +148,37 @@ class FillHoles(ImageAndAnnotationFilter):
         """
         return REQUIRED_FORMAT_BINARY
 
-    def _apply_filter(self, source: str, array: np.ndarray) -> np.ndarray:
+    def _short_circuit(self, array: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Determines the result without applying the filter if possible, e.g., for empty or full masks.
+        Neither empty nor full masks have any holes.
+
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image, None if the filter needs to be applied
+        :rtype: np.ndarray
+        """
+        value = constant_value(array)
+        if value is None:
+            return None
+        if value == 0:
+            return array
+        return np.full_like(array, 255)
+
+    def _roi_full_frame(self) -> bool:
+        """
+        Returns whether the filter has to be applied to the whole image when restricting the processing
+        to the annotations. Whether a background region is a hole, i.e., does not touch the image border,
+        can only be determined on the whole image.
+
+        :return: True if to apply the filter to the whole image
+        :rtype: bool
+        """
+        return True
+
+    def _apply_filter_untiled(self, source: str, array: np.ndarray) -> np.ndarray:
         """
-        Applies the filter to the image and returns the numpy array.
+        Applies the filter to the whole image (or tile) and returns the numpy array.
 
         :param source: whether image or layer
         :type source: str
@@ -68,4 +187,33 @@ class FillHoles(ImageAndAnnotationFilter):
         :return: the filtered image
         :rtype: np.ndarray
         """
+        if self.engine == ENGINE_LABEL:
+            return label_fill_holes(array, max_hole_size=self.max_hole_size)
+        if self.engine == ENGINE_RLE:
+            return self._apply_rle(RLEMask.from_array(array)).to_array()
         return pcv.fill_holes(array.astype(np.uint8))
+
+    def _apply_filter_tiled(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter tile by tile and returns the numpy array.
+        Objects spanning multiple tiles get merged, i.e., the result is identical to processing the whole image.
+
+        :param source: whether image or layer
+        :type source: str
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        return tiled_label_fill_holes(array, self.tile_size, max_hole_size=self.max_hole_size)
+
+    def _apply_rle(self, mask: RLEMask) -> RLEMask:
+        """
+        Applies the filter to the run-length encoded binary image.
+
+        :param mask: the mask to process
+        :type mask: RLEMask
+        :return: the processed mask
+        :rtype: RLEMask
+        """
+        return rle_fill_holes(mask, max_hole_size=self.max_hole_size)
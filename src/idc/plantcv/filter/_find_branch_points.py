@@ -1,15 +1,11 @@
-from typing import List
-
 import numpy as np
-from kasperl.api import make_list, flatten_list, safe_deepcopy
-from idc.api import ImageClassificationData, ObjectDetectionData, ImageSegmentationData, \
-    ensure_binary, binary_required_info
-from plantcv import plantcv as pcv
-from seppl.io import BatchFilter
-from wai.common.adams.imaging.locateobjects import LocatedObject, LocatedObjects
+
+from idc.api import binary_required_info
+from idc.plantcv.api import pcv, ENGINE_LUT, classify_skeleton
+from ._point_finder import PointFinder
 
 
-class FindBranchPoints(BatchFilter):
+class FindBranchPoints(PointFinder):
     """
     Find branch points in a skeletonized image and forwards them as object detection annotations.
     """
@@ -32,46 +28,24 @@ class FindBranchPoints(BatchFilter):
         """
         return "Finds branch points in a skeletonized image and forwards them as object detection annotations. " + binary_required_info()
 
-    def accepts(self) -> List:
-        """
-        Returns the list of classes that are accepted.
-
-        :return: the list of classes
-        :rtype: list
+    def _find_points(self, array: np.ndarray) -> np.ndarray:
         """
-        return [ImageClassificationData, ObjectDetectionData, ImageSegmentationData]
+        Locates the points in the skeletonized image.
 
-    def generates(self) -> List:
+        :param array: the skeletonized image to analyze
+        :type array: np.ndarray
+        :return: the image with just the points, rest 0
+        :rtype: np.ndarray
         """
-        Returns the list of classes that get produced.
+        if self.engine == ENGINE_LUT:
+            return classify_skeleton(array, tips=False)[1]
+        return pcv.morphology.find_branch_pts(array)
 
-        :return: the list of classes
-        :rtype: list
+    def _point_type(self) -> str:
         """
-        return [ObjectDetectionData]
+        Returns the type of point that gets stored in the meta-data of the annotations.
 
-    def _do_process(self, data):
-        """
-        Processes the data record(s).
-
-        :param data: the record(s) to process
-        :return: the potentially updated record(s)
+        :return: the type
+        :rtype: str
         """
-        result = []
-        for item in make_list(data):
-            image = ensure_binary(item.image, logger=self.logger())
-            array = np.asarray(image).astype(np.uint8)
-            array_new = pcv.morphology.find_branch_pts(array)
-            locations = np.where(array_new > 0)
-            lobjs = LocatedObjects()
-            for y, x in zip(locations[0], locations[1]):
-                meta = {"type": "branch"}
-                lobj = LocatedObject(int(x), int(y), 1, 1, **meta)
-                lobjs.append(lobj)
-            item_new = ObjectDetectionData(image_name=item.image_name,
-                                           data=safe_deepcopy(item.data), image=safe_deepcopy(item.image),
-                                           metadata=safe_deepcopy(item.get_metadata()),
-                                           annotation=lobjs)
-            result.append(item_new)
-
-        return flatten_list(result)
+        return "branch"
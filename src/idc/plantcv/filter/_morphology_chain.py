@@ -0,0 +1,260 @@
+import argparse
+import shlex
+from typing import List, Optional
+
+import numpy as np
+from wai.logging import LOGGING_WARNING
+
+from idc.api import ImageClassificationData, ObjectDetectionData, ImageSegmentationData, REQUIRED_FORMAT_BINARY
+from idc.plantcv.api import ENGINE_RLE, RLEMask, constant_value, sweep_combinations
+from ._plantcv_filter import PlantCVFilter
+from ._dilate import Dilate
+from ._erode import Erode
+from ._fill import Fill
+from ._fill_holes import FillHoles
+from ._skeletonize import Skeletonize
+
+CHAIN_OPERATIONS = {
+    "dilate": Dilate,
+    "erode": Erode,
+    "fill": Fill,
+    "fill-holes": FillHoles,
+    "skeletonize": Skeletonize,
+}
+
+OPERATION_PARAMETERS_UNSUPPORTED = [
+    "logging_level",
+    "logger_name",
+    "skip",
+    "incorrect_format_action",
+    "apply_to",
+    "output_format",
+    "num_workers",
+    "num_threads",
+    "prefetch",
+    "cache_dir",
+    "cache_size",
+    "profile",
+    "profile_file",
+    "tile_size",
+    "roi",
+    "downscale",
+    "validate",
+]
+""" the options of the operations that the chain does not support, as it processes the whole image/layer itself. """
+
+
+class MorphologyChain(PlantCVFilter):
+    """
+    Applies a sequence of morphological operations, decoding and encoding the image only once.
+    """
+
+    def __init__(self, apply_to: str = None, output_format: str = None, incorrect_format_action: str = None,
+                 operations: List[str] = None,
+                 num_workers: int = None, num_threads: int = None, prefetch: int = None,
+                 cache_dir: str = None, cache_size: int = None, profile: bool = None, profile_file: str = None,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the filter.
+
+        :param apply_to: where to apply the filter to
+        :type apply_to: str
+        :param output_format: the output format to use
+        :type output_format: str
+        :param incorrect_format_action: how to react to incorrect input format
+        :type incorrect_format_action: str
+        :param operations: the operations to apply, e.g., 'fill -s 200'
+        :type operations: list
+        :param num_workers: the number of worker processes to use
+        :type num_workers: int
+        :param num_threads: the number of threads to use for processing the segmentation layers
+        :type num_threads: int
+        :param prefetch: the number of records of a batch to decode and convert ahead in a background thread, 0 to disable
+        :type prefetch: int
+        :param cache_dir: the directory for caching the results, None for no caching
+        :type cache_dir: str
+        :param cache_size: the maximum size of the cache in MB
+        :type cache_size: int
+        :param profile: whether to record the time spent in the processing stages
+        :type profile: bool
+        :param profile_file: the file to write the profiling totals to (JSON or Prometheus text), None for not writing them
+        :type profile_file: str
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(apply_to=apply_to, output_format=output_format, incorrect_format_action=incorrect_format_action,
+                         num_workers=num_workers, num_threads=num_threads, prefetch=prefetch,
+                         cache_dir=cache_dir, cache_size=cache_size, profile=profile, profile_file=profile_file,
+                         logger_name=logger_name, logging_level=logging_level)
+        self.operations = operations
+        self._operations = None
+
+    def name(self) -> str:
+        """
+        Returns the name of the handler, used as sub-command.
+
+        :return: the name
+        :rtype: str
+        """
+        return "pcv-morphology-chain"
+
+    def description(self) -> str:
+        """
+        Returns a description of the filter.
+
+        :return: the description
+        :rtype: str
+        """
+        return "Applies a sequence of morphological operations to the image and/or annotations, decoding and encoding the image only once. " \
+               "The operations (" + "|".join(sorted(CHAIN_OPERATIONS.keys())) + ") use the same options as the corresponding pcv-* filters. " \
+               "Grayscale intermediate results get binarized like with '-o binary' if an operation requires a binary image. " \
+               "Consecutive operations using the '" + ENGINE_RLE + "' engine keep the image run-length encoded in between."
+
+    def accepts(self) -> List:
+        """
+        Returns the list of classes that are accepted.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        return [ImageClassificationData, ObjectDetectionData, ImageSegmentationData]
+
+    def generates(self) -> List:
+        """
+        Returns the list of classes that get produced.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        return [ImageClassificationData, ObjectDetectionData, ImageSegmentationData]
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        parser.add_argument("-O", "--operations", type=str, metavar="OPERATION", help="The operations to apply in the specified order, each consisting of operation name and options, e.g.: 'fill-holes' 'fill -s 200' 'dilate -k 5' 'skeletonize -p'. Only the options specific to the operation are supported, options like workers, threads, caching, profiling, tiling, ROI or downscaling apply to the chain as a whole or are not available.", default=None, required=False, nargs="*")
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.operations = ns.operations
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if (self.operations is None) or (len(self.operations) == 0):
+            raise Exception("No operations specified!")
+        self._operations = []
+        for operation in self.operations:
+            args = shlex.split(operation)
+            if (len(args) == 0) or (args[0] not in CHAIN_OPERATIONS):
+                raise Exception("Unknown operation '%s', available: %s" % (operation, ", ".join(sorted(CHAIN_OPERATIONS.keys()))))
+            op = CHAIN_OPERATIONS[args[0]]()
+            parser = op._create_argparser()
+            ns = parser.parse_args(args[1:])
+            unsupported = [x for x in OPERATION_PARAMETERS_UNSUPPORTED if hasattr(ns, x) and (getattr(ns, x) != parser.get_default(x))]
+            if len(unsupported) > 0:
+                raise Exception("Operation '%s' does not support option(s): %s" % (operation, ", ".join(["--" + x for x in unsupported])))
+            op._apply_args(ns)
+            op.logger_name = self.logger_name
+            op.logging_level = self.logging_level
+            op.initialize()
+            swept, _ = sweep_combinations(op, op._sweep_names())
+            if len(swept) > 0:
+                raise Exception("Operation '%s' does not support multiple values for: %s" % (operation, ", ".join(swept)))
+            self._operations.append(op)
+
+    def _nothing_to_do(self, data) -> bool:
+        """
+        Checks whether there is nothing to do, e.g., due to parameters.
+
+        :param data: the data to process
+        :return: whether nothing needs to be done
+        :rtype: bool
+        """
+        return all([op._nothing_to_do(data) for op in self._operations])
+
+    def _required_format(self) -> str:
+        """
+        Returns what input format is required for applying the filter.
+
+        :return: the type of image
+        :rtype: str
+        """
+        return self._operations[0]._required_format()
+
+    def _short_circuit(self, array: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Determines the result without applying the filter if possible, e.g., for empty or full masks.
+        Empty masks stay empty with all operations.
+
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image, None if the filter needs to be applied
+        :rtype: np.ndarray
+        """
+        if constant_value(array) == 0:
+            return array
+        return None
+
+    def _apply_filter(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter to the image and returns the numpy array.
+
+        :param source: whether image or layer
+        :type source: str
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        # layers are always binary (0/255)
+        binary = (source != "image") or (self._required_format() == REQUIRED_FORMAT_BINARY)
+        # consecutive operations using the rle engine keep the image run-length encoded
+        mask = None
+        for op in self._operations:
+            if op._nothing_to_do(None):
+                continue
+            if op._required_format() == REQUIRED_FORMAT_BINARY:
+                # same threshold as the binary output format
+                if not binary:
+                    array = np.where(array > 1, 255, 0).astype(np.uint8)
+                binary = True
+            if op.engine == ENGINE_RLE:
+                if mask is None:
+                    mask = RLEMask.from_array(array, binary_only=True)
+                if mask is not None:
+                    mask = op._apply_rle(mask)
+                    continue
+            if mask is not None:
+                array = mask.to_array(array.dtype)
+                mask = None
+            # erosion/dilation preserve binary values, i.e., no need to update the flag otherwise
+            array = op._apply_filter(source, array)
+        if mask is not None:
+            array = mask.to_array(array.dtype)
+        return array
+
+    def finalize(self):
+        """
+        Finishes the processing, e.g., for closing files or databases.
+        """
+        super().finalize()
+        if self._operations is not None:
+            for op in self._operations:
+                op.finalize()
+            self._operations = None
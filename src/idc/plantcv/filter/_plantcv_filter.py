@@ -0,0 +1,528 @@
+import abc
+import argparse
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+from wai.logging import LOGGING_WARNING
+
+from idc.api import ImageSegmentationData, APPLY_TO_IMAGE, APPLY_TO_ANNOTATIONS, APPLY_TO_BOTH, REQUIRED_FORMAT_ANY, image_to_bytesio
+from idc.filter import ImageAndAnnotationFilter, array_to_output_format
+from idc.plantcv.api import WorkerPool, add_num_workers_param, ResultCache, add_cache_params, cache_parameters, cache_key
+from idc.plantcv.api import load_plantcv, add_num_threads_param, create_thread_pool, debug_disabled, STAGE_FORMAT, STAGE_PCV, STAGE_OUTPUT, STAGE_RECORD, add_profile_params, stage_timer, timed
+from idc.plantcv.api import is_lossless, attach_array_view, cached_array, Prefetcher, add_prefetch_param, ShortCircuits
+from idc.plantcv.api import sweep_combinations, sweep_parameters, variant_name, variant_metadata
+from kasperl.api import make_list, flatten_list, safe_deepcopy
+
+
+class PlantCVFilter(ImageAndAnnotationFilter, abc.ABC):
+    """
+    Ancestor for plantcv filters that can work on either image or annotations.
+    Can distribute the records of a batch across multiple worker processes and the segmentation
+    layers of a record across multiple threads. Can decode and convert the records of a batch in a
+    background thread ahead of the record being processed.
+    Generated records keep the decoded image (lossless formats only) with an array view attached,
+    which subsequent pcv filters use instead of decoding and converting the image again.
+    """
+
+    def __init__(self, apply_to: str = None, output_format: str = None, incorrect_format_action: str = None,
+                 num_workers: int = None, num_threads: int = None, prefetch: int = None,
+                 cache_dir: str = None, cache_size: int = None, profile: bool = None, profile_file: str = None,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the filter.
+
+        :param apply_to: where to apply the filter to
+        :type apply_to: str
+        :param output_format: the output format to use
+        :type output_format: str
+        :param incorrect_format_action: how to react to incorrect input format
+        :type incorrect_format_action: str
+        :param num_workers: the number of worker processes to use
+        :type num_workers: int
+        :param num_threads: the number of threads to use for processing the segmentation layers
+        :type num_threads: int
+        :param prefetch: the number of records of a batch to decode and convert ahead in a background thread, 0 to disable
+        :type prefetch: int
+        :param cache_dir: the directory for caching the results, None for no caching
+        :type cache_dir: str
+        :param cache_size: the maximum size of the cache in MB
+        :type cache_size: int
+        :param profile: whether to record the time spent in the processing stages
+        :type profile: bool
+        :param profile_file: the file to write the profiling totals to (JSON or Prometheus text), None for not writing them
+        :type profile_file: str
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(apply_to=apply_to, output_format=output_format, incorrect_format_action=incorrect_format_action,
+                         logger_name=logger_name, logging_level=logging_level)
+        self.num_workers = num_workers
+        self.num_threads = num_threads
+        self.prefetch = prefetch
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.profile = profile
+        self.profile_file = profile_file
+        self._worker_pool = None
+        self._thread_pool = None
+        self._cache = None
+        self._timer = None
+        self._short_circuits = None
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        add_num_workers_param(parser)
+        add_num_threads_param(parser)
+        add_prefetch_param(parser)
+        add_cache_params(parser)
+        add_profile_params(parser)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.num_workers = ns.num_workers
+        self.num_threads = ns.num_threads
+        self.prefetch = ns.prefetch
+        self.cache_dir = ns.cache_dir
+        self.cache_size = ns.cache_size
+        self.profile = ns.profile
+        self.profile_file = ns.profile_file
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if self.num_workers is None:
+            self.num_workers = 1
+        if self.num_workers < 1:
+            raise Exception("# workers must be at least 1, current: %s" % str(self.num_workers))
+        if self.num_threads is None:
+            self.num_threads = 1
+        if self.num_threads < 1:
+            raise Exception("# threads must be at least 1, current: %s" % str(self.num_threads))
+        if self.prefetch is None:
+            self.prefetch = 0
+        if self.prefetch < 0:
+            raise Exception("Prefetch must be at least 0, current: %s" % str(self.prefetch))
+        if self.cache_size is None:
+            self.cache_size = 1024
+        if self.cache_size < 1:
+            raise Exception("Cache size must be at least 1MB, current: %s" % str(self.cache_size))
+        self._worker_pool = None
+        self._thread_pool = None
+        self._cache = None
+        if self.cache_dir is not None:
+            self._cache = ResultCache(self.cache_dir, self.cache_size, self.logger())
+        if self.profile is None:
+            self.profile = False
+        self._timer = stage_timer(self)
+        self._short_circuits = ShortCircuits(self.logger())
+        load_plantcv()
+
+    def _requires_list_input(self) -> bool:
+        """
+        Returns whether lists are expected as input for the _process method.
+
+        :return: True if list inputs are expected by the filter
+        :rtype: bool
+        """
+        return ((self.num_workers is not None) and (self.num_workers > 1)) \
+               or ((self.prefetch is not None) and (self.prefetch > 0))
+
+    def _image_to_array(self, image: Image.Image) -> np.ndarray:
+        """
+        Turns the image into the numpy array to apply the filter to.
+
+        :param image: the image to convert
+        :type image: Image.Image
+        :return: the array
+        :rtype: np.ndarray
+        """
+        return np.asarray(image).astype(np.uint8)
+
+    def _short_circuit(self, array: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Determines the result without applying the filter if possible, e.g., for empty or full masks.
+        The check must be cheap compared to applying the filter.
+
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image, None if the filter needs to be applied
+        :rtype: np.ndarray
+        """
+        return None
+
+    def _apply_filter_cached(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter to the image and returns the numpy array, using the cache if available.
+
+        :param source: whether image or layer
+        :type source: str
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        return self._apply_filter_all([source], [array])[0]
+
+    def _apply_filter_image(self, item, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter to the image of the record and returns the numpy array.
+
+        :param item: the record the image belongs to
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        return self._apply_filter_cached("image", array)
+
+    def _apply_filter_all(self, sources: List[str], arrays: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Applies the filter to the images and returns the numpy arrays (same order), short-circuiting where possible
+        and using the cache if available.
+        Uses the thread pool if there is more than one image to process. Cache look-ups happen in the calling thread.
+
+        :param sources: whether image or layer, per image
+        :type sources: list
+        :param arrays: the images the filter to apply to
+        :type arrays: list
+        :return: the filtered images
+        :rtype: list
+        """
+        result = [None] * len(arrays)
+        keys = [None] * len(arrays)
+        todo = []
+        for i, array in enumerate(arrays):
+            if self._timer is not None:
+                self._timer.add_pixels(array.size)
+            result[i] = self._short_circuit(array)
+            self._short_circuits.add(result[i] is not None)
+            if result[i] is not None:
+                continue
+            if self._cache is not None:
+                keys[i] = cache_key(array, self.name(), cache_parameters(self), sources[i])
+                result[i] = self._cache.get(keys[i])
+            if result[i] is None:
+                todo.append(i)
+
+        if (self.num_threads > 1) and (len(todo) > 1):
+            if self._thread_pool is None:
+                self._thread_pool = create_thread_pool(self.num_threads, self.name())
+            # plot/print debugging of plantcv is not thread-safe
+            with debug_disabled():
+                computed = list(self._thread_pool.map(self._apply_filter, [sources[i] for i in todo], [arrays[i] for i in todo]))
+        else:
+            computed = [self._apply_filter(sources[i], arrays[i]) for i in todo]
+
+        for i, array_new in zip(todo, computed):
+            result[i] = array_new
+            if self._cache is not None:
+                self._cache.put(keys[i], np.asarray(array_new))
+        return result
+
+    def _input_array(self, item) -> Optional[np.ndarray]:
+        """
+        Returns the array of the record's image to process, i.e., in the required format when applying
+        the filter to the image, as is otherwise.
+
+        :param item: the record to get the array for
+        :return: the array, None if the image is not in the correct format and cannot be processed
+        :rtype: np.ndarray
+        """
+        if self.apply_to in [APPLY_TO_IMAGE, APPLY_TO_BOTH]:
+            array = cached_array(item, self._required_format())
+            if array is None:
+                # incorrect format?
+                if not self._can_process(item.image):
+                    return None
+                image = self._ensure_correct_format(item.image)
+                array = self._image_to_array(image)
+            return array
+        array = cached_array(item, REQUIRED_FORMAT_ANY)
+        if array is None:
+            array = np.asarray(item.image).astype(np.uint8)
+        return array
+
+    def _prefetch_record(self, item) -> Optional[np.ndarray]:
+        """
+        Determines the array of the record to process, executed in the background thread when prefetching.
+
+        :param item: the record to get the array for
+        :return: the array, None if the record cannot be processed
+        :rtype: np.ndarray
+        """
+        with timed(self._timer, STAGE_FORMAT):
+            return self._input_array(item)
+
+    def _sweep_names(self) -> List[str]:
+        """
+        Returns the names of the parameters that can be specified as lists, generating a variant record
+        per parameter combination.
+
+        :return: the names of the parameters
+        :rtype: list
+        """
+        return []
+
+    def _sweep_increment(self, previous: Dict[str, Any], combination: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the parameters for obtaining the result of the combination by applying the filter to the result
+        of the previous combination, if that is identical to applying the filter to the original image.
+
+        :param previous: the parameter values of the previous combination
+        :type previous: dict
+        :param combination: the parameter values of the current combination
+        :type combination: dict
+        :return: the parameters to apply to the previous result, None if to apply the filter to the original image
+        :rtype: dict
+        """
+        return None
+
+    def _apply_to_record(self, item, array: np.ndarray, annotation):
+        """
+        Applies the filter to the image and/or the annotations of the record.
+
+        :param item: the record being processed
+        :param array: the image to apply the filter to
+        :type array: np.ndarray
+        :param annotation: the annotations to apply the filter to (gets copied)
+        :return: the tuple of filtered image and annotations
+        :rtype: tuple
+        """
+        # apply to image
+        if self.apply_to in [APPLY_TO_IMAGE, APPLY_TO_BOTH]:
+            with timed(self._timer, STAGE_PCV):
+                array_new = self._apply_filter_image(item, array)
+        # apply to annotations, nothing to do for image
+        else:
+            array_new = array
+
+        # apply to annotations?
+        with timed(self._timer, STAGE_RECORD):
+            annotation_new = safe_deepcopy(annotation)
+        if isinstance(item, ImageSegmentationData) and item.has_annotation():
+            if self.apply_to in [APPLY_TO_ANNOTATIONS, APPLY_TO_BOTH]:
+                with timed(self._timer, STAGE_PCV):
+                    layers = list(annotation_new.layers.keys())
+                    arrays_new = self._apply_filter_all(layers, [annotation_new.layers[x] for x in layers])
+                    for layer, array_new_layer in zip(layers, arrays_new):
+                        annotation_new.layers[layer] = array_new_layer
+
+        return array_new, annotation_new
+
+    def _create_record(self, item, array_new: np.ndarray, annotation_new, image_name: str = None, metadata: Dict = None):
+        """
+        Generates the output record.
+
+        :param item: the record that got processed
+        :param array_new: the filtered image
+        :type array_new: np.ndarray
+        :param annotation_new: the filtered annotations
+        :param image_name: the image name to use, None to use the one of the record
+        :type image_name: str
+        :param metadata: the meta-data to add, can be None
+        :type metadata: dict
+        :return: the generated record
+        """
+        # generate image/bytes
+        with timed(self._timer, STAGE_OUTPUT):
+            img_new = array_to_output_format(array_new, self.output_format, self.logger())
+            bytes_new = image_to_bytesio(img_new, item.image_format).getvalue()
+            # the decoded bytes would differ from the image for lossy formats
+            if not is_lossless(item.image_format):
+                img_new = None
+
+        with timed(self._timer, STAGE_RECORD):
+            metadata_new = safe_deepcopy(item.get_metadata())
+            if metadata is not None:
+                if metadata_new is None:
+                    metadata_new = dict()
+                metadata_new.update(metadata)
+            item_new = type(item)(image_name=item.image_name if image_name is None else image_name,
+                                  data=bytes_new,
+                                  image=img_new,
+                                  image_format=item.image_format,
+                                  metadata=metadata_new,
+                                  annotation=annotation_new)
+            attach_array_view(item_new)
+
+        self._post_apply_filter(item_new)
+        if self._timer is not None:
+            self._timer.add_record()
+
+        return item_new
+
+    def _process_sweep(self, item, array: np.ndarray, swept: List[str], combinations: List[Dict[str, Any]]) -> List:
+        """
+        Generates a variant record per parameter combination, tagged in the meta-data and with the image name
+        suffixed with the parameter values. Continues from the result of the previous combination where possible.
+
+        :param item: the record to process
+        :param array: the array of the record's image (see _input_array)
+        :type array: np.ndarray
+        :param swept: the names of the parameters that were specified as lists
+        :type swept: list
+        :param combinations: the parameter combinations
+        :type combinations: list
+        :return: the generated records
+        :rtype: list
+        """
+        result = []
+        previous = None
+        for combination in combinations:
+            if result:
+                self._pre_apply_filter(item)
+            array_in = array
+            annotation_in = item.annotation
+            parameters = combination
+            if previous is not None:
+                increment = self._sweep_increment(previous[0], combination)
+                if increment is not None:
+                    array_in = previous[1]
+                    annotation_in = previous[2]
+                    parameters = dict(combination)
+                    parameters.update(increment)
+            with sweep_parameters(self, parameters):
+                array_new, annotation_new = self._apply_to_record(item, array_in, annotation_in)
+            previous = (combination, array_new, annotation_new)
+            with sweep_parameters(self, combination):
+                result.append(self._create_record(item, array_new, annotation_new,
+                                                  image_name=variant_name(item.image_name, swept, combination),
+                                                  metadata=variant_metadata(swept, combination)))
+        return result
+
+    def _process_record(self, item, array: np.ndarray = None):
+        """
+        Processes a single record.
+
+        :param item: the record to process
+        :param array: the already determined array of the record's image (see _input_array), None to determine it
+        :type array: np.ndarray
+        :return: the updated record, list of variant records if parameters were specified as lists
+        """
+        self._pre_apply_filter(item)
+
+        if array is None:
+            array = self._prefetch_record(item)
+            if array is None:
+                return item
+
+        swept, combinations = sweep_combinations(self, self._sweep_names())
+        if len(combinations) > 0:
+            return self._process_sweep(item, array, swept, combinations)
+
+        array_new, annotation_new = self._apply_to_record(item, array, item.annotation)
+        return self._create_record(item, array_new, annotation_new)
+
+    def _pop_worker_counters(self) -> Dict[str, Dict]:
+        """
+        Returns the counters accumulated in a worker process (cache, timing, short-circuits) and resets them.
+
+        :return: the counters
+        :rtype: dict
+        """
+        result = dict()
+        result["short_circuits"] = self._short_circuits.pop_counters()
+        if self._cache is not None:
+            result["cache"] = self._cache.pop_counters()
+        if self._timer is not None:
+            result["timing"] = self._timer.pop_counters()
+        return result
+
+    def _add_worker_counters(self, counters: Dict[str, Dict]):
+        """
+        Adds the counters returned by a worker process.
+
+        :param counters: the counters to add
+        :type counters: dict
+        """
+        if (self._cache is not None) and ("cache" in counters):
+            self._cache.add_counters(counters["cache"])
+        if (self._timer is not None) and ("timing" in counters):
+            self._timer.add_counters(counters["timing"])
+        if "short_circuits" in counters:
+            self._short_circuits.add_counters(counters["short_circuits"])
+
+    def _do_process(self, data):
+        """
+        Processes the data record(s).
+
+        :param data: the record(s) to process
+        :return: the potentially updated record(s)
+        """
+        # nothing to do?
+        if self._nothing_to_do(data):
+            return data
+
+        items = make_list(data)
+        if self._timer is not None:
+            self._timer.start()
+        if (self.num_workers > 1) and (len(items) > 1):
+            if self._worker_pool is None:
+                self._worker_pool = WorkerPool(self, self.num_workers, self.logger())
+            result = self._worker_pool.map(items)
+        elif (self.prefetch > 0) and (len(items) > 1):
+            result = []
+            for item, array in Prefetcher(items, self._prefetch_record, self.prefetch, name=self.name()):
+                result.append(item if array is None else self._process_record(item, array=array))
+        else:
+            result = [self._process_record(item) for item in items]
+
+        # variant records of parameter sweeps
+        result = [x for r in result for x in make_list(r)]
+
+        return flatten_list(result)
+
+    def finalize(self):
+        """
+        Finishes the processing, e.g., for closing files or databases.
+        """
+        super().finalize()
+        if self._worker_pool is not None:
+            self._worker_pool.close()
+            self._worker_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown()
+            self._thread_pool = None
+        if self._cache is not None:
+            self._cache.log_counters()
+            self._cache = None
+        if self._short_circuits is not None:
+            self._short_circuits.log_counters()
+            self._short_circuits = None
+        if self._timer is not None:
+            self._timer.log_totals()
+            if self.profile_file is not None:
+                self._timer.write(self.profile_file)
+            self._timer = None
+
+    def __getstate__(self):
+        """
+        Returns the state to pickle, omits session, logger, worker and thread pool.
+
+        :return: the state
+        :rtype: dict
+        """
+        result = self.__dict__.copy()
+        result["_session"] = None
+        result["_logger"] = None
+        result["_worker_pool"] = None
+        result["_thread_pool"] = None
+        return result
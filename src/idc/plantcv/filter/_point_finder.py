@@ -0,0 +1,135 @@
+import abc
+import argparse
+from typing import Tuple, Optional, Dict
+
+import numpy as np
+from wai.common.adams.imaging.locateobjects import LocatedObjects
+from wai.logging import LOGGING_WARNING
+
+from idc.plantcv.api import ENGINE_PCV, ENGINE_LUT, POINT_ENGINES, constant_value
+from ._skeleton_analyzer import SkeletonAnalyzer
+
+
+class PointFinder(SkeletonAnalyzer, abc.ABC):
+    """
+    Ancestor for filters that locate points in a skeletonized image and forward them as object detection annotations.
+    """
+
+    def __init__(self, engine: str = None, cluster: bool = None, compact: bool = None, no_copy: bool = None,
+                 num_workers: int = None, prefetch: int = None, memory_budget: float = None,
+                 cache_dir: str = None, cache_size: int = None, profile: bool = None, profile_file: str = None,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the filter.
+
+        :param engine: the engine to use for locating the points (pcv/lut)
+        :type engine: str
+        :param cluster: whether to merge connected point pixels into a single annotation
+        :type cluster: bool
+        :param compact: whether to generate a compact, columnar set of points rather than individual annotation objects
+        :type compact: bool
+        :param no_copy: whether to share the image with the input record rather than copying it
+        :type no_copy: bool
+        :param num_workers: the number of worker processes to use
+        :type num_workers: int
+        :param prefetch: the number of records of a batch to decode and convert ahead in a background thread, 0 to disable
+        :type prefetch: int
+        :param memory_budget: the maximum number of megapixels to process at a time, None for processing whole batches
+        :type memory_budget: float
+        :param cache_dir: the directory for caching the results, None for no caching
+        :type cache_dir: str
+        :param cache_size: the maximum size of the cache in MB
+        :type cache_size: int
+        :param profile: whether to record the time spent in the processing stages
+        :type profile: bool
+        :param profile_file: the file to write the profiling totals to (JSON or Prometheus text), None for not writing them
+        :type profile_file: str
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(cluster=cluster, compact=compact, no_copy=no_copy,
+                         num_workers=num_workers, prefetch=prefetch, memory_budget=memory_budget,
+                         cache_dir=cache_dir, cache_size=cache_size, profile=profile, profile_file=profile_file,
+                         logger_name=logger_name, logging_level=logging_level)
+        self.engine = engine
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        parser.add_argument("-e", "--engine", choices=POINT_ENGINES, help="The engine to use; '" + ENGINE_LUT + "' encodes the 8-neighbourhood of each pixel as a byte via a single convolution and classifies it via a lookup table built from the plantcv templates, i.e., a single pass with identical results.", default=ENGINE_PCV, required=False)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.engine = ns.engine
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if self.engine is None:
+            self.engine = ENGINE_PCV
+        if self.engine not in POINT_ENGINES:
+            raise Exception("Unsupported engine: %s" % self.engine)
+
+    @abc.abstractmethod
+    def _find_points(self, array: np.ndarray) -> np.ndarray:
+        """
+        Locates the points in the skeletonized image.
+
+        :param array: the skeletonized image to analyze
+        :type array: np.ndarray
+        :return: the image with just the points, rest 0
+        :rtype: np.ndarray
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def _point_type(self) -> str:
+        """
+        Returns the type of point that gets stored in the meta-data of the annotations.
+
+        :return: the type
+        :rtype: str
+        """
+        raise NotImplementedError()
+
+    def _short_circuit(self, array: np.ndarray) -> Optional[Tuple[LocatedObjects, Optional[Dict]]]:
+        """
+        Determines the result without analyzing the image if possible, e.g., for empty images.
+        Empty skeletons have no points.
+
+        :param array: the binary image to analyze (0/1)
+        :type array: np.ndarray
+        :return: the tuple of generated annotations and meta-data to add (None if nothing to add), None if the image needs to be analyzed
+        :rtype: tuple
+        """
+        if constant_value(array) == 0:
+            return self._empty_annotations(), None
+        return None
+
+    def _analyze(self, array: np.ndarray) -> Tuple[LocatedObjects, Optional[Dict]]:
+        """
+        Analyzes the binary image.
+
+        :param array: the binary image to analyze (0/1)
+        :type array: np.ndarray
+        :return: the tuple of generated annotations and meta-data to add (None if nothing to add)
+        :rtype: tuple
+        """
+        array_new = self._find_points(array)
+        return self._points_to_annotations(array_new, self._point_type()), None
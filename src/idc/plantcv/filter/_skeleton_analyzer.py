@@ -0,0 +1,485 @@
+import abc
+import argparse
+import copy
+from typing import List, Tuple, Optional, Dict
+
+import numpy as np
+from kasperl.api import make_list, flatten_list, safe_deepcopy
+from idc.api import ImageClassificationData, ObjectDetectionData, ImageSegmentationData, REQUIRED_FORMAT_BINARY, ensure_binary
+from idc.plantcv.api import WorkerPool, add_num_workers_param, Prefetcher, add_prefetch_param, share_image, ResultCache, add_cache_params, cache_parameters, cache_key
+from idc.plantcv.api import load_plantcv, STAGE_FORMAT, STAGE_PCV, STAGE_RECORD, add_profile_params, stage_timer, timed
+from idc.plantcv.api import attach_array_view, cached_array, points_to_pointset, points_to_locatedobjects, PointSet, ShortCircuits
+from idc.plantcv.api import add_memory_budget_param, split_by_pixels, BatchMemory
+from seppl.io import StreamFilter
+from wai.common.adams.imaging.locateobjects import LocatedObjects
+from wai.logging import LOGGING_WARNING
+
+
+class SkeletonAnalyzer(StreamFilter, abc.ABC):
+    """
+    Ancestor for filters that analyze binary images (e.g., skeletons) and forward the results as object detection annotations.
+    Can decode and convert the records of a batch in a background thread ahead of the record being analyzed.
+    Can split incoming batches into sub-batches within a memory budget, forwarding each sub-batch as soon as it is done.
+    """
+
+    def __init__(self, cluster: bool = None, compact: bool = None, no_copy: bool = None,
+                 num_workers: int = None, prefetch: int = None, memory_budget: float = None,
+                 cache_dir: str = None, cache_size: int = None, profile: bool = None, profile_file: str = None,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the filter.
+
+        :param cluster: whether to merge connected point pixels into a single annotation
+        :type cluster: bool
+        :param compact: whether to generate a compact, columnar set of points rather than individual annotation objects
+        :type compact: bool
+        :param no_copy: whether to share the image with the input record rather than copying it
+        :type no_copy: bool
+        :param num_workers: the number of worker processes to use
+        :type num_workers: int
+        :param prefetch: the number of records of a batch to decode and convert ahead in a background thread, 0 to disable
+        :type prefetch: int
+        :param memory_budget: the maximum number of megapixels to process at a time, None for processing whole batches
+        :type memory_budget: float
+        :param cache_dir: the directory for caching the results, None for no caching
+        :type cache_dir: str
+        :param cache_size: the maximum size of the cache in MB
+        :type cache_size: int
+        :param profile: whether to record the time spent in the processing stages
+        :type profile: bool
+        :param profile_file: the file to write the profiling totals to (JSON or Prometheus text), None for not writing them
+        :type profile_file: str
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(logger_name=logger_name, logging_level=logging_level)
+        self.cluster = cluster
+        self.compact = compact
+        self.no_copy = no_copy
+        self.num_workers = num_workers
+        self.prefetch = prefetch
+        self.memory_budget = memory_budget
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.profile = profile
+        self.profile_file = profile_file
+        self._worker_pool = None
+        self._cache = None
+        self._timer = None
+        self._short_circuits = None
+        self._memory = None
+        self._pending = None
+
+    def accepts(self) -> List:
+        """
+        Returns the list of classes that are accepted.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        return [ImageClassificationData, ObjectDetectionData, ImageSegmentationData]
+
+    def generates(self) -> List:
+        """
+        Returns the list of classes that get produced.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        return [ObjectDetectionData]
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        parser.add_argument("-c", "--cluster", action="store_true", help="Whether to merge connected point pixels into a single annotation (bounding box), with centroid and number of pixels stored in the meta-data.")
+        parser.add_argument("-k", "--compact", action="store_true", help="Whether to store the points in a compact, columnar set (coordinates in arrays, type stored once) that only gets turned into individual annotation objects when required, e.g., by a writer.")
+        parser.add_argument("-n", "--no_copy", action="store_true", help="Whether to share the (unchanged) image and its bytes with the input record instead of copying them; the image only gets copied when it is modified (copy-on-write).")
+        add_num_workers_param(parser)
+        add_prefetch_param(parser)
+        add_memory_budget_param(parser)
+        add_cache_params(parser)
+        add_profile_params(parser)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.cluster = ns.cluster
+        self.compact = ns.compact
+        self.no_copy = ns.no_copy
+        self.num_workers = ns.num_workers
+        self.prefetch = ns.prefetch
+        self.memory_budget = ns.memory_budget
+        self.cache_dir = ns.cache_dir
+        self.cache_size = ns.cache_size
+        self.profile = ns.profile
+        self.profile_file = ns.profile_file
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if self.cluster is None:
+            self.cluster = False
+        if self.compact is None:
+            self.compact = False
+        if self.no_copy is None:
+            self.no_copy = False
+        if self.num_workers is None:
+            self.num_workers = 1
+        if self.num_workers < 1:
+            raise Exception("# workers must be at least 1, current: %s" % str(self.num_workers))
+        if self.prefetch is None:
+            self.prefetch = 0
+        if self.prefetch < 0:
+            raise Exception("Prefetch must be at least 0, current: %s" % str(self.prefetch))
+        if (self.memory_budget is not None) and (self.memory_budget <= 0):
+            raise Exception("Memory budget must be greater than 0, current: %s" % str(self.memory_budget))
+        if self.cache_size is None:
+            self.cache_size = 1024
+        if self.cache_size < 1:
+            raise Exception("Cache size must be at least 1MB, current: %s" % str(self.cache_size))
+        self._worker_pool = None
+        self._cache = None
+        if self.cache_dir is not None:
+            self._cache = ResultCache(self.cache_dir, self.cache_size, self.logger())
+        if self.profile is None:
+            self.profile = False
+        self._timer = stage_timer(self)
+        self._short_circuits = ShortCircuits(self.logger())
+        self._memory = BatchMemory(self.logger())
+        self._pending = None
+        load_plantcv()
+
+    def _requires_list_input(self) -> bool:
+        """
+        Returns whether lists are expected as input for the _process method.
+
+        :return: True if list inputs are expected by the filter
+        :rtype: bool
+        """
+        return ((self.num_workers is not None) and (self.num_workers > 1)) \
+               or ((self.prefetch is not None) and (self.prefetch > 0)) \
+               or (self.memory_budget is not None)
+
+    def _points_to_annotations(self, points: np.ndarray, point_type: str) -> LocatedObjects:
+        """
+        Turns the points image into annotations, compact ones if requested.
+
+        :param points: the image with the points, rest 0
+        :type points: np.ndarray
+        :param point_type: the type of point to store in the meta-data
+        :type point_type: str
+        :return: the annotations
+        :rtype: LocatedObjects
+        """
+        if self.compact:
+            return points_to_pointset(points, point_type, cluster=self.cluster)
+        return points_to_locatedobjects(points, point_type, cluster=self.cluster)
+
+    def _empty_annotations(self) -> LocatedObjects:
+        """
+        Returns empty annotations, compact ones if requested.
+
+        :return: the annotations
+        :rtype: LocatedObjects
+        """
+        if self.compact:
+            return PointSet()
+        return LocatedObjects()
+
+    def _short_circuit(self, array: np.ndarray) -> Optional[Tuple[LocatedObjects, Optional[Dict]]]:
+        """
+        Determines the result without analyzing the image if possible, e.g., for empty images.
+        The check must be cheap compared to the analysis.
+
+        :param array: the binary image to analyze (0/1)
+        :type array: np.ndarray
+        :return: the tuple of generated annotations and meta-data to add (None if nothing to add), None if the image needs to be analyzed
+        :rtype: tuple
+        """
+        return None
+
+    @abc.abstractmethod
+    def _analyze(self, array: np.ndarray) -> Tuple[LocatedObjects, Optional[Dict]]:
+        """
+        Analyzes the binary image.
+
+        :param array: the binary image to analyze (0/1)
+        :type array: np.ndarray
+        :return: the tuple of generated annotations and meta-data to add (None if nothing to add)
+        :rtype: tuple
+        """
+        raise NotImplementedError()
+
+    def _analyze_cached(self, array: np.ndarray) -> Tuple[LocatedObjects, Optional[Dict]]:
+        """
+        Analyzes the binary image, short-circuiting if possible and using the cache if available.
+
+        :param array: the binary image to analyze (0/1)
+        :type array: np.ndarray
+        :return: the tuple of generated annotations and meta-data to add (None if nothing to add)
+        :rtype: tuple
+        """
+        result = self._short_circuit(array)
+        self._short_circuits.add(result is not None)
+        if result is not None:
+            return result
+        if self._cache is None:
+            return self._analyze(array)
+        key = cache_key(array, self.name(), cache_parameters(self), "image")
+        result = self._cache.get(key)
+        if result is None:
+            result = self._analyze(array)
+            self._cache.put(key, result)
+        return result
+
+    def _prefetch_record(self, item) -> np.ndarray:
+        """
+        Determines the binary array of the record to analyze, executed in the background thread when prefetching.
+
+        :param item: the record to get the array for
+        :return: the array (0/1)
+        :rtype: np.ndarray
+        """
+        with timed(self._timer, STAGE_FORMAT):
+            array = cached_array(item, REQUIRED_FORMAT_BINARY)
+            if array is None:
+                image = ensure_binary(item.image, logger=self.logger())
+                array = np.asarray(image).astype(np.uint8)
+            return array
+
+    def _process_record(self, item, array: np.ndarray = None):
+        """
+        Processes a single record.
+
+        :param item: the record to process
+        :param array: the already determined binary array of the record's image, None to determine it
+        :type array: np.ndarray
+        :return: the generated record
+        """
+        if array is None:
+            array = self._prefetch_record(item)
+        with timed(self._timer, STAGE_PCV):
+            lobjs, meta = self._analyze_cached(array)
+        with timed(self._timer, STAGE_RECORD):
+            if self.no_copy:
+                # bytes are immutable, the image gets copied by pillow once modified
+                data = item.data
+                image = share_image(item.image)
+                metadata = copy.copy(item.get_metadata())
+            else:
+                data = safe_deepcopy(item.data)
+                image = safe_deepcopy(item.image)
+                metadata = safe_deepcopy(item.get_metadata())
+            if meta is not None:
+                if metadata is None:
+                    metadata = dict()
+                metadata.update(meta)
+            result = ObjectDetectionData(image_name=item.image_name,
+                                         data=data, image=image, image_format=item.image_format,
+                                         metadata=metadata,
+                                         annotation=lobjs)
+            attach_array_view(result)
+        if self._timer is not None:
+            self._timer.add_pixels(array.size)
+            self._timer.add_record()
+        return result
+
+    def _pop_worker_counters(self) -> Dict[str, Dict]:
+        """
+        Returns the counters accumulated in a worker process (cache, timing, short-circuits) and resets them.
+
+        :return: the counters
+        :rtype: dict
+        """
+        result = dict()
+        result["short_circuits"] = self._short_circuits.pop_counters()
+        if self._cache is not None:
+            result["cache"] = self._cache.pop_counters()
+        if self._timer is not None:
+            result["timing"] = self._timer.pop_counters()
+        return result
+
+    def _add_worker_counters(self, counters: Dict[str, Dict]):
+        """
+        Adds the counters returned by a worker process.
+
+        :param counters: the counters to add
+        :type counters: dict
+        """
+        if (self._cache is not None) and ("cache" in counters):
+            self._cache.add_counters(counters["cache"])
+        if (self._timer is not None) and ("timing" in counters):
+            self._timer.add_counters(counters["timing"])
+        if "short_circuits" in counters:
+            self._short_circuits.add_counters(counters["short_circuits"])
+
+    def _process_batch(self, items: List) -> List:
+        """
+        Processes the records of a (sub-)batch.
+
+        :param items: the records to process
+        :type items: list
+        :return: the generated records
+        :rtype: list
+        """
+        if (self.num_workers > 1) and (len(items) > 1):
+            if self._worker_pool is None:
+                self._worker_pool = WorkerPool(self, self.num_workers, self.logger())
+            return self._worker_pool.map(items)
+        elif (self.prefetch > 0) and (len(items) > 1):
+            return [self._process_record(item, array=array) for item, array in Prefetcher(items, self._prefetch_record, self.prefetch, name=self.name())]
+        else:
+            return [self._process_record(item) for item in items]
+
+    def _process_sub_batch(self, items: List) -> List:
+        """
+        Processes the records of a sub-batch within the memory budget.
+
+        :param items: the records to process
+        :type items: list
+        :return: the generated records
+        :rtype: list
+        """
+        result = self._process_batch(items)
+        self._memory.add(items, result)
+        return result
+
+    def _budget_pixels(self) -> int:
+        """
+        Returns the memory budget in pixels.
+
+        :return: the number of pixels
+        :rtype: int
+        """
+        return int(self.memory_budget * 1e6)
+
+    def _do_process(self, data):
+        """
+        Processes the data record(s).
+
+        :param data: the record(s) to process
+        :return: the potentially updated record(s)
+        """
+        items = make_list(data)
+        if self._timer is not None:
+            self._timer.start()
+        if self.memory_budget is None:
+            result = self._process_batch(items)
+        else:
+            result = []
+            self._memory.start(len(items))
+            for batch in split_by_pixels(items, self._budget_pixels()):
+                result.extend(self._process_sub_batch(batch))
+            self._memory.finish()
+
+        return flatten_list(result)
+
+    def process_stream(self, data):
+        """
+        Filters the data. Discards any sub-batches of the previous data that did not get collected.
+
+        :param data: the data to filter
+        """
+        if self._pending is not None:
+            self._pending = None
+            self._memory.finish()
+        super().process_stream(data)
+
+    def _do_process_stream(self, data):
+        """
+        Filters the data. With a memory budget, only splits the records into sub-batches, which get processed
+        one at a time when collecting the output.
+
+        :param data: the data to filter
+        """
+        if self.memory_budget is None:
+            result = self.process(data)
+            if result is not None:
+                self._stream_output.append(result)
+            return
+        items = make_list(data)
+        if self._timer is not None:
+            self._timer.start()
+        self._memory.start(len(items))
+        self._pending = list(split_by_pixels(items, self._budget_pixels()))
+        if len(self._pending) == 0:
+            self._pending = None
+            self._memory.finish()
+
+    def has_output(self) -> bool:
+        """
+        Whether any output is available.
+
+        :return: True if output can be collected
+        :rtype: bool
+        """
+        return super().has_output() or (self._pending is not None)
+
+    def output(self):
+        """
+        Returns the next available output, processes the next sub-batch if necessary.
+
+        :return: the output, None if nothing to return
+        """
+        if (not super().has_output()) and (self._pending is not None):
+            result = self._process_sub_batch(self._pending.pop(0))
+            if len(self._pending) == 0:
+                self._pending = None
+                self._memory.finish()
+            self._stream_output.append(flatten_list(result))
+        return super().output()
+
+    def finalize(self):
+        """
+        Finishes the processing, e.g., for closing files or databases.
+        """
+        super().finalize()
+        if self._worker_pool is not None:
+            self._worker_pool.close()
+            self._worker_pool = None
+        if self._cache is not None:
+            self._cache.log_counters()
+            self._cache = None
+        if self._short_circuits is not None:
+            self._short_circuits.log_counters()
+            self._short_circuits = None
+        if self._memory is not None:
+            if self.memory_budget is not None:
+                self._memory.log_peak()
+            self._memory = None
+        self._pending = None
+        if self._timer is not None:
+            self._timer.log_totals()
+            if self.profile_file is not None:
+                self._timer.write(self.profile_file)
+            self._timer = None
+
+    def __getstate__(self):
+        """
+        Returns the state to pickle, omits session, logger, worker pool and pending output.
+
+        :return: the state
+        :rtype: dict
+        """
+        result = self.__dict__.copy()
+        result["_session"] = None
+        result["_logger"] = None
+        result["_worker_pool"] = None
+        result["_stream_output"] = []
+        result["_pending"] = None
+        return result
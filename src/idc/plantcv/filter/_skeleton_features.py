@@ -0,0 +1,167 @@
+import argparse
+from typing import Tuple, Optional, Dict
+
+import numpy as np
+from wai.common.adams.imaging.locateobjects import LocatedObjects
+from wai.logging import LOGGING_WARNING
+
+from idc.api import binary_required_info
+from idc.plantcv.api import classify_skeleton, count_segments, constant_value
+from idc.plantcv.api import ENGINE_PCV, ENGINE_GRAPH, PRUNE_ENGINES
+from idc.plantcv.api import KEY_NUM_TIPS, KEY_NUM_BRANCH_POINTS, KEY_NUM_SEGMENTS, KEY_SKELETON_LENGTH
+from ._skeleton_analyzer import SkeletonAnalyzer
+from ._skeletonize import Skeletonize
+
+
+class SkeletonFeatures(SkeletonAnalyzer):
+    """
+    Skeletonizes a binary image once and determines tips, branch points, number of segments and skeleton length from it.
+    """
+
+    def __init__(self, prune: bool = None, size: int = None, engine: str = None, cluster: bool = None, compact: bool = None, no_copy: bool = None,
+                 num_workers: int = None, prefetch: int = None, memory_budget: float = None,
+                 cache_dir: str = None, cache_size: int = None, profile: bool = None, profile_file: str = None,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the filter.
+
+        :param prune: whether to prune the skeleton
+        :type prune: bool
+        :param size: the size to get pruned off each branch
+        :type size: int
+        :param engine: the engine to use for pruning (pcv/graph)
+        :type engine: str
+        :param cluster: whether to merge connected point pixels into a single annotation
+        :type cluster: bool
+        :param compact: whether to generate a compact, columnar set of points rather than individual annotation objects
+        :type compact: bool
+        :param no_copy: whether to share the image with the input record rather than copying it
+        :type no_copy: bool
+        :param num_workers: the number of worker processes to use
+        :type num_workers: int
+        :param prefetch: the number of records of a batch to decode and convert ahead in a background thread, 0 to disable
+        :type prefetch: int
+        :param memory_budget: the maximum number of megapixels to process at a time, None for processing whole batches
+        :type memory_budget: float
+        :param cache_dir: the directory for caching the results, None for no caching
+        :type cache_dir: str
+        :param cache_size: the maximum size of the cache in MB
+        :type cache_size: int
+        :param profile: whether to record the time spent in the processing stages
+        :type profile: bool
+        :param profile_file: the file to write the profiling totals to (JSON or Prometheus text), None for not writing them
+        :type profile_file: str
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(cluster=cluster, compact=compact, no_copy=no_copy,
+                         num_workers=num_workers, prefetch=prefetch, memory_budget=memory_budget,
+                         cache_dir=cache_dir, cache_size=cache_size, profile=profile, profile_file=profile_file,
+                         logger_name=logger_name, logging_level=logging_level)
+        self.prune = prune
+        self.size = size
+        self.engine = engine
+        self._skeletonize = None
+
+    def name(self) -> str:
+        """
+        Returns the name of the handler, used as sub-command.
+
+        :return: the name
+        :rtype: str
+        """
+        return "pcv-skeleton-features"
+
+    def description(self) -> str:
+        """
+        Returns a description of the filter.
+
+        :return: the description
+        :rtype: str
+        """
+        return "Skeletonizes (and optionally prunes) a binary image once and forwards tips and branch points as object detection annotations " \
+               "(type: tip|branch). The number of tips, branch points and segments and the skeleton length (in pixels) " \
+               "get stored in the meta-data; the numbers of tips and branch points match the generated annotations, i.e., " \
+               "they count clusters when clustering. " + binary_required_info()
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        parser.add_argument("-p", "--prune", action="store_true", help="Whether to prune the skeleton.")
+        parser.add_argument("-s", "--size", type=int, help="The size to get pruned off each branch.", default=50, required=False)
+        parser.add_argument("-e", "--engine", choices=PRUNE_ENGINES, help="The engine to use for pruning; '" + ENGINE_GRAPH + "' builds the skeleton graph once and removes the short terminal branches without generating segment objects, identical to '" + ENGINE_PCV + "'.", default=ENGINE_PCV, required=False)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.prune = ns.prune
+        self.size = ns.size
+        self.engine = ns.engine
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        self._skeletonize = Skeletonize(prune=self.prune, size=self.size, engine=self.engine,
+                                        logger_name=self.logger_name, logging_level=self.logging_level)
+        self._skeletonize.initialize()
+        self.prune = self._skeletonize.prune
+        self.size = self._skeletonize.size
+        self.engine = self._skeletonize.engine
+
+    def _short_circuit(self, array: np.ndarray) -> Optional[Tuple[LocatedObjects, Optional[Dict]]]:
+        """
+        Determines the result without analyzing the image if possible, e.g., for empty images.
+        Empty images have an empty skeleton.
+
+        :param array: the binary image to analyze (0/1)
+        :type array: np.ndarray
+        :return: the tuple of generated annotations and meta-data to add (None if nothing to add), None if the image needs to be analyzed
+        :rtype: tuple
+        """
+        if constant_value(array) != 0:
+            return None
+        meta = {
+            KEY_NUM_TIPS: 0,
+            KEY_NUM_BRANCH_POINTS: 0,
+            KEY_NUM_SEGMENTS: 0,
+            KEY_SKELETON_LENGTH: 0,
+        }
+        return self._empty_annotations(), meta
+
+    def _analyze(self, array: np.ndarray) -> Tuple[LocatedObjects, Optional[Dict]]:
+        """
+        Analyzes the binary image.
+
+        :param array: the binary image to analyze (0/1)
+        :type array: np.ndarray
+        :return: the tuple of generated annotations and meta-data to add (None if nothing to add)
+        :rtype: tuple
+        """
+        skeleton = self._skeletonize._apply_filter("image", array)
+        tips, branch_points = classify_skeleton(skeleton)
+        lobjs = self._points_to_annotations(tips, "tip")
+        lobjs_branch = self._points_to_annotations(branch_points, "branch")
+        # counts agree with the generated annotations, i.e., clusters when clustering
+        meta = {
+            KEY_NUM_TIPS: len(lobjs),
+            KEY_NUM_BRANCH_POINTS: len(lobjs_branch),
+            KEY_NUM_SEGMENTS: count_segments(skeleton, branch_points),
+            KEY_SKELETON_LENGTH: int(np.count_nonzero(skeleton)),
+        }
+        lobjs.extend(lobjs_branch)
+        return lobjs, meta
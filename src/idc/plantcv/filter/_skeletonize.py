@@ -1,20 +1,26 @@
 import argparse
-from typing import List
+from functools import partial
+from typing import List, Optional
 
+import cv2
 import numpy as np
-from plantcv import plantcv as pcv
 from wai.logging import LOGGING_WARNING
 
 from idc.api import ImageClassificationData, ObjectDetectionData, ImageSegmentationData, binary_required_info, REQUIRED_FORMAT_BINARY
-from idc.filter import ImageAndAnnotationFilter
+from idc.plantcv.api import pcv, ENGINE_PCV, ENGINE_GRAPH, PRUNE_ENGINES, prune_skeleton, PCV_PARAMS_LOCK, constant_value, tiled_apply
+from ._tiled_plantcv_filter import TiledPlantCVFilter
 
 
-class Skeletonize(ImageAndAnnotationFilter):
+class Skeletonize(TiledPlantCVFilter):
     """
     Reduces binary objects to 1 pixel wide representations (skeleton).
     """
 
-    def __init__(self, apply_to: str = None, output_format: str = None, incorrect_format_action: str = None, prune: bool = None, size: int = None,
+    def __init__(self, apply_to: str = None, output_format: str = None, incorrect_format_action: str = None,
+                 prune: bool = None, size: int = None, engine: str = None, halo: int = None,
+                 tile_size: int = None, roi: str = None,
+                 num_workers: int = None, num_threads: int = None, prefetch: int = None,
+                 cache_dir: str = None, cache_size: int = None, profile: bool = None, profile_file: str = None,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the filter.
@@ -29,15 +35,43 @@ class Skeletonize(ImageAndAnnotationFilter):
         :type prune: bool
         :param size: the size to get pruned off each branch
         :type size: int
+        :param engine: the engine to use for pruning (pcv/graph)
+        :type engine: str
+        :param halo: the number of pixels around a tile to include when processing in tiles
+        :type halo: int
+        :param tile_size: the size of the tiles to process the images in, None for processing them as a whole
+        :type tile_size: int
+        :param roi: the region of the image to process (full/annotations)
+        :type roi: str
+        :param num_workers: the number of worker processes to use
+        :type num_workers: int
+        :param num_threads: the number of threads to use for processing the segmentation layers
+        :type num_threads: int
+        :param prefetch: the number of records of a batch to decode and convert ahead in a background thread, 0 to disable
+        :type prefetch: int
+        :param cache_dir: the directory for caching the results, None for no caching
+        :type cache_dir: str
+        :param cache_size: the maximum size of the cache in MB
+        :type cache_size: int
+        :param profile: whether to record the time spent in the processing stages
+        :type profile: bool
+        :param profile_file: the file to write the profiling totals to (JSON or Prometheus text), None for not writing them
+        :type profile_file: str
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
         :type logging_level: str
         """
         super().__init__(apply_to=apply_to, output_format=output_format, incorrect_format_action=incorrect_format_action,
+                         tile_size=tile_size, roi=roi,
+                         num_workers=num_workers, num_threads=num_threads, prefetch=prefetch,
+                         cache_dir=cache_dir, cache_size=cache_size, profile=profile, profile_file=profile_file,
                          logger_name=logger_name, logging_level=logging_level)
         self.prune = prune
         self.size = size
+        self.engine = engine
+        self.halo = halo
+        self._halo_warned = False
 
     def name(self) -> str:
         """
@@ -85,6 +119,8 @@ class Skeletonize(ImageAndAnnotationFilter):
         parser = super()._create_argparser()
         parser.add_argument("-p", "--prune", action="store_true", help="Whether to prune the skeleton.")
         parser.add_argument("-s", "--size", type=int, help="The size to get pruned off each branch.", default=50, required=False)
+        parser.add_argument("-e", "--engine", choices=PRUNE_ENGINES, help="The engine to use for pruning; '" + ENGINE_GRAPH + "' builds the skeleton graph once and removes the short terminal branches without generating segment objects, identical to '" + ENGINE_PCV + "'.", default=ENGINE_PCV, required=False)
+        parser.add_argument("-H", "--halo", type=int, help="The number of pixels around a tile to include when processing in tiles; the skeleton is identical to processing the whole image as long as the halo exceeds the width of the widest object.", default=64, required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -97,6 +133,8 @@ class Skeletonize(ImageAndAnnotationFilter):
         super()._apply_args(ns)
         self.prune = ns.prune
         self.size = ns.size
+        self.engine = ns.engine
+        self.halo = ns.halo
 
     def initialize(self):
         """
@@ -109,6 +147,17 @@ class Skeletonize(ImageAndAnnotationFilter):
             self.size = 1
         if self.size < 1:
             raise Exception("Pruning size must be at least 1, current: %s" % str(self.size))
+        if self.engine is None:
+            self.engine = ENGINE_PCV
+        if self.engine not in PRUNE_ENGINES:
+            raise Exception("Unsupported engine: %s" % self.engine)
+        if self.halo is None:
+            self.halo = 64
+        if self.halo < 0:
+            raise Exception("Halo must be at least 0, current: %s" % str(self.halo))
+        if self.prune and (self.tile_size is not None):
+            raise Exception("Pruning depends on the whole skeleton and cannot be performed in tiles!")
+        self._halo_warned = False
 
     def _required_format(self) -> str:
         """
@@ -119,9 +168,75 @@ class Skeletonize(ImageAndAnnotationFilter):
         """
         return REQUIRED_FORMAT_BINARY
 
-    def _apply_filter(self, source: str, array: np.ndarray) -> np.ndarray:
+    def _halo(self) -> int:
         """
-        Applies the filter to the image and returns the numpy array.
+        Returns the number of pixels around a tile that are required for processing it, i.e., the reach of the filter.
+
+        :return: the halo
+        :rtype: int
+        """
+        return self.halo
+
+    def _tiles_exact(self) -> bool:
+        """
+        Returns whether the halo always covers the reach of the filter, i.e., processing in tiles
+        results in the same image as processing the whole image. The skeleton of an object depends on
+        its whole width.
+
+        :return: True if identical
+        :rtype: bool
+        """
+        return False
+
+    def _short_circuit(self, array: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Determines the result without applying the filter if possible, e.g., for empty or full masks.
+        Empty masks have an empty skeleton.
+
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image, None if the filter needs to be applied
+        :rtype: np.ndarray
+        """
+        if constant_value(array) == 0:
+            return array
+        return None
+
+    def _apply_filter_window(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter to a tile (incl halo) and returns the numpy array. Warns (once) if an object is wider
+        than the halo, as the skeleton can differ from processing the whole image then.
+
+        :param source: whether image or layer
+        :type source: str
+        :param array: the tile the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered tile
+        :rtype: np.ndarray
+        """
+        if not self._halo_warned:
+            width = 2 * cv2.distanceTransform((array > 0).astype(np.uint8), cv2.DIST_L2, 3).max(initial=0)
+            if width > self.halo:
+                self._halo_warned = True
+                self.logger().warning("Objects of about %d pixels width exceed the halo of %d pixels, the skeleton can differ from processing the whole image; increase the halo via -H/--halo!" % (width, self.halo))
+        return self._apply_filter_untiled(source, array)
+
+    def _apply_filter_tiled(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter tile by tile and returns the numpy array.
+
+        :param source: whether image or layer
+        :type source: str
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        return tiled_apply(array, self.tile_size, self._halo(), partial(self._apply_filter_window, source))
+
+    def _apply_filter_untiled(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter to the whole image (or tile) and returns the numpy array.
 
         :param source: whether image or layer
         :type source: str
@@ -132,5 +247,10 @@ class Skeletonize(ImageAndAnnotationFilter):
         """
         array_new = pcv.morphology.skeletonize(array)
         if self.prune:
-            array_new, _, _ = pcv.morphology.prune(skel_img=array_new, size=self.size, mask=array)
+            if self.engine == ENGINE_GRAPH:
+                array_new = prune_skeleton(array_new, self.size)
+            else:
+                # prune temporarily disables debugging via the global plantcv parameters
+                with PCV_PARAMS_LOCK:
+                    array_new, _, _ = pcv.morphology.prune(skel_img=array_new, size=self.size, mask=array)
         return array_new
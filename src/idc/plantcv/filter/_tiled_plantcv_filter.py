@@ -0,0 +1,254 @@
+import abc
+import argparse
+from functools import partial
+
+import numpy as np
+from PIL import Image
+from wai.logging import LOGGING_WARNING
+
+from idc.api import ObjectDetectionData, REQUIRED_FORMAT_BINARY
+from idc.plantcv.api import add_tile_size_param, image_to_memmap, tiled_apply, ROI_FULL, ROI_ANNOTATIONS, ROI_MODES, add_roi_param, annotation_regions
+from ._plantcv_filter import PlantCVFilter
+
+
+class TiledPlantCVFilter(PlantCVFilter, abc.ABC):
+    """
+    Ancestor for plantcv filters that can process large images tile by tile, using memory-mapped buffers.
+    Can restrict the processing of object detection images to the annotated bounding boxes.
+    """
+
+    def __init__(self, apply_to: str = None, output_format: str = None, incorrect_format_action: str = None,
+                 tile_size: int = None, roi: str = None,
+                 num_workers: int = None, num_threads: int = None, prefetch: int = None,
+                 cache_dir: str = None, cache_size: int = None, profile: bool = None, profile_file: str = None,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the filter.
+
+        :param apply_to: where to apply the filter to
+        :type apply_to: str
+        :param output_format: the output format to use
+        :type output_format: str
+        :param incorrect_format_action: how to react to incorrect input format
+        :type incorrect_format_action: str
+        :param tile_size: the size of the tiles to process the images in, None for processing them as a whole
+        :type tile_size: int
+        :param roi: the region of the image to process (full/annotations)
+        :type roi: str
+        :param num_workers: the number of worker processes to use
+        :type num_workers: int
+        :param num_threads: the number of threads to use for processing the segmentation layers
+        :type num_threads: int
+        :param prefetch: the number of records of a batch to decode and convert ahead in a background thread, 0 to disable
+        :type prefetch: int
+        :param cache_dir: the directory for caching the results, None for no caching
+        :type cache_dir: str
+        :param cache_size: the maximum size of the cache in MB
+        :type cache_size: int
+        :param profile: whether to record the time spent in the processing stages
+        :type profile: bool
+        :param profile_file: the file to write the profiling totals to (JSON or Prometheus text), None for not writing them
+        :type profile_file: str
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(apply_to=apply_to, output_format=output_format, incorrect_format_action=incorrect_format_action,
+                         num_workers=num_workers, num_threads=num_threads, prefetch=prefetch,
+                         cache_dir=cache_dir, cache_size=cache_size, profile=profile, profile_file=profile_file,
+                         logger_name=logger_name, logging_level=logging_level)
+        self.tile_size = tile_size
+        self.roi = roi
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        add_tile_size_param(parser, exact=self._tiles_exact())
+        add_roi_param(parser)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.tile_size = ns.tile_size
+        self.roi = ns.roi
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if (self.tile_size is not None) and (self.tile_size < 1):
+            raise Exception("Tile size must be at least 1, current: %s" % str(self.tile_size))
+        if self.roi is None:
+            self.roi = ROI_FULL
+        if self.roi not in ROI_MODES:
+            raise Exception("Unsupported ROI: %s" % self.roi)
+
+    def _use_tiles(self, width: int, height: int) -> bool:
+        """
+        Checks whether an image of the specified dimensions gets processed in tiles.
+
+        :param width: the width of the image
+        :type width: int
+        :param height: the height of the image
+        :type height: int
+        :return: True if to process in tiles
+        :rtype: bool
+        """
+        return (self.tile_size is not None) and ((width > self.tile_size) or (height > self.tile_size))
+
+    def _image_to_array(self, image: Image.Image) -> np.ndarray:
+        """
+        Turns the image into the numpy array to apply the filter to.
+
+        :param image: the image to convert
+        :type image: Image.Image
+        :return: the array
+        :rtype: np.ndarray
+        """
+        if self._use_tiles(image.width, image.height):
+            return image_to_memmap(image, self.tile_size)
+        return super()._image_to_array(image)
+
+    def _halo(self) -> int:
+        """
+        Returns the number of pixels around a tile that are required for processing it, i.e., the reach of the filter.
+
+        :return: the halo
+        :rtype: int
+        """
+        raise NotImplementedError()
+
+    def _tiles_exact(self) -> bool:
+        """
+        Returns whether the halo always covers the reach of the filter, i.e., processing in tiles
+        results in the same image as processing the whole image.
+
+        :return: True if identical
+        :rtype: bool
+        """
+        return True
+
+    def _roi_margin(self) -> int:
+        """
+        Returns the number of pixels around the annotated bounding boxes that are required for processing them
+        when restricting the processing to the annotations, i.e., the reach of the filter.
+
+        :return: the margin
+        :rtype: int
+        """
+        return self._halo()
+
+    def _roi_full_frame(self) -> bool:
+        """
+        Returns whether the filter has to be applied to the whole image when restricting the processing
+        to the annotations, as its result depends on entire objects/holes rather than a neighbourhood of
+        limited reach. Only the pixels within the bounding boxes get updated with the result.
+
+        :return: True if to apply the filter to the whole image
+        :rtype: bool
+        """
+        return False
+
+    def _roi_base(self, array: np.ndarray) -> np.ndarray:
+        """
+        Returns the copy of the image that the processed regions get pasted into, using the value range
+        of the filter's output, i.e., binary images (0/1) get turned into masks (0/255).
+
+        :param array: the image the filter gets applied to
+        :type array: np.ndarray
+        :return: the copy
+        :rtype: np.ndarray
+        """
+        if self._required_format() == REQUIRED_FORMAT_BINARY:
+            return np.where(np.asarray(array) > 0, 255, 0).astype(np.uint8)
+        return np.array(array)
+
+    def _apply_filter_image(self, item, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter to the image of the record and returns the numpy array.
+        Only processes the regions of the annotated bounding boxes of object detection records if requested,
+        the remainder of the image stays unchanged. Filters that depend on entire objects get applied to
+        the whole image, but still only update the bounding boxes.
+
+        :param item: the record the image belongs to
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        if (self.roi != ROI_ANNOTATIONS) or not isinstance(item, ObjectDetectionData):
+            return super()._apply_filter_image(item, array)
+        result = self._roi_base(array)
+        if self._roi_full_frame():
+            regions = annotation_regions(item.annotation, array.shape, 0)
+            if len(regions) == 0:
+                return result
+            self.logger().debug("%s: updating %d region(s) of %s" % (item.image_name, len(regions), str(array.shape[:2])))
+            array_new = self._apply_filter_cached("image", array)
+            for _, boxes in regions:
+                for y, y_end, x, x_end in boxes:
+                    result[y:y_end, x:x_end] = array_new[y:y_end, x:x_end]
+            return result
+        regions = annotation_regions(item.annotation, array.shape, self._roi_margin())
+        self.logger().debug("%s: processing %d region(s) of %s" % (item.image_name, len(regions), str(array.shape[:2])))
+        windows = [np.ascontiguousarray(array[wy:wy_end, wx:wx_end]) for (wy, wy_end, wx, wx_end), _ in regions]
+        processed = self._apply_filter_all(["image"] * len(windows), windows)
+        for ((wy, _, wx, _), boxes), window_new in zip(regions, processed):
+            for y, y_end, x, x_end in boxes:
+                result[y:y_end, x:x_end] = window_new[y - wy:y_end - wy, x - wx:x_end - wx]
+        return result
+
+    @abc.abstractmethod
+    def _apply_filter_untiled(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter to the whole image (or tile) and returns the numpy array.
+
+        :param source: whether image or layer
+        :type source: str
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        raise NotImplementedError()
+
+    def _apply_filter_tiled(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter tile by tile and returns the numpy array.
+
+        :param source: whether image or layer
+        :type source: str
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        return tiled_apply(array, self.tile_size, self._halo(), partial(self._apply_filter_untiled, source))
+
+    def _apply_filter(self, source: str, array: np.ndarray) -> np.ndarray:
+        """
+        Applies the filter to the image and returns the numpy array.
+
+        :param source: whether image or layer
+        :type source: str
+        :param array: the image the filter to apply to
+        :type array: np.ndarray
+        :return: the filtered image
+        :rtype: np.ndarray
+        """
+        if self._use_tiles(array.shape[1], array.shape[0]):
+            return self._apply_filter_tiled(source, array)
+        return self._apply_filter_untiled(source, array)
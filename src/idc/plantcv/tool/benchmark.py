@@ -0,0 +1,451 @@
+import argparse
+import io
+import json
+import logging
+import platform
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+import traceback
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+from wai.logging import init_logging, set_logging_level, add_logging_level
+
+from idc.api import ImageClassificationData, ImageSegmentationData, ImageSegmentationAnnotations
+from idc.core import ENV_IDC_LOGLEVEL
+from idc.filter import ImageAndAnnotationFilter
+import idc.plantcv.filter as pcv_filters
+from idc.plantcv.api import synthetic_mask, synthetic_grayscale
+
+BENCHMARK = "idc-plantcv-benchmark"
+
+_logger = logging.getLogger(BENCHMARK)
+
+INPUT_BINARY = "binary"
+INPUT_GRAYSCALE = "grayscale"
+INPUT_BINARY_GRAYSCALE = "binary-grayscale"
+
+APPLY_TO_MODES = ["image", "annotations"]
+
+DEFAULT_SIZES = [0.25, 1.0, 4.0]
+DEFAULT_DENSITIES = [50.0, 500.0]
+DEFAULT_LAYERS = [0, 3]
+
+CASES = [
+    ("pcv-erode", "-k 3", [INPUT_GRAYSCALE, INPUT_BINARY_GRAYSCALE]),
+    ("pcv-erode", "-k 15", [INPUT_GRAYSCALE, INPUT_BINARY_GRAYSCALE]),
+    ("pcv-erode", "-k 3 -i 10", [INPUT_GRAYSCALE, INPUT_BINARY_GRAYSCALE]),
+    ("pcv-erode", "-k 15 -i 10 -e distance", [INPUT_BINARY_GRAYSCALE]),
+    ("pcv-erode", "-k 15 -e rle", [INPUT_BINARY_GRAYSCALE]),
+    ("pcv-dilate", "-k 3", [INPUT_GRAYSCALE, INPUT_BINARY_GRAYSCALE]),
+    ("pcv-dilate", "-k 15", [INPUT_GRAYSCALE, INPUT_BINARY_GRAYSCALE]),
+    ("pcv-dilate", "-k 3 -i 10", [INPUT_GRAYSCALE, INPUT_BINARY_GRAYSCALE]),
+    ("pcv-dilate", "-k 15 -i 10 -e distance", [INPUT_BINARY_GRAYSCALE]),
+    ("pcv-dilate", "-k 15 -e rle", [INPUT_BINARY_GRAYSCALE]),
+    ("pcv-fill", "-s 50", [INPUT_BINARY]),
+    ("pcv-fill", "-s 50 -e label", [INPUT_BINARY]),
+    ("pcv-fill", "-s 50 -e rle", [INPUT_BINARY]),
+    ("pcv-fill-holes", "", [INPUT_BINARY]),
+    ("pcv-fill-holes", "-e label", [INPUT_BINARY]),
+    ("pcv-fill-holes", "-e rle", [INPUT_BINARY]),
+    ("pcv-skeletonize", "", [INPUT_BINARY]),
+    ("pcv-skeletonize", "-p -s 20", [INPUT_BINARY]),
+    ("pcv-skeletonize", "-p -s 20 -e graph", [INPUT_BINARY]),
+    ("pcv-find-tips", "", [INPUT_BINARY]),
+    ("pcv-find-tips", "-k", [INPUT_BINARY]),
+    ("pcv-find-tips", "-e lut", [INPUT_BINARY]),
+    ("pcv-find-branch-points", "", [INPUT_BINARY]),
+    ("pcv-find-branch-points", "-k", [INPUT_BINARY]),
+    ("pcv-find-branch-points", "-e lut", [INPUT_BINARY]),
+    ("pcv-skeleton-features", "", [INPUT_BINARY]),
+    ("pcv-skeleton-features", "-p -s 20 -e graph", [INPUT_BINARY]),
+    ("pcv-morphology-chain", "-O fill-holes 'fill -s 50' 'dilate -k 5'", [INPUT_BINARY]),
+]
+""" the plugins and parameter regimes to time, with the input types to use. """
+
+STARTUP_PLUGIN = "startup"
+
+STARTUP_CASES = [
+    ("import", "import idc.plantcv.filter"),
+    ("registry", "from idc.registry import available_filters; available_filters()"),
+    ("help", "from idc.tool.convert import main\ntry:\n    main(['from-grayscale-dp', '-i', 'x', 'pcv-fill', '--help'])\nexcept SystemExit:\n    pass"),
+]
+""" the python code to time in a fresh interpreter for the startup times. """
+
+
+def _encode(array: np.ndarray, mode: str) -> bytes:
+    """
+    Encodes the array as PNG.
+
+    :param array: the array to encode
+    :type array: np.ndarray
+    :param mode: the pillow image mode to use
+    :type mode: str
+    :return: the PNG bytes
+    :rtype: bytes
+    """
+    buffer = io.BytesIO()
+    Image.fromarray(array).convert(mode).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def synthetic_data(megapixels: float, density: float, num_layers: int, input_type: str, seed: int) -> Tuple[bytes, Dict[str, np.ndarray]]:
+    """
+    Generates the encoded image and the segmentation layers.
+
+    :param megapixels: the size of the image in megapixels
+    :type megapixels: float
+    :param density: the number of objects per megapixel
+    :type density: float
+    :param num_layers: the number of segmentation layers to generate
+    :type num_layers: int
+    :param input_type: the type of image to generate (binary/grayscale/binary-grayscale)
+    :type input_type: str
+    :param seed: the seed for the random number generator
+    :type seed: int
+    :return: the tuple of PNG bytes and layers
+    :rtype: tuple
+    """
+    mask = synthetic_mask(megapixels, density, seed)
+    if input_type == INPUT_BINARY:
+        data = _encode(mask, "1")
+    elif input_type == INPUT_GRAYSCALE:
+        data = _encode(synthetic_grayscale(mask, seed), "L")
+    elif input_type == INPUT_BINARY_GRAYSCALE:
+        data = _encode(mask, "L")
+    else:
+        raise Exception("Unsupported input type: %s" % input_type)
+    layers = dict()
+    for i in range(num_layers):
+        layers["layer%d" % (i + 1)] = synthetic_mask(megapixels, density, seed + i + 1)
+    return data, layers
+
+
+def _plugins() -> Dict[str, type]:
+    """
+    Returns the filter classes of this library.
+
+    :return: the plugin name/class mapping
+    :rtype: dict
+    """
+    result = dict()
+    for name in pcv_filters.__dict__:
+        cls = pcv_filters.__dict__[name]
+        if isinstance(cls, type) and hasattr(cls, "name"):
+            try:
+                result[cls().name()] = cls
+            except Exception:
+                # abstract
+                pass
+    return result
+
+
+def _record(name: str, data: bytes, layers: Dict[str, np.ndarray]):
+    """
+    Creates a new record from the data, with layers turning it into a segmentation record.
+
+    :param name: the image name
+    :type name: str
+    :param data: the PNG bytes
+    :type data: bytes
+    :param layers: the segmentation layers
+    :type layers: dict
+    :return: the record
+    """
+    if len(layers) == 0:
+        return ImageClassificationData(image_name=name, data=data)
+    annotation = ImageSegmentationAnnotations(labels=list(layers.keys()), layers={k: layers[k].copy() for k in layers})
+    return ImageSegmentationData(image_name=name, data=data, annotation=annotation)
+
+
+def result_key(result: Dict) -> str:
+    """
+    Generates the key that identifies a benchmark result.
+
+    :param result: the result to generate the key for
+    :type result: dict
+    :return: the key
+    :rtype: str
+    """
+    return "%s|%s|%s|%s|%sMP|density=%s|layers=%d" % (result["plugin"], result["options"], result["input"], result["apply_to"],
+                                                     result["megapixels"], result["density"], result["layers"])
+
+
+def run_benchmarks(sizes: List[float], densities: List[float], num_layers: List[int], repeats: int,
+                   plugins: Optional[List[str]] = None, logger: logging.Logger = None) -> List[Dict]:
+    """
+    Times the plugins on synthetic data.
+
+    :param sizes: the image sizes in megapixels
+    :type sizes: list
+    :param densities: the object densities (objects per megapixel)
+    :type densities: list
+    :param num_layers: the number of segmentation layers
+    :type num_layers: list
+    :param repeats: how often to repeat each timing
+    :type repeats: int
+    :param plugins: the names of the plugins to time, None for all
+    :type plugins: list
+    :param logger: the optional logger for outputting progress
+    :type logger: logging.Logger
+    :return: the results
+    :rtype: list
+    """
+    classes = _plugins()
+    if plugins is not None:
+        for plugin in plugins:
+            if plugin not in classes:
+                raise Exception("Unknown plugin: %s" % plugin)
+    result = []
+    data_cache = dict()
+    for plugin, options, input_types in CASES:
+        if (plugins is not None) and (plugin not in plugins):
+            continue
+        cls = classes[plugin]
+        apply_to_modes = APPLY_TO_MODES if issubclass(cls, ImageAndAnnotationFilter) else [None]
+        for input_type in input_types:
+            for megapixels in sizes:
+                for density in densities:
+                    for layers in num_layers:
+                        for apply_to in apply_to_modes:
+                            if (apply_to == "annotations") and (layers == 0):
+                                continue
+                            data_key = (megapixels, density, layers, input_type)
+                            if data_key not in data_cache:
+                                data_cache.clear()
+                                data_cache[data_key] = synthetic_data(megapixels, density, layers, input_type, 42)
+                            data, layer_arrays = data_cache[data_key]
+                            args = shlex.split(options)
+                            if apply_to is not None:
+                                args += ["-a", apply_to]
+                            handler = cls()
+                            handler.parse_args(args)
+                            handler.initialize()
+                            times = []
+                            for _ in range(repeats):
+                                record = _record("benchmark.png", data, layer_arrays)
+                                start = time.perf_counter()
+                                handler.process(record)
+                                times.append(time.perf_counter() - start)
+                            handler.finalize()
+                            current = {
+                                "plugin": plugin,
+                                "options": options,
+                                "input": input_type,
+                                "apply_to": apply_to if apply_to is not None else "image",
+                                "megapixels": megapixels,
+                                "density": density,
+                                "layers": layers,
+                                "repeats": repeats,
+                                "min": min(times),
+                                "median": statistics.median(times),
+                                "mean": statistics.mean(times),
+                            }
+                            if logger is not None:
+                                logger.info("%s: %.4fs" % (result_key(current), current["median"]))
+                            result.append(current)
+    return result
+
+
+def run_startup(repeats: int, logger: logging.Logger = None) -> List[Dict]:
+    """
+    Times importing the plugins, discovering them via the registry and outputting the help of a pcv filter,
+    each in a fresh interpreter (class cache of the registry disabled). Also records whether plantcv got imported.
+
+    :param repeats: how often to repeat each timing
+    :type repeats: int
+    :param logger: the optional logger for outputting progress
+    :type logger: logging.Logger
+    :return: the results
+    :rtype: list
+    """
+    result = []
+    env = os.environ.copy()
+    env["IDC_CLASS_CACHE"] = "off"
+    for name, code in STARTUP_CASES:
+        code += "\nimport sys\nprint('plantcv.plantcv' in sys.modules)"
+        times = []
+        loaded = False
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout
+            times.append(time.perf_counter() - start)
+            loaded = output.strip().splitlines()[-1] == "True"
+        current = {
+            "plugin": STARTUP_PLUGIN,
+            "options": name,
+            "input": "-",
+            "apply_to": "-",
+            "megapixels": 0,
+            "density": 0,
+            "layers": 0,
+            "repeats": repeats,
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+            "plantcv_imported": loaded,
+        }
+        if logger is not None:
+            logger.info("%s: %.4fs (plantcv imported: %s)" % (result_key(current), current["median"], loaded))
+        result.append(current)
+    return result
+
+
+def environment() -> Dict[str, str]:
+    """
+    Returns information about the environment that the benchmarks were run in.
+
+    :return: the information
+    :rtype: dict
+    """
+    from importlib.metadata import version
+    result = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+    for lib in ["plantcv", "image_dataset_converter", "image_dataset_converter_plantcv", "scikit-image", "scipy"]:
+        try:
+            result[lib] = version(lib)
+        except Exception:
+            result[lib] = None
+    return result
+
+
+def compare_results(baseline: List[Dict], current: List[Dict], threshold: float, min_diff: float) -> List[Dict]:
+    """
+    Compares the median times of the current results against the baseline ones.
+
+    :param baseline: the baseline results
+    :type baseline: list
+    :param current: the current results
+    :type current: list
+    :param threshold: the relative slowdown (e.g., 0.2 for 20%) above which to flag a regression
+    :type threshold: float
+    :param min_diff: the minimum absolute slowdown in seconds for a regression, to ignore noise with short timings
+    :type min_diff: float
+    :return: the comparisons (keys: key, baseline, current, ratio, regression)
+    :rtype: list
+    """
+    lookup = dict([(result_key(x), x) for x in baseline])
+    result = []
+    for cur in current:
+        key = result_key(cur)
+        if key not in lookup:
+            continue
+        base = lookup[key]["median"]
+        ratio = cur["median"] / base if base > 0 else float("inf")
+        result.append({
+            "key": key,
+            "baseline": base,
+            "current": cur["median"],
+            "ratio": ratio,
+            "regression": (ratio > 1.0 + threshold) and (cur["median"] - base > min_diff),
+        })
+    return result
+
+
+def _floats(values: List[str]) -> List[float]:
+    """
+    Turns the strings into floats.
+
+    :param values: the strings to convert
+    :type values: list
+    :return: the floats
+    :rtype: list
+    """
+    return [float(x) for x in values]
+
+
+def main(args=None) -> int:
+    """
+    The main method for parsing command-line arguments.
+
+    :param args: the commandline arguments, uses sys.argv if not supplied
+    :type args: list
+    :return: the number of regressions
+    :rtype: int
+    """
+    init_logging(env_var=ENV_IDC_LOGLEVEL)
+    parser = argparse.ArgumentParser(
+        description="Times the pcv-* plugins on synthetic binary and grayscale images of various sizes, object densities "
+                    "and numbers of segmentation layers, applied to the image and to the annotations. "
+                    "Results can be saved as baseline and compared against a baseline, flagging regressions.",
+        prog=BENCHMARK,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-s", "--sizes", metavar="MP", type=str, help="The image sizes in megapixels, e.g., 0.25 1 4 16 100.", default=[str(x) for x in DEFAULT_SIZES], required=False, nargs="+")
+    parser.add_argument("-d", "--densities", metavar="NUM", type=str, help="The object densities, in objects per megapixel.", default=[str(x) for x in DEFAULT_DENSITIES], required=False, nargs="+")
+    parser.add_argument("-L", "--num_layers", metavar="NUM", type=int, help="The numbers of segmentation layers, 0 for image classification records.", default=DEFAULT_LAYERS, required=False, nargs="+")
+    parser.add_argument("-r", "--repeats", type=int, help="How often to repeat each timing (median gets compared).", default=3, required=False)
+    parser.add_argument("-p", "--plugins", metavar="PLUGIN", type=str, help="The plugins to time, all if not specified.", default=None, required=False, nargs="*")
+    parser.add_argument("-S", "--startup", action="store_true", help="Whether to time the startup as well, i.e., importing the plugins, discovering them via the registry and outputting the help of a filter. Use '-p' without plugins for only timing the startup.")
+    parser.add_argument("-i", "--input", metavar="FILE", type=str, help="The previously generated results to use instead of running the benchmarks.", default=None, required=False)
+    parser.add_argument("-o", "--output", metavar="FILE", type=str, help="The JSON file to store the results in, e.g., as baseline.", default=None, required=False)
+    parser.add_argument("-b", "--baseline", metavar="FILE", type=str, help="The baseline JSON file to compare the results against.", default=None, required=False)
+    parser.add_argument("-t", "--threshold", type=float, help="The relative slowdown of the median time that is considered a regression, e.g., 0.2 for 20%%.", default=0.2, required=False)
+    parser.add_argument("-m", "--min_diff", type=float, help="The minimum slowdown in seconds that is considered a regression.", default=0.01, required=False)
+    add_logging_level(parser)
+    parsed = parser.parse_args(args=args)
+    set_logging_level(_logger, parsed.logging_level)
+
+    if parsed.input is not None:
+        with open(parsed.input, "r") as fp:
+            results = json.load(fp)["results"]
+    else:
+        results = run_benchmarks(_floats(parsed.sizes), _floats(parsed.densities), parsed.num_layers, parsed.repeats,
+                                 plugins=parsed.plugins, logger=_logger)
+        if parsed.startup:
+            results += run_startup(parsed.repeats, logger=_logger)
+
+    if parsed.output is not None:
+        with open(parsed.output, "w") as fp:
+            json.dump({"environment": environment(), "results": results}, fp, indent=2)
+        _logger.info("Results written to: %s" % parsed.output)
+
+    num_regressions = 0
+    if parsed.baseline is not None:
+        with open(parsed.baseline, "r") as fp:
+            baseline = json.load(fp)["results"]
+        comparisons = compare_results(baseline, results, parsed.threshold, parsed.min_diff)
+        for comparison in comparisons:
+            if comparison["regression"]:
+                num_regressions += 1
+            print("%s %s: %.4fs -> %.4fs (x%.2f)" % ("REGRESSION" if comparison["regression"] else "ok        ", comparison["key"],
+                                                   comparison["baseline"], comparison["current"], comparison["ratio"]))
+        print("%d comparisons, %d regressions" % (len(comparisons), num_regressions))
+    elif parsed.output is None:
+        for result in results:
+            print("%s: %.4fs" % (result_key(result), result["median"]))
+
+    return num_regressions
+
+
+def sys_main() -> int:
+    """
+    Runs the main function using the system cli arguments, and
+    returns a system error code.
+
+    :return: 0 for success, 1 for failure or regressions.
+    """
+    try:
+        if main() > 0:
+            return 1
+        return 0
+    except Exception:
+        traceback.print_exc()
+        print("options: %s" % str(sys.argv[1:]), file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys_main()
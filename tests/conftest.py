@@ -0,0 +1,79 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from idc.api import ImageClassificationData, ImageSegmentationData, ImageSegmentationAnnotations
+from idc.plantcv.api import synthetic_mask
+
+
+def mask_to_record(array: np.ndarray, mode: str = "1", layers: dict = None, image_name: str = "mask.png"):
+    """
+    Turns the mask into a record with a PNG image.
+
+    :param array: the mask to convert (0/255)
+    :type array: np.ndarray
+    :param mode: the PIL image mode to use
+    :type mode: str
+    :param layers: the segmentation layers (label -> mask), generates an image classification record if None
+    :type layers: dict
+    :param image_name: the name of the image
+    :type image_name: str
+    :return: the record
+    """
+    buf = io.BytesIO()
+    Image.fromarray(array, "L").convert(mode).save(buf, format="PNG")
+    if layers is None:
+        return ImageClassificationData(image_name=image_name, data=buf.getvalue())
+    return ImageSegmentationData(image_name=image_name, data=buf.getvalue(),
+                                 annotation=ImageSegmentationAnnotations(labels=list(layers.keys()), layers=layers))
+
+
+def record_to_mask(item) -> np.ndarray:
+    """
+    Returns the image of the record as mask (0/255).
+
+    :param item: the record to get the image from
+    :return: the mask
+    :rtype: np.ndarray
+    """
+    return np.where(np.asarray(item.image) > 0, 255, 0).astype(np.uint8)
+
+
+def process(cls, array: np.ndarray, mode: str = "1", **kwargs) -> np.ndarray:
+    """
+    Runs the filter on a record generated from the mask and returns the resulting mask.
+
+    :param cls: the filter class to instantiate
+    :param array: the mask to process (0/255)
+    :type array: np.ndarray
+    :param mode: the PIL image mode to use for the record
+    :type mode: str
+    :param kwargs: the parameters for the filter
+    :return: the resulting mask (0/255)
+    :rtype: np.ndarray
+    """
+    f = cls(**kwargs)
+    f.initialize()
+    try:
+        return record_to_mask(f.process(mask_to_record(array, mode=mode)))
+    finally:
+        f.finalize()
+
+
+@pytest.fixture(scope="session")
+def mask() -> np.ndarray:
+    """
+    A synthetic mask (0/255) with blobs, holes, branching lines and speckles.
+    """
+    return synthetic_mask(0.25, 200, 0)
+
+
+@pytest.fixture(scope="session")
+def skeleton(mask) -> np.ndarray:
+    """
+    The skeleton of the synthetic mask (0/255).
+    """
+    from idc.plantcv.filter import Skeletonize
+    return process(Skeletonize, mask)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from idc.plantcv.api import KEY_APPROX_IOU, KEY_APPROX_ERROR, scaled_shape, scaled_kernel_size, scaled_size, downscale, upscale, binarize
+from idc.plantcv.filter import Erode, Dilate, Fill
+
+from conftest import mask_to_record, record_to_mask, process
+
+
+def test_scaling(mask):
+    assert scaled_kernel_size(5, 2, 2) == 5
+    assert scaled_kernel_size(3, 1, 2) == 2
+    assert scaled_kernel_size(3, 1, 4) == 1
+    assert scaled_size(200, 2) == 50
+    assert scaled_size(1, 4) == 1
+    small = downscale(mask, 2, True)
+    assert small.shape == scaled_shape(mask.shape, 2) == (216, 288)
+    restored = binarize(upscale(small, mask.shape, True), 255)
+    assert restored.shape == mask.shape
+    assert set(np.unique(restored)) <= {0, 255}
+
+
+@pytest.mark.parametrize("cls,mode,kwargs", [
+    (Erode, "L", dict(kernel_size=9, num_iterations=2)),
+    (Dilate, "L", dict(kernel_size=15)),
+    (Fill, "1", dict(size=400)),
+])
+def test_downscale(mask, cls, mode, kwargs):
+    exact = process(cls, mask, mode=mode, **kwargs)
+    np.testing.assert_array_equal(process(cls, mask, mode=mode, downscale=1, **kwargs), exact)
+    f = cls(downscale=2, validate=True, **kwargs)
+    f.initialize()
+    item = f.process(mask_to_record(mask, mode=mode))
+    f.finalize()
+    actual = record_to_mask(item)
+    meta = item.get_metadata()
+    union = np.count_nonzero((actual > 0) | (exact > 0))
+    assert meta[KEY_APPROX_IOU] == pytest.approx(np.count_nonzero((actual > 0) & (exact > 0)) / union)
+    assert meta[KEY_APPROX_IOU] > 0.7
+    assert KEY_APPROX_ERROR in meta
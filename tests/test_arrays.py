@@ -0,0 +1,39 @@
+import numpy as np
+
+from idc.api import REQUIRED_FORMAT_BINARY, REQUIRED_FORMAT_GRAYSCALE
+from idc.plantcv.api import get_array_view, cached_array, attach_array_view
+from idc.plantcv.filter import Dilate, Erode
+
+from conftest import mask_to_record, record_to_mask, process
+
+
+def test_array_view(mask):
+    f = Dilate(kernel_size=3)
+    f.initialize()
+    item = f.process(mask_to_record(mask, mode="L"))
+    f.finalize()
+    view = get_array_view(item)
+    assert view is not None
+    array = cached_array(item, REQUIRED_FORMAT_GRAYSCALE)
+    np.testing.assert_array_equal(array, np.asarray(item.image))
+    assert not array.flags.writeable
+    assert cached_array(item, REQUIRED_FORMAT_BINARY) is None
+    # a view does not apply to a record with different data
+    other = mask_to_record(mask, mode="L")
+    setattr(other, "_pcv_array_view", view)
+    assert get_array_view(other) is None
+    assert attach_array_view(other) is not None
+    assert get_array_view(other) is not None
+
+
+def test_consecutive_filters(mask):
+    dilate = Dilate(kernel_size=5)
+    erode = Erode(kernel_size=5)
+    for f in [dilate, erode]:
+        f.initialize()
+    actual = erode.process(dilate.process(mask_to_record(mask, mode="L")))
+    for f in [dilate, erode]:
+        f.finalize()
+    expected = process(Dilate, mask, mode="L", kernel_size=5)
+    expected = process(Erode, expected, mode="L", kernel_size=5)
+    np.testing.assert_array_equal(record_to_mask(actual), expected)
@@ -0,0 +1,49 @@
+import json
+
+import numpy as np
+import pytest
+
+from idc.plantcv.api import synthetic_mask, synthetic_grayscale
+from idc.plantcv.tool.benchmark import run_benchmarks, compare_results, result_key, main
+
+
+def test_synthetic_data():
+    mask = synthetic_mask(0.25, 200, 0)
+    assert mask.shape == (433, 577)
+    assert set(np.unique(mask)) == {0, 255}
+    np.testing.assert_array_equal(mask, synthetic_mask(0.25, 200, 0))
+    assert np.any(mask != synthetic_mask(0.25, 200, 1))
+    assert synthetic_grayscale(mask, 0).shape == mask.shape
+
+
+def test_run_benchmarks():
+    results = run_benchmarks([0.01], [50.0], [0, 1], 1, plugins=["pcv-fill"])
+    # 3 fill cases, image only without layers, image and annotations with one layer
+    assert len(results) == 9
+    assert len(set(result_key(x) for x in results)) == len(results)
+    assert all(x["median"] > 0 for x in results)
+    with pytest.raises(Exception):
+        run_benchmarks([0.01], [50.0], [0], 1, plugins=["pcv-unknown"])
+
+
+def test_compare_results():
+    baseline = run_benchmarks([0.01], [50.0], [0], 1, plugins=["pcv-fill-holes"])
+    current = [dict(x) for x in baseline]
+    current[0]["median"] = baseline[0]["median"] * 2 + 1.0
+    comparisons = compare_results(baseline, current, 0.2, 0.01)
+    assert len(comparisons) == len(baseline)
+    assert [x["regression"] for x in comparisons] == [True] + [False] * (len(baseline) - 1)
+    # small absolute differences are ignored
+    current[0]["median"] = baseline[0]["median"] * 2
+    assert not compare_results(baseline, current, 0.2, 1.0)[0]["regression"]
+
+
+def test_main(tmp_path):
+    output = str(tmp_path / "baseline.json")
+    assert main(["-s", "0.01", "-d", "50", "-L", "0", "-r", "1", "-p", "pcv-skeletonize", "-o", output]) == 0
+    with open(output, "r") as fp:
+        data = json.load(fp)
+    assert "environment" in data
+    assert len(data["results"]) == 3
+    # no regressions when comparing against itself
+    assert main(["-i", output, "-b", output]) == 0
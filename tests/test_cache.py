@@ -0,0 +1,77 @@
+import logging
+
+import numpy as np
+
+from idc.plantcv.api import ResultCache, cache_key, cache_parameters, load_plantcv, COUNTER_HITS, COUNTER_MISSES, COUNTER_EVICTIONS
+from idc.plantcv.filter import Dilate, MorphologyChain
+
+from conftest import mask_to_record, process
+
+
+def test_round_trip(tmp_path, mask):
+    load_plantcv()
+    cache = ResultCache(str(tmp_path), 1, logging.getLogger("test"))
+    key = cache_key(mask, "pcv-dilate", {"kernel_size": 3}, "image")
+    assert cache.get(key) is None
+    cache.put(key, mask)
+    np.testing.assert_array_equal(cache.get(key), mask)
+    counters = cache.pop_counters()
+    assert counters[COUNTER_HITS] == 1
+    assert counters[COUNTER_MISSES] == 1
+
+
+def test_key(mask):
+    load_plantcv()
+    key = cache_key(mask, "pcv-dilate", {"kernel_size": 3}, "image")
+    assert key == cache_key(mask.copy(), "pcv-dilate", {"kernel_size": 3}, "image")
+    assert key != cache_key(mask, "pcv-erode", {"kernel_size": 3}, "image")
+    assert key != cache_key(mask, "pcv-dilate", {"kernel_size": 5}, "image")
+    assert key != cache_key(255 - mask, "pcv-dilate", {"kernel_size": 3}, "image")
+    assert key != cache_key(mask, "pcv-dilate", {"kernel_size": 3}, "layer")
+
+
+def test_parameters():
+    f = Dilate(kernel_size=3, num_workers=2, tile_size=100, cache_dir="/tmp")
+    parameters = cache_parameters(f)
+    assert parameters["kernel_size"] == 3
+    for excluded in ["num_workers", "tile_size", "cache_dir"]:
+        assert excluded not in parameters
+
+
+def test_eviction(tmp_path):
+    load_plantcv()
+    cache = ResultCache(str(tmp_path), 1, logging.getLogger("test"))
+    for i in range(3):
+        array = np.full((512, 1024), i, dtype=np.uint8)
+        cache.put(cache_key(array, "test", {}, "image"), array)
+    assert cache.pop_counters()[COUNTER_EVICTIONS] > 0
+
+
+def test_filter(tmp_path, mask):
+    expected = process(Dilate, mask, mode="L", kernel_size=5)
+    # first run populates the cache, second one uses it
+    for _ in range(2):
+        actual = process(Dilate, mask, mode="L", kernel_size=5, cache_dir=str(tmp_path))
+        np.testing.assert_array_equal(actual, expected)
+    assert len(list(tmp_path.glob("*/*.pkl"))) == 1
+
+
+def test_chain_image_and_layer(tmp_path):
+    # image and layer with identical content (0/1), the chain only binarizes the image (threshold 1)
+    array = np.zeros((64, 64), dtype=np.uint8)
+    array[10:30, 10:30] = 1
+    array[40:44, 40:60] = 1
+    layers = {"a": array.copy()}
+    results = []
+    for _ in range(2):
+        f = MorphologyChain(apply_to="both", operations=["dilate -k 3", "fill -s 10"], cache_dir=str(tmp_path))
+        f.initialize()
+        results.append(f.process(mask_to_record(array, mode="L", layers=layers)))
+        f.finalize()
+    uncached = MorphologyChain(apply_to="both", operations=["dilate -k 3", "fill -s 10"])
+    uncached.initialize()
+    expected = uncached.process(mask_to_record(array, mode="L", layers=layers))
+    uncached.finalize()
+    for result in results:
+        np.testing.assert_array_equal(np.asarray(result.image), np.asarray(expected.image))
+        np.testing.assert_array_equal(result.annotation.layers["a"], expected.annotation.layers["a"])
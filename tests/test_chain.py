@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from idc.plantcv.api import ENGINE_LABEL
+from idc.plantcv.filter import MorphologyChain, Erode, Dilate, Fill, FillHoles
+
+from conftest import process
+
+
+def test_chain(mask):
+    expected = process(Fill, process(FillHoles, mask, engine=ENGINE_LABEL), size=200)
+    expected = process(Dilate, expected, mode="L", kernel_size=3, num_iterations=2)
+    actual = process(MorphologyChain, mask, operations=["fill-holes -e label", "fill -s 200", "dilate -k 3 -i 2"])
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_chain_rle(mask):
+    expected = process(Erode, process(Fill, mask, size=50), mode="L", kernel_size=3)
+    actual = process(MorphologyChain, mask, operations=["fill -s 50 -e rle", "erode -k 3 -e rle"])
+    np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize("operation", ["dilate -k 3 5", "erode -i 1 2", "fill -s 3 5"])
+def test_multiple_values(operation):
+    f = MorphologyChain(operations=[operation])
+    with pytest.raises(Exception, match="multiple values"):
+        f.initialize()
+
+
+@pytest.mark.parametrize("operation", ["dilate -t 100", "fill -r annotations", "erode -D 2", "fill-holes -w 2", "skeletonize -C /tmp/cache"])
+def test_unsupported_options(operation):
+    f = MorphologyChain(operations=[operation])
+    with pytest.raises(Exception, match="does not support option"):
+        f.initialize()
+
+
+def test_finalize():
+    f = MorphologyChain(operations=["fill -s 10", "dilate"])
+    f.initialize()
+    operations = list(f._operations)
+    f.finalize()
+    for op in operations:
+        # finalized operations release their counters/pools
+        assert op._short_circuits is None
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from idc.plantcv.api import ENGINE_PCV, ENGINE_LABEL, label_fill, label_fill_holes
+from idc.plantcv.filter import Fill, FillHoles
+
+from conftest import process
+
+
+@pytest.mark.parametrize("size", [1, 10, 200, 5000])
+def test_label_engine(mask, size):
+    expected = process(Fill, mask, size=size, engine=ENGINE_PCV)
+    actual = process(Fill, mask, size=size, engine=ENGINE_LABEL)
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_connectivity():
+    # a diagonal line of 3 pixels is a single object with 8-connectivity only
+    array = np.zeros((5, 5), dtype=np.uint8)
+    array[1, 1] = array[2, 2] = array[3, 3] = 255
+    assert not np.any(label_fill(array, 2, connectivity=4))
+    np.testing.assert_array_equal(label_fill(array, 2, connectivity=8), array)
+    f = Fill(size=2, connectivity=8, engine=ENGINE_PCV)
+    with pytest.raises(Exception):
+        f.initialize()
+
+
+def test_fill_holes_label_engine(mask):
+    expected = process(FillHoles, mask, engine=ENGINE_PCV)
+    actual = process(FillHoles, mask, engine=ENGINE_LABEL)
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_max_hole_size():
+    # holes of 1 and 9 pixels, background touching the border never gets filled
+    array = np.full((12, 12), 255, dtype=np.uint8)
+    array[2, 2] = 0
+    array[6:9, 6:9] = 0
+    array[0, 5] = 0
+    expected = array.copy()
+    expected[2, 2] = 255
+    np.testing.assert_array_equal(label_fill_holes(array, max_hole_size=5), expected)
+    expected[6:9, 6:9] = 255
+    np.testing.assert_array_equal(label_fill_holes(array), expected)
+    f = FillHoles(max_hole_size=5, engine=ENGINE_PCV)
+    with pytest.raises(Exception):
+        f.initialize()
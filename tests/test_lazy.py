@@ -0,0 +1,27 @@
+import subprocess
+import sys
+
+from idc.plantcv.api import LazyModule
+
+CODE = """
+import sys
+from idc.plantcv.filter import Dilate, FindTips, MorphologyChain
+for cls in [Dilate, FindTips, MorphologyChain]:
+    cls().format_help()
+print('plantcv.plantcv' in sys.modules)
+f = Dilate()
+f.initialize()
+print('plantcv.plantcv' in sys.modules)
+"""
+
+
+def test_plugins_without_plantcv():
+    output = subprocess.run([sys.executable, "-c", CODE], capture_output=True, text=True, check=True).stdout
+    assert output.strip().splitlines()[-2:] == ["False", "True"]
+
+
+def test_lazy_module():
+    module = LazyModule("json")
+    assert module._module is None
+    assert module.dumps([1]) == "[1]"
+    assert module.is_loaded()
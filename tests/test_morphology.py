@@ -0,0 +1,32 @@
+import cv2
+import numpy as np
+import pytest
+
+from idc.plantcv.api import ENGINE_PCV, ENGINE_DISTANCE, SHAPE_DISC, SHAPE_CROSS, structuring_element, distance_morphology
+from idc.plantcv.filter import Erode, Dilate
+
+from conftest import process
+
+
+@pytest.mark.parametrize("cls", [Erode, Dilate])
+@pytest.mark.parametrize("kernel_size,num_iterations", [(2, 1), (3, 1), (3, 3), (4, 2), (7, 1)])
+def test_distance_engine(mask, cls, kernel_size, num_iterations):
+    expected = process(cls, mask, mode="L", kernel_size=kernel_size, num_iterations=num_iterations, engine=ENGINE_PCV)
+    actual = process(cls, mask, mode="L", kernel_size=kernel_size, num_iterations=num_iterations, engine=ENGINE_DISTANCE)
+    np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize("erode", [False, True])
+@pytest.mark.parametrize("shape", [SHAPE_DISC, SHAPE_CROSS])
+@pytest.mark.parametrize("kernel_size,num_iterations", [(3, 1), (5, 2), (9, 1)])
+def test_distance_shapes(mask, erode, shape, kernel_size, num_iterations):
+    kernel, anchor = structuring_element(kernel_size, num_iterations, shape)
+    expected = cv2.erode(mask, kernel, anchor=anchor) if erode else cv2.dilate(mask, kernel, anchor=anchor)
+    actual = distance_morphology(mask, kernel_size, num_iterations, shape, erode)
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_shape_requires_distance_engine():
+    f = Dilate(shape=SHAPE_DISC, engine=ENGINE_PCV)
+    with pytest.raises(Exception):
+        f.initialize()
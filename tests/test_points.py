@@ -0,0 +1,130 @@
+import copy
+import pickle
+
+import numpy as np
+import pytest
+
+from idc.plantcv.api import pcv, load_plantcv, ENGINE_PCV, ENGINE_LUT, classify_skeleton, KEY_TYPE, KEY_NUM_PIXELS, KEY_CENTROID_X, PointSet, points_to_pointset, points_to_locatedobjects, share_image
+from idc.plantcv.filter import FindTips, FindBranchPoints
+
+from conftest import mask_to_record
+
+
+def points_image() -> np.ndarray:
+    """
+    Generates a small image with a single point and a cluster of three points.
+
+    :return: the image (0/255)
+    :rtype: np.ndarray
+    """
+    result = np.zeros((10, 10), dtype=np.uint8)
+    result[2, 1] = 255
+    result[5, 5] = 255
+    result[5, 6] = 255
+    result[6, 6] = 255
+    return result
+
+
+def test_points_to_locatedobjects():
+    lobjs = points_to_locatedobjects(points_image(), "tip")
+    assert [(o.x, o.y, o.width, o.height) for o in lobjs] == [(1, 2, 1, 1), (5, 5, 1, 1), (6, 5, 1, 1), (6, 6, 1, 1)]
+    assert all(o.metadata[KEY_TYPE] == "tip" for o in lobjs)
+
+
+def test_points_to_locatedobjects_cluster():
+    lobjs = points_to_locatedobjects(points_image(), "branch", cluster=True)
+    assert [(o.x, o.y, o.width, o.height) for o in lobjs] == [(1, 2, 1, 1), (5, 5, 2, 2)]
+    assert [o.metadata[KEY_NUM_PIXELS] for o in lobjs] == [1, 3]
+    assert lobjs[1].metadata[KEY_CENTROID_X] == pytest.approx(17 / 3)
+
+
+@pytest.mark.parametrize("cls,func", [(FindTips, "find_tips"), (FindBranchPoints, "find_branch_pts")])
+def test_find_points(skeleton, cls, func):
+    load_plantcv()
+    ys, xs = np.nonzero(getattr(pcv.morphology, func)(skeleton))
+    f = cls()
+    f.initialize()
+    item = f.process(mask_to_record(skeleton))
+    f.finalize()
+    assert len(xs) > 0
+    assert sorted((o.x, o.y) for o in item.annotation) == sorted(zip(xs.tolist(), ys.tolist()))
+
+
+def test_share_image(mask):
+    record = mask_to_record(mask, mode="L")
+    shared = share_image(record.image)
+    np.testing.assert_array_equal(np.asarray(shared), mask)
+    # modifying either image does not affect the other one
+    shared.putpixel((0, 0), 128)
+    assert record.image.getpixel((0, 0)) == mask[0, 0]
+    record.image.putpixel((1, 0), 64)
+    assert shared.getpixel((1, 0)) == mask[0, 1]
+
+
+def test_no_copy(skeleton):
+    item = mask_to_record(skeleton)
+    results = dict()
+    for no_copy in [False, True]:
+        f = FindTips(no_copy=no_copy)
+        f.initialize()
+        results[no_copy] = f.process(item)
+        f.finalize()
+    assert results[True].data is item.data
+    np.testing.assert_array_equal(np.asarray(results[True].image), np.asarray(results[False].image))
+    assert [(o.x, o.y) for o in results[True].annotation] == [(o.x, o.y) for o in results[False].annotation]
+
+
+def test_point_set():
+    points = points_to_pointset(points_image(), "tip")
+    assert len(points) == 4
+    assert points.num_points("tip") == 4
+    assert points.num_points("branch") == 0
+    assert points.is_compact()
+    # pickling/copying keeps the set compact
+    copied = pickle.loads(pickle.dumps(points))
+    assert copied.is_compact()
+    shallow = copy.copy(points)
+    shallow.extend(points_to_pointset(points_image(), "branch", cluster=True))
+    assert len(shallow) == 6
+    assert len(points) == 4
+    expected = [(o.x, o.y, o.width, o.height) for o in points_to_locatedobjects(points_image(), "tip")]
+    assert [(o.x, o.y, o.width, o.height) for o in copied.to_locatedobjects()] == expected
+    assert not copied.is_compact()
+
+
+@pytest.mark.parametrize("cluster", [False, True])
+def test_compact(skeleton, cluster):
+    results = dict()
+    for compact in [False, True]:
+        f = FindBranchPoints(cluster=cluster, compact=compact)
+        f.initialize()
+        results[compact] = f.process(mask_to_record(skeleton))
+        f.finalize()
+    assert isinstance(results[True].annotation, PointSet)
+    assert len(results[True].annotation) == len(results[False].annotation)
+    assert [(o.x, o.y, o.width, o.height, o.metadata) for o in results[True].annotation] \
+        == [(o.x, o.y, o.width, o.height, o.metadata) for o in results[False].annotation]
+
+
+def test_classify_skeleton(skeleton):
+    load_plantcv()
+    # lines along and ending at the image border
+    border = np.zeros((20, 30), dtype=np.uint8)
+    border[0, :12] = 255
+    border[:15, 5] = 255
+    border[10, 5:] = 255
+    for array in [skeleton, border]:
+        tips, branch_points = classify_skeleton(array)
+        np.testing.assert_array_equal(tips > 0, pcv.morphology.find_tips(array) > 0)
+        np.testing.assert_array_equal(branch_points > 0, pcv.morphology.find_branch_pts(array) > 0)
+
+
+@pytest.mark.parametrize("cls", [FindTips, FindBranchPoints])
+def test_lut_engine(skeleton, cls):
+    results = dict()
+    for engine in [ENGINE_PCV, ENGINE_LUT]:
+        f = cls(engine=engine)
+        f.initialize()
+        results[engine] = f.process(mask_to_record(skeleton))
+        f.finalize()
+    assert [(o.x, o.y) for o in results[ENGINE_LUT].annotation] == [(o.x, o.y) for o in results[ENGINE_PCV].annotation]
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from idc.plantcv.api import Prefetcher
+from idc.plantcv.filter import Fill, FindTips
+
+from conftest import mask_to_record, record_to_mask
+
+
+def square(x: int) -> int:
+    """
+    Squares the number, fails for negative ones.
+
+    :param x: the number to square
+    :type x: int
+    :return: the square
+    :rtype: int
+    """
+    if x < 0:
+        raise ValueError("negative: %d" % x)
+    return x * x
+
+
+def test_prefetcher():
+    assert list(Prefetcher(list(range(10)), square, 2)) == [(x, x * x) for x in range(10)]
+    results = []
+    with pytest.raises(ValueError):
+        for item, result in Prefetcher([1, 2, -3, 4], square, 1):
+            results.append(result)
+    assert results == [1, 4]
+    with pytest.raises(Exception):
+        Prefetcher([1], square, 0)
+
+
+@pytest.mark.parametrize("cls", [Fill, FindTips])
+def test_prefetch(skeleton, cls):
+    masks = [skeleton, np.ascontiguousarray(skeleton[::-1]), np.ascontiguousarray(skeleton[:, ::-1])]
+    results = dict()
+    for prefetch in [0, 2]:
+        f = cls(prefetch=prefetch)
+        f.initialize()
+        results[prefetch] = f.process([mask_to_record(x, image_name="%d.png" % i) for i, x in enumerate(masks)])
+        f.finalize()
+    assert [x.image_name for x in results[2]] == ["0.png", "1.png", "2.png"]
+    for actual, expected in zip(results[2], results[0]):
+        np.testing.assert_array_equal(record_to_mask(actual), record_to_mask(expected))
+        if cls is FindTips:
+            assert [(o.x, o.y) for o in actual.annotation] == [(o.x, o.y) for o in expected.annotation]
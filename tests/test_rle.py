@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from idc.plantcv.api import ENGINE_PCV, ENGINE_DISTANCE, ENGINE_RLE, SHAPE_CROSS, RLEMask, label_fill, label_fill_holes, rle_fill, rle_fill_holes
+from idc.plantcv.filter import Erode, Dilate, Fill, FillHoles
+
+from conftest import process
+
+
+def test_round_trip(mask):
+    # odd width, so that rows do not align with the 8 pixel words
+    array = np.ascontiguousarray(mask[:, :-2])
+    rle = RLEMask.from_array(array)
+    assert rle.area == np.count_nonzero(array)
+    np.testing.assert_array_equal(rle.to_array(), array)
+    empty = RLEMask.from_array(np.zeros((5, 7), dtype=np.uint8))
+    assert empty.num_runs == 0
+    np.testing.assert_array_equal(empty.to_array(), np.zeros((5, 7), dtype=np.uint8))
+    grayscale = np.array([[0, 1, 2], [3, 0, 0]], dtype=np.uint8)
+    assert RLEMask.from_array(grayscale, binary_only=True) is None
+
+
+@pytest.mark.parametrize("cls", [Erode, Dilate])
+@pytest.mark.parametrize("kernel_size,num_iterations", [(2, 1), (3, 1), (3, 3), (4, 2), (7, 1)])
+def test_morphology_engine(mask, cls, kernel_size, num_iterations):
+    expected = process(cls, mask, mode="L", kernel_size=kernel_size, num_iterations=num_iterations, engine=ENGINE_PCV)
+    actual = process(cls, mask, mode="L", kernel_size=kernel_size, num_iterations=num_iterations, engine=ENGINE_RLE)
+    np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize("cls", [Erode, Dilate])
+def test_cross_shape(mask, cls):
+    expected = process(cls, mask, mode="L", kernel_size=5, shape=SHAPE_CROSS, engine=ENGINE_DISTANCE)
+    actual = process(cls, mask, mode="L", kernel_size=5, shape=SHAPE_CROSS, engine=ENGINE_RLE)
+    np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize("size", [1, 10, 200, 5000])
+def test_fill_engine(mask, size):
+    expected = process(Fill, mask, size=size, engine=ENGINE_PCV)
+    actual = process(Fill, mask, size=size, engine=ENGINE_RLE)
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_fill_holes_engine(mask):
+    expected = process(FillHoles, mask, engine=ENGINE_PCV)
+    actual = process(FillHoles, mask, engine=ENGINE_RLE)
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_fill_options(mask):
+    rle = RLEMask.from_array(mask)
+    np.testing.assert_array_equal(rle_fill(rle, 50, connectivity=8).to_array(), label_fill(mask, 50, connectivity=8))
+    np.testing.assert_array_equal(rle_fill_holes(rle, max_hole_size=30).to_array(), label_fill_holes(mask, max_hole_size=30))
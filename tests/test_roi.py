@@ -0,0 +1,67 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+from wai.common.adams.imaging.locateobjects import LocatedObjects, LocatedObject
+
+from idc.api import ObjectDetectionData
+from idc.plantcv.api import ROI_FULL, ROI_ANNOTATIONS, ENGINE_LABEL
+from idc.plantcv.filter import Erode, Dilate, Fill, FillHoles, Skeletonize
+
+BOXES = [(10, 20, 120, 90), (100, 60, 80, 150), (350, 250, 150, 120)]
+""" the bounding boxes (x, y, width, height). """
+
+
+def detection_record(array: np.ndarray, mode: str):
+    """
+    Turns the mask into an object detection record with the bounding boxes.
+
+    :param array: the mask to convert (0/255)
+    :type array: np.ndarray
+    :param mode: the PIL image mode to use
+    :type mode: str
+    :return: the record
+    """
+    buf = io.BytesIO()
+    Image.fromarray(array, "L").convert(mode).save(buf, format="PNG")
+    objs = LocatedObjects([LocatedObject(x, y, w, h) for x, y, w, h in BOXES])
+    return ObjectDetectionData(image_name="mask.png", data=buf.getvalue(), annotation=objs)
+
+
+def inside_boxes(shape) -> np.ndarray:
+    """
+    Generates the mask of the pixels inside the bounding boxes.
+
+    :param shape: the shape of the image
+    :type shape: tuple
+    :return: the mask
+    :rtype: np.ndarray
+    """
+    result = np.zeros(shape, dtype=bool)
+    for x, y, w, h in BOXES:
+        result[y:y + h, x:x + w] = True
+    return result
+
+
+@pytest.mark.parametrize("cls,mode,kwargs", [
+    (Erode, "L", dict(kernel_size=5)),
+    (Dilate, "L", dict(kernel_size=3, num_iterations=2)),
+    (Fill, "1", dict(size=200)),
+    (Fill, "1", dict(size=200, engine=ENGINE_LABEL)),
+    (FillHoles, "1", dict()),
+    (FillHoles, "1", dict(engine=ENGINE_LABEL, max_hole_size=50)),
+    (Skeletonize, "1", dict()),
+])
+def test_annotations(mask, cls, mode, kwargs):
+    results = dict()
+    for roi in [ROI_FULL, ROI_ANNOTATIONS]:
+        f = cls(roi=roi, **kwargs)
+        f.initialize()
+        results[roi] = np.asarray(f.process(detection_record(mask, mode)).image).astype(np.uint8)
+        f.finalize()
+    inside = inside_boxes(mask.shape)
+    # untouched areas keep their values, boxes are identical to processing the full image
+    np.testing.assert_array_equal(results[ROI_ANNOTATIONS][~inside], mask[~inside])
+    np.testing.assert_array_equal(results[ROI_ANNOTATIONS][inside], results[ROI_FULL][inside])
+    assert np.any(results[ROI_ANNOTATIONS][inside] != mask[inside])
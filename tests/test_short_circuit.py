@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from idc.plantcv.api import COUNTER_CHECKED, COUNTER_SHORT_CIRCUITED, constant_value
+from idc.plantcv.filter import Erode, Dilate, Fill, FillHoles, Skeletonize
+
+from conftest import mask_to_record, process
+
+
+def masks() -> dict:
+    """
+    Generates the masks that can get short-circuited.
+
+    :return: the name/mask mapping
+    :rtype: dict
+    """
+    sparse = np.zeros((60, 80), dtype=np.uint8)
+    sparse[10:12, 10:15] = 255
+    return {
+        "empty": np.zeros((60, 80), dtype=np.uint8),
+        "full": np.full((60, 80), 255, dtype=np.uint8),
+        "sparse": sparse,
+    }
+
+
+def test_constant_value():
+    assert constant_value(np.zeros((600, 10), dtype=np.uint8)) == 0
+    array = np.full((600, 10), 255, dtype=np.uint8)
+    assert constant_value(array) == 255
+    array[599, 9] = 0
+    assert constant_value(array) is None
+
+
+@pytest.mark.parametrize("cls,mode,kwargs", [
+    (Erode, "L", dict(kernel_size=5)),
+    (Dilate, "L", dict(kernel_size=3, num_iterations=2)),
+    (Fill, "1", dict(size=50)),
+    (FillHoles, "1", dict()),
+    (Skeletonize, "1", dict()),
+])
+@pytest.mark.parametrize("name", ["empty", "full", "sparse"])
+def test_same_result(monkeypatch, cls, mode, kwargs, name):
+    array = masks()[name]
+    actual = process(cls, array, mode=mode, **kwargs)
+    monkeypatch.setattr(cls, "_short_circuit", lambda self, array: None)
+    expected = process(cls, array, mode=mode, **kwargs)
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_counters(mask):
+    f = Fill(size=50)
+    f.initialize()
+    for array in list(masks().values()) + [mask]:
+        f.process(mask_to_record(array))
+    assert f._short_circuits.counters == {COUNTER_CHECKED: 4, COUNTER_SHORT_CIRCUITED: 3}
+    f.finalize()
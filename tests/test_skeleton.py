@@ -0,0 +1,57 @@
+import pytest
+from seppl.io import BatchFilter
+
+from idc.plantcv.api import KEY_NUM_TIPS, KEY_NUM_BRANCH_POINTS
+from idc.plantcv.filter import SkeletonFeatures, FindTips
+
+from conftest import mask_to_record
+
+
+@pytest.mark.parametrize("cluster", [False, True])
+@pytest.mark.parametrize("compact", [False, True])
+def test_feature_counts(mask, cluster, compact):
+    f = SkeletonFeatures(cluster=cluster, compact=compact)
+    f.initialize()
+    item = f.process(mask_to_record(mask))
+    f.finalize()
+    meta = item.get_metadata()
+    types = [obj.metadata["type"] for obj in item.annotation]
+    assert meta[KEY_NUM_TIPS] == types.count("tip")
+    assert meta[KEY_NUM_BRANCH_POINTS] == types.count("branch")
+    assert meta[KEY_NUM_TIPS] > 0
+    assert meta[KEY_NUM_BRANCH_POINTS] > 0
+
+
+def test_memory_budget_stream(skeleton):
+    items = [mask_to_record(skeleton, image_name="%d.png" % i) for i in range(3)]
+    f = FindTips(memory_budget=skeleton.size / 1e6)
+    f.initialize()
+    f.process_stream(items)
+    assert f.output().image_name == "0.png"
+    # sub-batches that did not get collected must not end up in the output of the next data
+    f.skip = True
+    f.process_stream(items[2])
+    outputs = []
+    while f.has_output():
+        outputs.append(f.output())
+    assert [x.image_name for x in outputs] == ["2.png"]
+    f.skip = False
+    f.process_stream(items[1:])
+    outputs = []
+    while f.has_output():
+        outputs.append(f.output())
+    assert [x.image_name for x in outputs] == ["1.png", "2.png"]
+    f.finalize()
+
+
+def test_without_memory_budget(skeleton):
+    items = [mask_to_record(skeleton, image_name="%d.png" % i) for i in range(3)]
+    f = FindTips()
+    assert isinstance(f, BatchFilter)
+    f.initialize()
+    assert [x.image_name for x in f.process(items)] == ["0.png", "1.png", "2.png"]
+    # the whole batch gets forwarded as a single output
+    f.process_stream(items)
+    assert [x.image_name for x in f.output()] == ["0.png", "1.png", "2.png"]
+    assert not f.has_output()
+    f.finalize()
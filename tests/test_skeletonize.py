@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+
+from idc.plantcv.api import ENGINE_PCV, ENGINE_GRAPH
+from idc.plantcv.filter import Skeletonize
+
+from conftest import process
+
+
+@pytest.mark.parametrize("size", [5, 20, 50])
+def test_graph_engine(mask, size):
+    expected = process(Skeletonize, mask, prune=True, size=size, engine=ENGINE_PCV)
+    actual = process(Skeletonize, mask, prune=True, size=size, engine=ENGINE_GRAPH)
+    assert np.any(actual != process(Skeletonize, mask))
+    np.testing.assert_array_equal(actual, expected)
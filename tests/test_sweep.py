@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from idc.plantcv.api import KEY_SWEEP_PREFIX, single_value, sweep_combinations, sweep_parameters, variant_name, variant_metadata
+from idc.plantcv.filter import Erode, Dilate, Fill
+
+from conftest import mask_to_record, record_to_mask, process
+
+
+def test_single_value():
+    assert single_value([3]) == 3
+    assert single_value([3, 5]) == [3, 5]
+    assert single_value(3) == 3
+
+
+def test_combinations():
+    f = Dilate(kernel_size=[3, 5], num_iterations=2)
+    swept, combinations = sweep_combinations(f, ["kernel_size", "num_iterations"])
+    assert swept == ["kernel_size"]
+    assert combinations == [{"kernel_size": 3, "num_iterations": 2}, {"kernel_size": 5, "num_iterations": 2}]
+    f = Dilate(kernel_size=3, num_iterations=[2])
+    assert sweep_combinations(f, ["kernel_size", "num_iterations"]) == ([], [])
+
+
+def test_parameters_restored():
+    f = Dilate(kernel_size=[3, 5])
+    with sweep_parameters(f, {"kernel_size": 3}):
+        assert f.kernel_size == 3
+    assert f.kernel_size == [3, 5]
+
+
+def test_variant_name():
+    assert variant_name("img.png", ["kernel_size", "num_iterations"], {"kernel_size": 5, "num_iterations": 2}) == "img-kernel_size-5-num_iterations-2.png"
+    assert variant_name("img", ["size"], {"size": 10}) == "img-size-10"
+    assert variant_metadata(["size"], {"size": 10, "connectivity": 4}) == {KEY_SWEEP_PREFIX + "size": 10}
+
+
+@pytest.mark.parametrize("cls,mode,kwargs,values", [
+    (Erode, "L", dict(kernel_size=3), dict(num_iterations=[1, 2, 4])),
+    (Dilate, "L", dict(), dict(kernel_size=[3, 5], num_iterations=[1, 3, 2])),
+    (Fill, "1", dict(), dict(size=[10, 200, 50, 1000])),
+])
+def test_variants(mask, cls, mode, kwargs, values):
+    f = cls(**kwargs, **values)
+    f.initialize()
+    result = f.process(mask_to_record(mask, mode=mode))
+    f.finalize()
+    swept, combinations = sweep_combinations(f, list(values.keys()))
+    assert len(result) == len(combinations)
+    for item, combination in zip(result, combinations):
+        assert item.image_name == variant_name("mask.png", swept, combination)
+        assert item.get_metadata() == variant_metadata(swept, combination)
+        # continuing from the previous variant must be identical to a separate run
+        expected = process(cls, mask, mode=mode, **kwargs, **combination)
+        np.testing.assert_array_equal(record_to_mask(item), expected)
+
+
+@pytest.mark.parametrize("cls", [Erode, Dilate])
+def test_kernel_size_1(mask, cls):
+    f = cls()
+    f.parse_args(["-k", "1", "3", "-i", "1", "2"])
+    f.initialize()
+    result = f.process(mask_to_record(mask, mode="L"))
+    f.finalize()
+    assert len(result) == 4
+    for item in result[:2]:
+        np.testing.assert_array_equal(record_to_mask(item), mask)
+    np.testing.assert_array_equal(record_to_mask(result[2]), process(cls, mask, mode="L", kernel_size=3, num_iterations=1))
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from idc.plantcv.api import pcv, load_plantcv, debug_disabled
+from idc.plantcv.filter import Dilate, Skeletonize
+
+from conftest import mask_to_record
+
+
+def test_debug_disabled():
+    load_plantcv()
+    debug = pcv.params.debug
+    pcv.params.debug = "print"
+    try:
+        with debug_disabled():
+            assert pcv.params.debug is None
+        assert pcv.params.debug == "print"
+    finally:
+        pcv.params.debug = debug
+
+
+@pytest.mark.parametrize("cls,kwargs", [(Dilate, dict(kernel_size=5)), (Skeletonize, dict(prune=True, size=10))])
+def test_threads(mask, cls, kwargs):
+    load_plantcv()
+    layers = {"a": mask, "b": 255 - mask, "c": np.ascontiguousarray(mask[::-1])}
+    f = cls(apply_to="annotations", **kwargs)
+    f.initialize()
+    expected = f.process(mask_to_record(mask, layers=layers))
+    f.finalize()
+    debug = pcv.params.debug
+    pcv.params.debug = "print"
+    try:
+        f = cls(apply_to="annotations", num_threads=3, **kwargs)
+        f.initialize()
+        actual = f.process(mask_to_record(mask, layers=layers))
+        f.finalize()
+        # debugging only gets disabled for the duration of the pooled call
+        assert pcv.params.debug == "print"
+    finally:
+        pcv.params.debug = debug
+    for label in layers:
+        np.testing.assert_array_equal(actual.annotation.layers[label], expected.annotation.layers[label])
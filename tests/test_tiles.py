@@ -0,0 +1,52 @@
+import logging
+
+import cv2
+import numpy as np
+import pytest
+
+from idc.plantcv.api import ENGINE_LABEL, tiles, label_fill, tiled_label_fill
+from idc.plantcv.filter import Erode, Dilate, Fill, FillHoles, Skeletonize
+
+from conftest import process
+
+
+def test_tiles():
+    covered = np.zeros((130, 250), dtype=np.int32)
+    for y, y_end, x, x_end in tiles(covered.shape, 64):
+        assert (y_end - y <= 64) and (x_end - x <= 64)
+        covered[y:y_end, x:x_end] += 1
+    assert np.all(covered == 1)
+
+
+@pytest.mark.parametrize("cls,mode,kwargs", [
+    (Erode, "L", dict(kernel_size=5, num_iterations=2)),
+    (Dilate, "L", dict(kernel_size=4, num_iterations=3)),
+    (Fill, "1", dict(size=200, engine=ENGINE_LABEL)),
+    (FillHoles, "1", dict(engine=ENGINE_LABEL)),
+    (FillHoles, "1", dict(engine=ENGINE_LABEL, max_hole_size=50)),
+    (Skeletonize, "1", dict()),
+])
+@pytest.mark.parametrize("tile_size", [64, 150])
+def test_tiled(mask, cls, mode, kwargs, tile_size):
+    expected = process(cls, mask, mode=mode, **kwargs)
+    actual = process(cls, mask, mode=mode, tile_size=tile_size, **kwargs)
+    np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize("connectivity", [4, 8])
+def test_tiled_label_fill(mask, connectivity):
+    expected = label_fill(mask, 50, connectivity=connectivity)
+    actual = tiled_label_fill(mask, 100, 50, connectivity=connectivity)
+    np.testing.assert_array_equal(np.asarray(actual), expected)
+
+
+def test_skeletonize_halo(caplog):
+    # a disc that is wider than the halo
+    array = np.zeros((300, 300), dtype=np.uint8)
+    cv2.circle(array, (150, 150), 60, 255, -1)
+    with caplog.at_level(logging.WARNING):
+        process(Skeletonize, array, tile_size=64, halo=200)
+    assert "halo" not in caplog.text
+    with caplog.at_level(logging.WARNING):
+        process(Skeletonize, array, tile_size=64, halo=16)
+    assert caplog.text.count("exceed the halo of 16 pixels") == 1
@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from idc.plantcv.api import STAGES
+from idc.plantcv.filter import Dilate, FindTips
+
+from conftest import mask_to_record
+
+
+@pytest.mark.parametrize("cls,mode", [(Dilate, "L"), (FindTips, "1")])
+def test_profile_json(tmp_path, skeleton, cls, mode):
+    path = str(tmp_path / "profile.json")
+    f = cls(profile_file=path)
+    f.initialize()
+    for i in range(3):
+        f.process(mask_to_record(skeleton, mode=mode, image_name="%d.png" % i))
+    f.finalize()
+    with open(path, "r") as fp:
+        totals = json.load(fp)
+    assert totals["filter"] == f.name()
+    assert totals["records"] == 3
+    assert totals["pixels"] == 3 * skeleton.size
+    assert set(totals["stages"].keys()) == set(STAGES)
+    assert totals["elapsed"] > 0
+
+
+def test_profile_prometheus(tmp_path, mask):
+    path = str(tmp_path / "profile.prom")
+    f = Dilate(profile_file=path)
+    f.initialize()
+    f.process(mask_to_record(mask, mode="L"))
+    f.finalize()
+    with open(path, "r") as fp:
+        lines = fp.read().splitlines()
+    assert 'idc_plantcv_records_total{filter="pcv-dilate"} 1' in lines
+    assert any(x.startswith('idc_plantcv_stage_seconds_total{filter="pcv-dilate",stage="pcv"}') for x in lines)
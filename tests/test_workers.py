@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from idc.plantcv.api import COUNTER_CHECKED, COUNTER_HITS, COUNTER_MISSES
+from idc.plantcv.filter import Dilate, Fill, Skeletonize, FindTips
+
+from conftest import mask_to_record, record_to_mask
+
+
+def process_batch(cls, masks, mode="1", **kwargs) -> list:
+    """
+    Runs the filter on a batch of records generated from the masks.
+
+    :param cls: the filter class to instantiate
+    :param masks: the masks to process (0/255)
+    :type masks: list
+    :param mode: the PIL image mode to use for the records
+    :type mode: str
+    :param kwargs: the parameters for the filter
+    :return: the processed records
+    :rtype: list
+    """
+    f = cls(**kwargs)
+    f.initialize()
+    try:
+        return f.process([mask_to_record(x, mode=mode, image_name="%d.png" % i) for i, x in enumerate(masks)])
+    finally:
+        f.finalize()
+
+
+@pytest.mark.parametrize("cls,mode,kwargs", [
+    (Dilate, "L", dict(kernel_size=5)),
+    (Fill, "1", dict(size=50)),
+    (Skeletonize, "1", dict(prune=True, size=10)),
+])
+def test_images(mask, cls, mode, kwargs):
+    masks = [mask, 255 - mask, np.ascontiguousarray(mask[::-1])]
+    expected = process_batch(cls, masks, mode=mode, **kwargs)
+    actual = process_batch(cls, masks, mode=mode, num_workers=2, **kwargs)
+    assert [x.image_name for x in actual] == ["0.png", "1.png", "2.png"]
+    for item_actual, item_expected in zip(actual, expected):
+        np.testing.assert_array_equal(record_to_mask(item_actual), record_to_mask(item_expected))
+
+
+def test_points(skeleton):
+    masks = [skeleton, np.ascontiguousarray(skeleton[::-1])]
+    expected = process_batch(FindTips, masks)
+    actual = process_batch(FindTips, masks, num_workers=2)
+    for item_actual, item_expected in zip(actual, expected):
+        assert len(item_actual.annotation) > 0
+        assert [(o.x, o.y) for o in item_actual.annotation] == [(o.x, o.y) for o in item_expected.annotation]
+
+
+def test_num_workers():
+    f = Dilate(num_workers=0)
+    with pytest.raises(Exception):
+        f.initialize()
+
+
+def test_counters(tmp_path, mask):
+    f = Fill(size=5, num_workers=2, profile=True, cache_dir=str(tmp_path))
+    f.initialize()
+    # the counters of records processed before the pool gets created must not be counted again by the workers
+    f.process(mask_to_record(mask))
+    f.process([mask_to_record(mask, image_name="%d.png" % i) for i in range(4)])
+    assert f._short_circuits.counters[COUNTER_CHECKED] == 5
+    assert f._cache.counters[COUNTER_HITS] + f._cache.counters[COUNTER_MISSES] == 5
+    totals = f._timer.totals()
+    assert totals["records"] == 5
+    assert totals["pixels"] == 5 * mask.size
+    f.finalize()